@@ -2,7 +2,9 @@
 Minocrisy AI Tools - App Package
 Contains the Flask application factory and configuration.
 """
+import json
 import os
+import tempfile
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -34,6 +36,58 @@ def create_app(test_config=None):
         HEDRA_API_URL=os.environ.get("HEDRA_API_URL", "https://api.hedra.com/v1"),
         GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", ""),
         GCP_PROJECT_ID=os.environ.get("GCP_PROJECT_ID", ""),
+        SECRET_CACHE_TTL=int(os.environ.get("SECRET_CACHE_TTL", 300)),
+        SECRET_CACHE_NEGATIVE_TTL=int(os.environ.get("SECRET_CACHE_NEGATIVE_TTL", 60)),
+        SECRETS_PREFETCH=os.environ.get("SECRETS_PREFETCH", "false").lower() == "true",
+        SECRETS_PREFETCH_TIMEOUT=float(os.environ.get("SECRETS_PREFETCH_TIMEOUT", 10)),
+        SECRETS_REFRESH_INTERVAL=int(os.environ.get("SECRETS_REFRESH_INTERVAL", 600)),
+        HTTP_POOL_SIZES={},
+        HTTP_TIMEOUTS={},
+        HTTP_MAX_RETRIES=int(os.environ.get("HTTP_MAX_RETRIES", 2)),
+        HTTP_MAX_RETRY_DELAY=float(os.environ.get("HTTP_MAX_RETRY_DELAY", 10)),
+        CIRCUIT_BREAKER_FAILURE_THRESHOLD=int(os.environ.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5)),
+        CIRCUIT_BREAKER_RECOVERY_TIMEOUT=float(os.environ.get("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 30)),
+        RATE_LIMITS=json.loads(os.environ.get("RATE_LIMITS") or "{}"),
+        RATE_LIMIT_MAX_WAIT=float(os.environ.get("RATE_LIMIT_MAX_WAIT", 10)),
+        REQUEST_DEADLINE_DEFAULT=float(os.environ.get("REQUEST_DEADLINE_DEFAULT", 0)) or None,
+        REQUEST_DEADLINES={
+            "/tools/talking-head/generate": 240,
+            "/tools/talking-head/generate-image": 90,
+            "/tools/hedra-character/generate": 200,
+            "/tools/hype-remover/process": 90,
+            "/tools/hype-remover/process/batch": 280,
+            "/tools/hype-remover/research": 90,
+            "/tools/xai-chat/chat": 60,
+        },
+        HYPE_CACHE_TTL=int(os.environ.get("HYPE_CACHE_TTL", 86400)),
+        CACHE_ADMIN_TOKEN=os.environ.get("CACHE_ADMIN_TOKEN"),
+        HYPE_CHUNK_CHARS=int(os.environ.get("HYPE_CHUNK_CHARS", 6000)),
+        HYPE_CHUNK_WORKERS=int(os.environ.get("HYPE_CHUNK_WORKERS", 4)),
+        HYPE_PREFILTER=os.environ.get("HYPE_PREFILTER", "false").lower() == "true",
+        HYPE_PREFILTER_CONTEXT=int(os.environ.get("HYPE_PREFILTER_CONTEXT", 1)),
+        HYPE_PREFILTER_MAX_SHARE=float(os.environ.get("HYPE_PREFILTER_MAX_SHARE", 0.8)),
+        HYPE_BATCH_WORKERS=int(os.environ.get("HYPE_BATCH_WORKERS", 8)),
+        HYPE_BATCH_MAX_ITEMS=int(os.environ.get("HYPE_BATCH_MAX_ITEMS", 1000)),
+        HYPE_BATCH_MAX_BYTES=int(os.environ.get("HYPE_BATCH_MAX_BYTES", 10 * 1024 * 1024)),
+        HYPE_INCREMENTAL=os.environ.get("HYPE_INCREMENTAL", "false").lower() == "true",
+        HYPE_LEAN_MODE=os.environ.get("HYPE_LEAN_MODE", "false").lower() == "true",
+        HYPE_FAST_MODE=os.environ.get("HYPE_FAST_MODE", "false").lower() == "true",
+        HYPE_FAST_MIN_ACCURACY=float(os.environ.get("HYPE_FAST_MIN_ACCURACY", 0.85)),
+        HYPE_FAST_MIN_CONFIDENCE=float(os.environ.get("HYPE_FAST_MIN_CONFIDENCE", 0.8)),
+        RESEARCH_CACHE_TTL=int(os.environ.get("RESEARCH_CACHE_TTL", 3600)),
+        RESEARCH_CACHE_MAX_STALE=int(os.environ.get("RESEARCH_CACHE_MAX_STALE", 86400)),
+        RESULT_CACHE_MEMORY_ENTRIES=int(os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", 256)),
+        RESULT_CACHE_DISK_BYTES=int(os.environ.get("RESULT_CACHE_DISK_BYTES", 50 * 1024 * 1024)),
+        RESULT_CACHE_DIR=os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "minocrisy-cache")),
+        HEDGE_REQUESTS=os.environ.get("HEDGE_REQUESTS", "false").lower() == "true",
+        HEDGE_PERCENTILE=float(os.environ.get("HEDGE_PERCENTILE", 90)),
+        HEDGE_MIN_SAMPLES=int(os.environ.get("HEDGE_MIN_SAMPLES", 20)),
+        HEDGE_DEFAULT_DELAY=float(os.environ.get("HEDGE_DEFAULT_DELAY", 4.0)),
+        HEDGE_MIN_DELAY=float(os.environ.get("HEDGE_MIN_DELAY", 0.25)),
+        SHARED_CACHE_URL=os.environ.get("SHARED_CACHE_URL", ""),
+        NEAR_DUPLICATE_THRESHOLD=float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0)),
+        NEAR_DUPLICATE_MAX_ENTRIES=int(os.environ.get("NEAR_DUPLICATE_MAX_ENTRIES", 100000)),
+        LAZY_TOOL_LOADING=os.environ.get("LAZY_TOOL_LOADING", "true").lower() == "true",
     )
     
     # Load test config if provided
@@ -46,24 +100,27 @@ def create_app(test_config=None):
     except OSError:
         pass
     
-    # Register blueprints
-    from app.routes import main_bp
-    app.register_blueprint(main_bp)
+    # Resolve all secrets concurrently up front instead of lazily per request
+    if app.config.get("SECRETS_PREFETCH"):
+        from app.utils.secrets import prefetch_secrets
+        prefetch_secrets(app)
     
-    from app.tools.talking_head import talking_head_bp
-    app.register_blueprint(talking_head_bp, url_prefix="/tools/talking-head")
+    # Give every request a time budget shared by all of its provider calls
+    from app.utils.deadline import DeadlineExceeded, start_request_deadline, handle_deadline_exceeded
+    app.before_request(start_request_deadline)
+    app.register_error_handler(DeadlineExceeded, handle_deadline_exceeded)
     
-    from app.tools.hype_remover import hype_remover_bp
-    app.register_blueprint(hype_remover_bp, url_prefix="/tools/hype-remover")
+    # Calls that queued too long behind a provider's rate limits answer 429
+    from app.utils.rate_limit import RateLimitExceeded, handle_rate_limit_exceeded
+    app.register_error_handler(RateLimitExceeded, handle_rate_limit_exceeded)
     
-    # Register new tool blueprints if the APIs are configured
-    if app.config.get("XAI_API_KEY"):
-        from app.tools.xai_chat import xai_chat_bp
-        app.register_blueprint(xai_chat_bp, url_prefix="/tools/xai-chat")
+    # Register blueprints
+    from app.routes import main_bp
+    app.register_blueprint(main_bp)
     
-    if app.config.get("HEDRA_API_KEY"):
-        from app.tools.hedra_character import hedra_character_bp
-        app.register_blueprint(hedra_character_bp, url_prefix="/tools/hedra-character")
+    # Register tool blueprints (tools needing an API are skipped if it isn't configured)
+    from app.tools.registry import register_tools
+    register_tools(app)
     
     # Health check endpoint
     @app.route("/health")
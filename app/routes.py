@@ -3,10 +3,60 @@ Minocrisy AI Tools - Main Routes
 Contains the main routes for the application.
 """
 from flask import Blueprint, render_template, jsonify, current_app
+from app.utils.async_http import get_async_stats
+from app.utils.hedging import get_hedge_stats
+from app.utils.http_client import get_pool_stats, get_retry_stats
+from app.utils.hype_lexicon import get_prefilter_stats
+from app.utils.json_output import get_json_output_stats
+from app.utils.near_duplicate import get_near_duplicate_stats
+from app.utils.provider_router import get_router_stats
+from app.utils.rate_limit import get_rate_limit_stats
+from app.utils.resilience import get_breaker_states
+from app.utils.result_cache import get_result_cache_stats
+from app.utils.secrets import get_secret_cache_stats
+from app.utils.shared_cache import get_shared_cache_stats
+from app.utils.singleflight import get_singleflight_stats
+from app.utils.warmup import run_warmup
 
 # Create a Blueprint for the main routes
 main_bp = Blueprint("main", __name__)
 
+# Tools provided by the application. "package" is the tool package whose
+# blueprint is mounted at "endpoint" (see app.tools.registry); tools with an
+# "api" are only available when that API's key is configured.
+TOOLS = [
+    {
+        "id": "talking-head",
+        "name": "Talking Head",
+        "description": "Generate animated talking head videos from text input using ElevenLabs and RunwayML.",
+        "endpoint": "/tools/talking-head",
+        "package": "app.tools.talking_head"
+    },
+    {
+        "id": "hype-remover",
+        "name": "Hype Remover",
+        "description": "Remove exaggerated claims and marketing hype from text.",
+        "endpoint": "/tools/hype-remover",
+        "package": "app.tools.hype_remover"
+    },
+    {
+        "id": "xai-chat",
+        "name": "Grok Chat",
+        "description": "Chat with xAI's Grok model for intelligent conversations and assistance.",
+        "endpoint": "/tools/xai-chat",
+        "api": "xai",
+        "package": "app.tools.xai_chat"
+    },
+    {
+        "id": "hedra-character",
+        "name": "Hedra Character Video",
+        "description": "Generate character videos with synchronized speech using Hedra's API.",
+        "endpoint": "/tools/hedra-character",
+        "api": "hedra",
+        "package": "app.tools.hedra_character"
+    }
+]
+
 @main_bp.route("/")
 def index():
     """Render the main page of the application."""
@@ -15,35 +65,6 @@ def index():
 @main_bp.route("/api/tools")
 def list_tools():
     """Return a list of available tools."""
-    tools = [
-        {
-            "id": "talking-head",
-            "name": "Talking Head",
-            "description": "Generate animated talking head videos from text input using ElevenLabs and RunwayML.",
-            "endpoint": "/tools/talking-head"
-        },
-        {
-            "id": "hype-remover",
-            "name": "Hype Remover",
-            "description": "Remove exaggerated claims and marketing hype from text.",
-            "endpoint": "/tools/hype-remover"
-        },
-        {
-            "id": "xai-chat",
-            "name": "Grok Chat",
-            "description": "Chat with xAI's Grok model for intelligent conversations and assistance.",
-            "endpoint": "/tools/xai-chat",
-            "api": "xai"
-        },
-        {
-            "id": "hedra-character",
-            "name": "Hedra Character Video",
-            "description": "Generate character videos with synchronized speech using Hedra's API.",
-            "endpoint": "/tools/hedra-character",
-            "api": "hedra"
-        }
-    ]
-    
     # Filter out tools that require APIs that aren't configured
     configured_apis = {
         "xai": bool(current_app.config.get("XAI_API_KEY")),
@@ -51,7 +72,8 @@ def list_tools():
     }
     
     filtered_tools = [
-        tool for tool in tools 
+        {key: value for key, value in tool.items() if key != "package"}
+        for tool in TOOLS
         if not tool.get("api") or configured_apis.get(tool.get("api"), False)
     ]
     
@@ -69,3 +91,35 @@ def api_status():
         "gemini": bool(current_app.config.get("GEMINI_API_KEY"))
     }
     return jsonify(status)
+
+@main_bp.route("/_ah/warmup")
+def warmup():
+    """
+    Handle the App Engine warmup request.
+    
+    Resolves secrets, imports lazily loaded SDKs and tools, compiles templates,
+    opens provider connection pools and loads the default face image, and
+    reports how long each step took.
+    """
+    return jsonify(run_warmup())
+
+@main_bp.route("/api/metrics")
+def api_metrics():
+    """Return runtime metrics for caches and provider integrations."""
+    metrics = {
+        "secrets": get_secret_cache_stats(),
+        "http": get_pool_stats(),
+        "async_http": get_async_stats(),
+        "retries": get_retry_stats(),
+        "rate_limits": get_rate_limit_stats(),
+        "circuit_breakers": get_breaker_states(),
+        "result_caches": get_result_cache_stats(),
+        "near_duplicates": get_near_duplicate_stats(),
+        "singleflight": get_singleflight_stats(),
+        "shared_cache": get_shared_cache_stats(),
+        "hedging": get_hedge_stats(),
+        "json_output": get_json_output_stats(),
+        "routing": get_router_stats(),
+        "prefilter": get_prefilter_stats()
+    }
+    return jsonify(metrics)
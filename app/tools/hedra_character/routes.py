@@ -6,6 +6,8 @@ import os
 from flask import request, jsonify, render_template, current_app, send_file, url_for
 from werkzeug.utils import secure_filename
 from app.tools.hedra_character import hedra_character_bp
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
 from app.utils.hedra_api import generate_character_video, list_characters, list_voices
 from app.utils.secrets import get_hedra_api_key
 
@@ -76,6 +78,8 @@ def generate():
             "text": text
         })
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error generating video: {e}")
         return jsonify({"error": str(e)}), 500
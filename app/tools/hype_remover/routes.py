@@ -2,10 +2,14 @@
 Minocrisy AI Tools - Hype Remover Routes
 Routes for the Hype Remover tool.
 """
-from flask import request, jsonify, render_template, current_app
+import hmac
+import json
+from flask import Response, request, jsonify, render_template, current_app, stream_with_context
 from app.tools.hype_remover import hype_remover_bp
-from app.tools.hype_remover.service import remove_hype, store_feedback, research_topic, save_output, get_saved_outputs, get_saved_output, delete_saved_output, create_x_post, create_google_doc_content
-from app.utils.secrets import get_openai_api_key, get_xai_api_key, get_gemini_api_key
+from app.tools.hype_remover.service import BATCH_ITEM_OPTIONS, check_providers, remove_hype, remove_hype_batch, invalidate_hype_cache, store_feedback, research_topic, save_output, get_saved_outputs, get_saved_output, delete_saved_output, create_x_post, create_google_doc_content
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
+from app.utils.request_body import RequestBodyError, read_json_body
 
 @hype_remover_bp.route("/", methods=["GET"])
 def index():
@@ -23,8 +27,14 @@ def process():
         "strength": "Optional strength level (mild, moderate, strong)",
         "custom_hype_terms": ["Optional", "list", "of", "custom", "hype", "terms"],
         "context": "Optional context about the text",
-        "use_xai": true/false (default: true),
-        "use_gemini": true/false (default: false)
+        "use_xai": true/false (default: true, prefer xAI over OpenAI),
+        "use_gemini": true/false (default: false, prefer Gemini),
+        "providers": ["xai", "gemini", "openai"] (optional, the providers the router may fall back to; default: all),
+        "use_cache": true/false (default: true, also disabled by a "Cache-Control: no-cache" header),
+        "hedge": true/false (default: HEDGE_REQUESTS, also ask a second provider if the first is slow),
+        "fast": true/false (default: HYPE_FAST_MODE, try the fast model first and escalate if unsure),
+        "lean": true/false (default: HYPE_LEAN_MODE, derive the changes from a word diff instead of the model),
+        "incremental": true/false (default: HYPE_INCREMENTAL, process and cache each paragraph on its own)
     }
     
     Returns:
@@ -36,18 +46,23 @@ def process():
                 "original": "Original phrase",
                 "replacement": "Replacement phrase",
                 "reason": "Reason for replacement",
-                "confidence": 0.95
+                "confidence": 0.95,
+                "offset": 12 (position in the original text, when known),
+                "processed_offset": 10 (position in the processed text, in lean mode)
             }
         ],
         "overall_hype_score": 0.75,
-        "accuracy_score": 0.9
+        "accuracy_score": 0.9,
+        "provider": "Provider that produced the result",
+        "tier": "Model tier that produced the result (fast or full)",
+        "prefilter": {"excerpts": 1, "sent_chars": 120} (when the lexicon prefilter sent only excerpts or nothing),
+        "chunks": 3 (when a long text was processed in chunks),
+        "cached_chunks": 1 (chunks served from the cache),
+        "incremental": {"paragraphs": 4, "cached": 3} (in incremental mode),
+        "hedge": {"provider": "...", "hedged": true/false, "seconds": 1.2} (when hedging),
+        "cached": true/false
     }
     """
-    # Get API keys
-    xai_api_key = get_xai_api_key()
-    openai_api_key = get_openai_api_key()
-    gemini_api_key = get_gemini_api_key()
-    
     # Get request data
     data = request.get_json()
     if not data or "text" not in data:
@@ -59,58 +74,109 @@ def process():
     context = data.get("context")
     use_xai = data.get("use_xai", True)
     use_gemini = data.get("use_gemini", False)
-    
-    # Check if appropriate API key is available
-    if use_gemini:
-        if not gemini_api_key:
-            use_gemini = False
-            if xai_api_key:
-                use_xai = True
-                current_app.logger.warning("Gemini API key not configured, falling back to xAI")
-            elif openai_api_key:
-                use_xai = False
-                current_app.logger.warning("Gemini API key not configured, falling back to OpenAI")
-            else:
-                return jsonify({"error": "No API keys configured"}), 500
-    elif use_xai and not xai_api_key:
-        if gemini_api_key:
-            use_gemini = True
-            use_xai = False
-            current_app.logger.warning("xAI API key not configured, falling back to Gemini")
-        elif openai_api_key:
-            use_xai = False
-            current_app.logger.warning("xAI API key not configured, falling back to OpenAI")
-        else:
-            return jsonify({"error": "No API keys configured"}), 500
-    elif not use_xai and not openai_api_key:
-        if gemini_api_key:
-            use_gemini = True
-            current_app.logger.warning("OpenAI API key not configured, falling back to Gemini")
-        elif xai_api_key:
-            use_xai = True
-            current_app.logger.warning("OpenAI API key not configured, falling back to xAI")
-        else:
-            return jsonify({"error": "No API keys configured"}), 500
+    providers = data.get("providers")
+    error = check_providers(providers)
+    if error:
+        return jsonify({"error": error}), 400
+    use_cache = data.get("use_cache", True) and "no-cache" not in request.headers.get("Cache-Control", "")
+    hedge = data.get("hedge")
+    fast = data.get("fast")
+    lean = data.get("lean")
+    incremental = data.get("incremental")
     
     try:
         # Process the text to remove hype
-        api_key = openai_api_key if not use_xai and not use_gemini else None
         result = remove_hype(
             text=text, 
             strength=strength, 
             custom_hype_terms=custom_hype_terms,
             context=context,
-            api_key=api_key,
             use_xai=use_xai,
-            use_gemini=use_gemini
+            use_gemini=use_gemini,
+            providers=providers,
+            use_cache=use_cache,
+            hedge=hedge,
+            fast=fast,
+            lean=lean,
+            incremental=incremental
         )
         
         return jsonify(result)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error removing hype: {e}")
         return jsonify({"error": str(e)}), 500
 
+@hype_remover_bp.route("/process/batch", methods=["POST"])
+def process_batch():
+    """
+    Process many texts in one request, streaming the results as they finish.
+    
+    The body may be gzip-encoded ("Content-Encoding: gzip").
+    
+    Request JSON:
+    {
+        "items": [
+            {
+                "id": "Optional id echoed back with the result",
+                "text": "Text to process",
+                ... any /process option for this item (strength, custom_hype_terms, context, ...)
+            }
+        ],
+        ... any /process option, for the items that don't set it
+    }
+    
+    Returns:
+        An application/x-ndjson stream with one line per item, in the order
+        the items finish:
+        {"index": 0, "id": "...", "status": 200, "result": {... as /process ...}}
+        {"index": 1, "id": "...", "status": 500, "error": "Error message"}
+        and a last line {"done": true, "items": 2, "failed": 1}.
+    """
+    try:
+        data = read_json_body(current_app.config.get("HYPE_BATCH_MAX_BYTES", 10 * 1024 * 1024))
+    except RequestBodyError as e:
+        return jsonify({"error": str(e)}), e.status
+    
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "A list of items is required"}), 400
+    max_items = current_app.config.get("HYPE_BATCH_MAX_ITEMS", 1000)
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} items are allowed per batch"}), 413
+    
+    defaults = {name: data[name] for name in BATCH_ITEM_OPTIONS if name in data}
+    if "no-cache" in request.headers.get("Cache-Control", ""):
+        defaults["use_cache"] = False
+    
+    def generate():
+        failed = 0
+        for outcome in remove_hype_batch(items, defaults):
+            failed += outcome["status"] != 200
+            yield json.dumps(outcome) + "\n"
+        yield json.dumps({"done": True, "items": len(items), "failed": failed}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@hype_remover_bp.route("/cache", methods=["DELETE"])
+def clear_cache():
+    """
+    Drop every cached hype removal result (e.g. after a prompt or model change).
+    
+    Only available when CACHE_ADMIN_TOKEN is set, to callers sending it as
+    "Authorization: Bearer <token>".
+    """
+    token = current_app.config.get("CACHE_ADMIN_TOKEN")
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    invalidate_hype_cache()
+    return jsonify({"success": True})
+
 @hype_remover_bp.route("/research", methods=["POST"])
 def research():
     """
@@ -119,8 +185,11 @@ def research():
     Request JSON:
     {
         "topic": "Topic to research",
-        "use_xai": true/false (default: true),
-        "use_gemini": true/false (default: false)
+        "use_xai": true/false (default: true, prefer xAI over OpenAI),
+        "use_gemini": true/false (default: false, prefer Gemini),
+        "providers": ["xai", "gemini", "openai"] (optional, the providers the router may fall back to; default: all),
+        "force_refresh": true/false (default: false, ignore the cached result),
+        "hedge": true/false (default: HEDGE_REQUESTS, also ask a second provider if the first is slow)
     }
     
     Returns:
@@ -134,14 +203,12 @@ def research():
                 "url": "Source URL (if available)",
                 "description": "Brief description of the source"
             }
-        ]
+        ],
+        "provider": "Provider that produced the result",
+        "cached": true/false,
+        "stale": true/false (served from the cache while a refresh runs)
     }
     """
-    # Get API keys
-    xai_api_key = get_xai_api_key()
-    openai_api_key = get_openai_api_key()
-    gemini_api_key = get_gemini_api_key()
-    
     # Get request data
     data = request.get_json()
     if not data or "topic" not in data:
@@ -150,51 +217,28 @@ def research():
     topic = data["topic"]
     use_xai = data.get("use_xai", True)
     use_gemini = data.get("use_gemini", False)
-    
-    # Check if appropriate API key is available
-    if use_gemini:
-        if not gemini_api_key:
-            use_gemini = False
-            if xai_api_key:
-                use_xai = True
-                current_app.logger.warning("Gemini API key not configured, falling back to xAI")
-            elif openai_api_key:
-                use_xai = False
-                current_app.logger.warning("Gemini API key not configured, falling back to OpenAI")
-            else:
-                return jsonify({"error": "No API keys configured"}), 500
-    elif use_xai and not xai_api_key:
-        if gemini_api_key:
-            use_gemini = True
-            use_xai = False
-            current_app.logger.warning("xAI API key not configured, falling back to Gemini")
-        elif openai_api_key:
-            use_xai = False
-            current_app.logger.warning("xAI API key not configured, falling back to OpenAI")
-        else:
-            return jsonify({"error": "No API keys configured"}), 500
-    elif not use_xai and not openai_api_key:
-        if gemini_api_key:
-            use_gemini = True
-            current_app.logger.warning("OpenAI API key not configured, falling back to Gemini")
-        elif xai_api_key:
-            use_xai = True
-            current_app.logger.warning("OpenAI API key not configured, falling back to xAI")
-        else:
-            return jsonify({"error": "No API keys configured"}), 500
+    providers = data.get("providers")
+    error = check_providers(providers)
+    if error:
+        return jsonify({"error": error}), 400
+    force_refresh = bool(data.get("force_refresh", False))
+    hedge = data.get("hedge")
     
     try:
         # Research the topic
-        api_key = openai_api_key if not use_xai and not use_gemini else None
         result = research_topic(
             topic=topic,
-            api_key=api_key,
             use_xai=use_xai,
-            use_gemini=use_gemini
+            use_gemini=use_gemini,
+            providers=providers,
+            force_refresh=force_refresh,
+            hedge=hedge
         )
         
         return jsonify(result)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error researching topic: {e}")
         return jsonify({"error": str(e)}), 500
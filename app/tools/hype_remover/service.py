@@ -4,20 +4,244 @@ Implementation of the Hype Remover tool functionality.
 """
 import json
 import time
-import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from datetime import datetime
 from flask import current_app, session
+from app.utils import http_client
+from app.utils.deadline import DeadlineExceeded, adopt_deadline, current_deadline, set_deadline
+from app.utils.hedging import hedged_call
+from app.utils.hype_lexicon import STRENGTH_THRESHOLDS, count_prefilter, score_sentences
+from app.utils.json_output import parse_json_response, string_closed
+from app.utils.near_duplicate import get_near_duplicate_index
+from app.utils.provider_router import get_router
+from app.utils.rate_limit import RateLimitExceeded
+from app.utils.result_cache import get_result_cache, make_key, normalize_text
+from app.utils.secrets import get_gemini_api_key, get_openai_api_key, get_xai_api_key
+from app.utils.shared_cache import get_state_store
+from app.utils.singleflight import coalesce
+from app.utils.text_chunks import split_paragraphs, split_text
+from app.utils.word_diff import diff_changes
 from app.utils.xai_api import chat_completion
 from app.utils.gemini_api import chat_completion as gemini_chat_completion
 
-# In-memory storage for saved outputs (in a production environment, this would be a database)
-# Structure: {user_id: {output_id: {timestamp, title, original_text, processed_text, source_url}}}
-saved_outputs = {}
+# Options a batch item may set, passed on to remove_hype
+BATCH_ITEM_OPTIONS = ("strength", "custom_hype_terms", "context", "use_xai", "use_gemini", "providers", "use_cache", "hedge", "fast", "lean", "incremental")
 
-def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None, api_key=None, use_xai=True, use_gemini=False):
+# Models used for hype removal and research by each provider
+LLM_MODELS = {
+    "gemini": "gemini-2.0-flash",
+    "xai": "grok-2-1212",
+    "openai": "gpt-4-turbo",
+}
+
+# Cheaper, faster models tried first in hype removal fast mode
+FAST_LLM_MODELS = {
+    "gemini": "gemini-2.0-flash-lite",
+    "xai": "grok-3-mini",
+    "openai": "gpt-4o-mini",
+}
+
+# Shapes of the JSON objects the models must return; only fields the code relies on are checked
+HYPE_RESULT_SCHEMA = {
+    "type": "object",
+    "required": ["processed_text"],
+    "properties": {
+        "processed_text": {"type": "string"},
+        "changes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["original", "replacement"],
+                "properties": {"original": {"type": "string"}, "replacement": {"type": "string"}}
+            }
+        }
+    }
+}
+HYPE_LEAN_RESULT_SCHEMA = {
+    "type": "object",
+    "required": ["processed_text"],
+    "properties": {
+        "processed_text": {"type": "string"},
+        "edits": {"type": "array", "items": {"type": "object"}}
+    }
+}
+RESEARCH_RESULT_SCHEMA = {
+    "type": "object",
+    "required": ["summary"],
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": {"type": "array", "items": {"type": "string"}},
+        "sources": {"type": "array", "items": {"type": "object"}}
+    }
+}
+
+# OpenAI models accepting response_format (JSON mode)
+OPENAI_JSON_MODE_MODELS = ("gpt-4o", "gpt-4-turbo", "gpt-4-0125", "gpt-3.5-turbo-0125")
+
+# Providers tried, in order, when the requested one has no API key
+PROVIDER_FALLBACKS = {
+    "gemini": ("gemini", "xai", "openai"),
+    "xai": ("xai", "gemini", "openai"),
+    "openai": ("openai", "gemini", "xai"),
+}
+
+# Bump when the hype removal prompts change so cached results are recomputed
+HYPE_PROMPT_VERSION = 1
+
+# Bump when the research prompts change so cached results are recomputed
+RESEARCH_PROMPT_VERSION = 1
+
+# Names of the result caches for hype removal and research
+HYPE_CACHE_NAME = "hype_remover"
+RESEARCH_CACHE_NAME = "research"
+
+# Saved outputs are kept in the state store (shared between workers when SHARED_CACHE_URL is set)
+# under saved_outputs:<user_id> as {output_id: {timestamp, title, original_text, processed_text, source_url}}
+SAVED_OUTPUTS_PREFIX = "saved_outputs:"
+
+def hype_cache_key(text, strength, custom_hype_terms, context, provider, fast=False, lean=False):
+    """
+    Build the result cache key for a hype removal request.
+    
+    Whitespace differences in the text and context and the order of the
+    custom hype terms don't change the key. Fast mode and lean mode results
+    are cached separately, since they come from other models or prompts.
+    """
+    terms = sorted({term.strip() for term in custom_hype_terms or [] if term and term.strip()})
+    return make_key(
+        "remove_hype",
+        HYPE_PROMPT_VERSION,
+        normalize_text(text),
+        strength,
+        terms,
+        normalize_text(context) if context else None,
+        provider,
+        LLM_MODELS[provider],
+        FAST_LLM_MODELS[provider] if fast else None,
+        # Only added in lean mode, so the keys of regular results are unchanged
+        *(["lean"] if lean else [])
+    )
+
+def check_providers(providers):
+    """Get the error message for an invalid providers option, or None if it is valid or not given."""
+    if providers is None:
+        return None
+    if not isinstance(providers, list) or not all(isinstance(provider, str) and provider in LLM_MODELS for provider in providers):
+        return f"providers must be a list of: {', '.join(LLM_MODELS)}"
+    return None
+
+def _api_keys(api_key=None):
+    """Get the API key of each LLM provider, using the caller's OpenAI key if given."""
+    return {"gemini": get_gemini_api_key(), "xai": get_xai_api_key(), "openai": api_key or get_openai_api_key()}
+
+def _preferred_provider(use_xai, use_gemini, api_key=None, providers=None):
+    """
+    Pick the provider a request is routed to first and cached under.
+    
+    This is the requested provider (use_gemini, then use_xai, else OpenAI)
+    or, if it has no API key, the first configured one in PROVIDER_FALLBACKS
+    that the caller accepts.
+    
+    Args:
+        use_xai: Whether xAI was requested over OpenAI.
+        use_gemini: Whether Gemini was requested.
+        api_key: The OpenAI API key passed in by the caller, if any.
+        providers: Optional providers the caller accepts besides the requested one.
+    
+    Returns:
+        The provider name (the requested one if no provider has a key).
+    """
+    requested = "gemini" if use_gemini else "xai" if use_xai else "openai"
+    keys = _api_keys(api_key)
+    for provider in PROVIDER_FALLBACKS[requested]:
+        if keys.get(provider) and (provider == requested or not providers or provider in providers):
+            return provider
+    return requested
+
+def _llm_call(preferred, api_key, hedge, call, models=LLM_MODELS, providers=None):
+    """
+    Call the best available provider, failing over (or hedging) to the next ones.
+    
+    The provider router ranks the providers with an API key by their recent
+    latency and success rate, favouring the preferred one. Results from
+    another provider than the preferred one must not be cached under its key.
+    
+    Args:
+        preferred: The provider the caller asked for.
+        api_key: The OpenAI API key passed in by the caller, if any.
+        hedge: Whether to send the call to a second provider when the first is slow
+            (None uses HEDGE_REQUESTS).
+        call: A function(provider, api_key) making the call with one provider.
+        models: The model each provider's call uses, for the router's statistics.
+        providers: Optional providers the caller accepts besides the preferred one (all by default).
+    
+    Returns:
+        The result of the provider that answered, with the provider's
+        name (and the hedge report when hedging).
+    
+    Raises:
+        Exception: If no provider has an API key, or every provider failed.
+    """
+    if hedge is None:
+        hedge = current_app.config.get("HEDGE_REQUESTS", False)
+    
+    keys = _api_keys(api_key)
+    router = get_router()
+    allowed = [preferred] + [provider for provider in providers if provider != preferred] if providers else None
+    ranked = router.rank(models, keys, preferred=preferred, allowed=allowed)
+    if not ranked:
+        raise Exception("No API keys configured")
+    if ranked[0] != preferred:
+        current_app.logger.info(f"Routing {preferred} request to {ranked[0]}")
+    
+    calls = [
+        (provider, router.timed(provider, models[provider], partial(call, provider, keys[provider] if provider == "openai" else None)))
+        for provider in ranked
+    ]
+    result, report = hedged_call(calls, models, hedge=True) if hedge else router.call(calls)
+    result["provider"] = report["provider"]
+    if hedge:
+        result["hedge"] = report
+    return result
+
+def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None, api_key=None, use_xai=True, use_gemini=False, use_cache=True, hedge=None, fast=None, prefilter=None, lean=None, incremental=None, near_duplicates=True, providers=None):
     """
     Remove hype and exaggerated claims from text using Gemini, xAI, or OpenAI API.
     
+    Results are cached (memory and disk) for HYPE_CACHE_TTL seconds, keyed on
+    the normalized text, strength, custom hype terms, context, fast mode and
+    the preferred provider (see _preferred_provider) and its model; a result
+    the router got from another provider is not cached. If
+    NEAR_DUPLICATE_THRESHOLD is set (it is off by default), a text at least that similar to a cached one with
+    the same options reuses that result's changes.
+    
+    In fast mode the text first goes to the provider's fast model
+    (FAST_LLM_MODELS). Its result is kept if its accuracy score reaches
+    HYPE_FAST_MIN_ACCURACY and every change's confidence reaches
+    HYPE_FAST_MIN_CONFIDENCE; otherwise the text is processed again by the
+    regular model.
+    
+    Texts longer than HYPE_CHUNK_CHARS are split into chunks on paragraph
+    and sentence boundaries, which are processed concurrently (see
+    _remove_hype_chunked).
+    
+    The prefilter first scores each sentence against the local hype lexicon
+    (see app/utils/hype_lexicon.py). A text without hype is returned as is
+    without a provider call. Otherwise only the flagged sentences and
+    HYPE_PREFILTER_CONTEXT sentences around them are processed, unless they
+    make up more than HYPE_PREFILTER_MAX_SHARE of the text.
+    
+    In incremental mode each paragraph is processed and cached on its own,
+    so after an edit only new or changed paragraphs go to the provider and
+    the others are served from the cache. Edited paragraphs are never
+    matched to their near-duplicate old version.
+    
+    In lean mode the model only returns the processed text with short
+    reasons, and the changes are derived from a word diff (see
+    _diff_changes), which roughly halves the output tokens.
+    
     Args:
         text: The text to process.
         strength: The strength of hype removal (mild, moderate, strong).
@@ -26,7 +250,468 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
         api_key: The API key (not used when use_xai or use_gemini is True).
         use_xai: Whether to use xAI API instead of OpenAI API.
         use_gemini: Whether to use Google Gemini API. Takes precedence over use_xai if both are True.
+            The provider router may pick another provider if this one has no
+            API key or is failing or much slower.
+        providers: Optional providers the router may fall back to (all by default).
+        use_cache: Whether to serve a cached result (False refreshes the cached entry).
+        hedge: Whether to also ask a second provider if the first is slow (default HEDGE_REQUESTS).
+        fast: Whether to try the fast model first (default HYPE_FAST_MODE).
+        prefilter: Whether to skip or shrink the provider call with the lexicon (default HYPE_PREFILTER).
+        lean: Whether to derive the changes locally instead of from the model (default HYPE_LEAN_MODE).
+        incremental: Whether to process and cache the text paragraph by paragraph (default HYPE_INCREMENTAL).
+        near_duplicates: Whether a near-duplicate's cached result may be reused (if NEAR_DUPLICATE_THRESHOLD is set).
         
+    Returns:
+        A dictionary containing the original text, processed text, changes made,
+        confidence scores, the provider and model tier ("fast" or "full") used,
+        and whether the result came from the cache.
+    """
+    process = partial(remove_hype, strength=strength, custom_hype_terms=custom_hype_terms, context=context, api_key=api_key,
+                      use_xai=use_xai, use_gemini=use_gemini, use_cache=use_cache, hedge=hedge, fast=fast, lean=lean,
+                      near_duplicates=near_duplicates, providers=providers)
+    chunk_chars = current_app.config.get("HYPE_CHUNK_CHARS", 0)
+    if incremental is None:
+        incremental = current_app.config.get("HYPE_INCREMENTAL", False)
+    if incremental:
+        paragraphs = split_paragraphs(text or "", chunk_chars)
+        if len(paragraphs) > 1:
+            result = _remove_hype_chunked(text, paragraphs, partial(process, prefilter=prefilter, incremental=False, near_duplicates=False))
+            result["incremental"] = {"paragraphs": result.pop("chunks"), "cached": result.pop("cached_chunks")}
+            return result
+    
+    if chunk_chars and len(text or "") > chunk_chars:
+        return _remove_hype_chunked(text, split_text(text, chunk_chars), partial(process, prefilter=prefilter))
+    
+    if prefilter is None:
+        prefilter = current_app.config.get("HYPE_PREFILTER", False)
+    if prefilter and text and text.strip():
+        excerpts = _hype_excerpts(text, strength, custom_hype_terms)
+        sent_chars = sum(end - start for start, end in excerpts)
+        if not excerpts:
+            count_prefilter("clean", len(text), 0)
+            return {
+                "original_text": text,
+                "processed_text": text,
+                "changes": [],
+                "overall_hype_score": 0.0,
+                "accuracy_score": 1.0,
+                "provider": None,
+                "cached": False,
+                "prefilter": {"excerpts": 0, "sent_chars": 0}
+            }
+        if sent_chars <= len(text) * current_app.config.get("HYPE_PREFILTER_MAX_SHARE", 0.8):
+            count_prefilter("excerpts", len(text), sent_chars)
+            result = _remove_hype_chunked(text, excerpts, partial(process, prefilter=False))
+            # The text left out scored clean
+            result["overall_hype_score"] *= sent_chars / len(text)
+            result.pop("cached_chunks")
+            result["prefilter"] = {"excerpts": result.pop("chunks"), "sent_chars": sent_chars}
+            return result
+        count_prefilter("full", len(text), len(text))
+    
+    if fast is None:
+        fast = current_app.config.get("HYPE_FAST_MODE", False)
+    if lean is None:
+        lean = current_app.config.get("HYPE_LEAN_MODE", False)
+    provider = _preferred_provider(use_xai, use_gemini, api_key, providers)
+    key = hype_cache_key(text, strength, custom_hype_terms, context, provider, fast, lean)
+    
+    def call(models):
+        return _llm_call(
+            provider, api_key, hedge,
+            lambda llm, llm_api_key: _remove_hype(
+                text, strength, custom_hype_terms, context, llm_api_key, llm == "xai", llm == "gemini", model=models[llm], lean=lean
+            ),
+            models=models,
+            providers=providers
+        )
+    
+    def cascade():
+        if fast:
+            try:
+                result = call(FAST_LLM_MODELS)
+                if _is_confident(result):
+                    result["tier"] = "fast"
+                    return result
+                current_app.logger.info("Fast model result below the confidence thresholds, escalating")
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                current_app.logger.warning(f"Fast model failed, escalating: {e}")
+        result = call(LLM_MODELS)
+        result["tier"] = "full"
+        return result
+    
+    def compute():
+        # Concurrent requests for the same text share one provider call
+        return coalesce(provider, "remove_hype", key, cascade)
+    
+    def cacheable(result):
+        # A fallback provider's result must not be served as the preferred provider's
+        return result.get("provider") == provider
+    
+    ttl = current_app.config.get("HYPE_CACHE_TTL")
+    if not ttl:
+        result, cached = compute(), False
+    else:
+        cache = get_result_cache(HYPE_CACHE_NAME, ttl=ttl)
+        # The key of an empty text identifies the other options, so only requests sharing them match
+        scope = hype_cache_key("", strength, custom_hype_terms, context, provider, fast, lean)
+        near_duplicate = _find_near_duplicate(HYPE_CACHE_NAME, scope, text, key) if use_cache and near_duplicates else None
+        if near_duplicate is not None:
+            result, similarity = near_duplicate
+            result = _reapply_changes(result, text)
+            result["near_duplicate"] = round(similarity, 3)
+            cached = True
+        else:
+            result, cached = cache.get_or_compute(key, compute, bypass=not use_cache, cacheable=cacheable)
+            if cacheable(result):
+                _index_input(HYPE_CACHE_NAME, scope, text, key)
+    
+    # The cached result may have been computed for differently formatted text
+    result["original_text"] = text
+    result["cached"] = cached
+    return result
+
+def remove_hype_batch(items, defaults=None):
+    """
+    Remove hype from many texts, yielding each result as soon as it is ready.
+    
+    Up to HYPE_BATCH_WORKERS items are processed at once through remove_hype.
+    Each item gets the deadline of a single /process request, within what is
+    left of the batch's. A failing item yields an error and the others go on.
+    
+    Args:
+        items: Dictionaries with a "text", an optional "id" echoed back and any of BATCH_ITEM_OPTIONS.
+        defaults: Options for the items that don't set them.
+    
+    Yields:
+        {"index", "id", "status", "result"} dictionaries in completion order;
+        failed items have an "error" instead of a "result".
+    """
+    app = current_app._get_current_object()
+    batch_deadline = current_deadline()
+    item_budget = current_app.config.get("REQUEST_DEADLINES", {}).get("/tools/hype-remover/process")
+    
+    def process_item(index, item):
+        outcome = {"index": index, "id": item.get("id") if isinstance(item, dict) else None}
+        if not isinstance(item, dict) or not isinstance(item.get("text"), str) or not item["text"].strip():
+            return dict(outcome, status=400, error="Text input is required")
+        options = dict(defaults or {})
+        options.update((name, item[name]) for name in BATCH_ITEM_OPTIONS if name in item)
+        error = check_providers(options.get("providers"))
+        if error:
+            return dict(outcome, status=400, error=error)
+        
+        with app.app_context():
+            budget = item_budget
+            if batch_deadline is not None:
+                remaining = max(batch_deadline.remaining(), 0.001)
+                budget = min(budget, remaining) if budget else remaining
+            set_deadline(budget)
+            try:
+                return dict(outcome, status=200, result=remove_hype(item["text"], **options))
+            except DeadlineExceeded as e:
+                return dict(outcome, status=504, error=str(e))
+            except RateLimitExceeded as e:
+                return dict(outcome, status=429, error=str(e), retry_in=round(e.retry_in, 3))
+            except Exception as e:
+                current_app.logger.error(f"Error removing hype from batch item {index}: {e}")
+                return dict(outcome, status=500, error=str(e))
+    
+    workers = max(min(current_app.config.get("HYPE_BATCH_WORKERS", 8), len(items)), 1)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hype-batch")
+    try:
+        futures = [executor.submit(process_item, index, item) for index, item in enumerate(items)]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Drop the items not started yet if the client went away
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _remove_hype_chunked(text, spans, process):
+    """
+    Remove hype from parts of a text chunk by chunk.
+    
+    Up to HYPE_CHUNK_WORKERS chunks are processed at once, each through the
+    regular path (cache, coalescing, routing), so the latency follows the
+    slowest chunk rather than the length of the text. The results are
+    merged back into one; the text outside the chunks is kept as is.
+    
+    Args:
+        text: The text to process.
+        spans: The (start, end) offsets of the chunks.
+        process: A function(text) removing hype from one chunk.
+    
+    Returns:
+        The merged result (see _merge_chunks).
+    """
+    app = current_app._get_current_object()
+    deadline = current_deadline()
+    
+    def process_chunk(span):
+        with app.app_context():
+            adopt_deadline(deadline)
+            return process(text[span[0]:span[1]])
+    
+    workers = max(min(current_app.config.get("HYPE_CHUNK_WORKERS", 4), len(spans)), 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hype-chunk") as executor:
+        results = list(executor.map(process_chunk, spans))
+    return _merge_chunks(text, spans, results)
+
+def _hype_excerpts(text, strength, custom_hype_terms):
+    """
+    Find the parts of a text the lexicon flags as hype.
+    
+    Sentences scoring at least the strength's threshold are flagged, and
+    HYPE_PREFILTER_CONTEXT sentences on each side are added so the model
+    sees them in context. Overlapping or touching excerpts are merged.
+    
+    Returns:
+        A list of (start, end) offsets of the excerpts, empty if the text is clean.
+    """
+    sentences = score_sentences(text, custom_hype_terms)
+    threshold = STRENGTH_THRESHOLDS.get(strength, STRENGTH_THRESHOLDS["moderate"])
+    context = current_app.config.get("HYPE_PREFILTER_CONTEXT", 1)
+    ranges = []
+    for index, sentence in enumerate(sentences):
+        if sentence["score"] < threshold:
+            continue
+        first, last = max(index - context, 0), min(index + context, len(sentences) - 1)
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1][1] = last
+        else:
+            ranges.append([first, last])
+    return [(sentences[first]["start"], sentences[last]["end"]) for first, last in ranges]
+
+def _merge_chunks(text, spans, results):
+    """
+    Merge the hype removal results of a text's chunks.
+    
+    The processed chunks are joined with the original text between them.
+    Every change gets the "offset" of its original phrase in the full text
+    (None if the phrase isn't found in its chunk; lean mode changes have
+    their offsets shifted instead), and the scores are averaged weighted by
+    chunk length.
+    
+    Args:
+        text: The full text.
+        spans: The (start, end) offsets of the chunks.
+        results: The hype removal result of each chunk.
+    
+    Returns:
+        The result for the full text, with the number of chunks and of chunks served from the cache.
+    """
+    parts = []
+    changes = []
+    position = 0
+    processed_position = 0
+    for (start, end), result in zip(spans, results):
+        parts.append(text[position:start])
+        processed_position += len(parts[-1])
+        parts.append(result.get("processed_text", text[start:end]))
+        position = end
+        
+        search_from = start
+        for change in result.get("changes", []):
+            change = dict(change)
+            if isinstance(change.get("offset"), int) and isinstance(change.get("processed_offset"), int):
+                # Lean mode changes know their offsets in the chunk
+                change["offset"] += start
+                change["processed_offset"] += processed_position
+                changes.append(change)
+                continue
+            original = change.get("original") or ""
+            offset = text.find(original, search_from, end) if original else -1
+            if offset == -1 and original:
+                offset = text.find(original, start, end)
+            if offset != -1:
+                search_from = offset + len(original)
+            change["offset"] = offset if offset != -1 else None
+            changes.append(change)
+        processed_position += len(parts[-1])
+    parts.append(text[position:])
+    
+    lengths = [end - start for start, end in spans]
+    total = sum(lengths) or 1
+    
+    def weighted(score, default):
+        return sum(result.get(score, default) * length for result, length in zip(results, lengths)) / total
+    
+    merged = {
+        "original_text": text,
+        "processed_text": "".join(parts),
+        "changes": changes,
+        "overall_hype_score": weighted("overall_hype_score", 0.5),
+        "accuracy_score": weighted("accuracy_score", 0.9),
+        "provider": Counter(result.get("provider") for result in results).most_common(1)[0][0] if results else None,
+        "chunks": len(spans),
+        "cached_chunks": sum(1 for result in results if result.get("cached")),
+        "cached": all(result.get("cached") for result in results)
+    }
+    tiers = {result["tier"] for result in results if "tier" in result}
+    if tiers:
+        merged["tier"] = "fast" if tiers == {"fast"} else "full"
+    return merged
+
+def _is_confident(result):
+    """
+    Check whether a fast model's hype removal result can be served as is.
+    
+    Its accuracy score must reach HYPE_FAST_MIN_ACCURACY and every change's
+    confidence HYPE_FAST_MIN_CONFIDENCE. Missing or malformed scores fail.
+    """
+    def passes(score, threshold):
+        return isinstance(score, (int, float)) and not isinstance(score, bool) and score >= threshold
+    
+    changes = result.get("changes")
+    if not isinstance(result.get("processed_text"), str) or not isinstance(changes, list):
+        return False
+    if not passes(result.get("accuracy_score"), current_app.config.get("HYPE_FAST_MIN_ACCURACY", 0.85)):
+        return False
+    min_confidence = current_app.config.get("HYPE_FAST_MIN_CONFIDENCE", 0.8)
+    return all(isinstance(change, dict) and passes(change.get("confidence"), min_confidence) for change in changes)
+
+def _find_near_duplicate(name, scope, text, key):
+    """
+    Look up the cached result of an input almost identical to text.
+    
+    Args:
+        name: The name of the result cache and near-duplicate index.
+        scope: The scope the similar input must share (its other request options).
+        text: The input text.
+        key: The exact cache key of the input; indexed inputs are served by the cache itself.
+        
+    Returns:
+        A (result, similarity) tuple, or None if no similar input is cached.
+    """
+    match = _near_duplicate_key(name, scope, text, key)
+    if match is None:
+        return None
+    
+    similar_key, similarity = match
+    result = get_result_cache(name).get(similar_key)
+    if result is None:
+        # The cached result expired or was evicted
+        get_near_duplicate_index(name).remove(similar_key)
+        return None
+    return result, similarity
+
+def _near_duplicate_key(name, scope, text, key):
+    """
+    Find the cache key of an indexed input almost identical to text.
+    
+    Returns:
+        A (similar_key, similarity) tuple, or None if near-duplicate matching
+        is off, the input is indexed itself or nothing similar is.
+    """
+    index = get_near_duplicate_index(name)
+    if index is None or key in index:
+        return None
+    return index.find(scope, text)
+
+def _index_input(name, scope, text, key):
+    """Add an input whose result is cached to the near-duplicate index."""
+    index = get_near_duplicate_index(name)
+    if index is not None:
+        index.add(scope, text, key)
+
+def _reapply_changes(result, text):
+    """
+    Adapt the hype removal result of a near-duplicate text to text.
+    
+    The cached changes are applied to the new text, so the passages both texts
+    share are processed as before and the rest (e.g. a changed date) is kept
+    as is. Each change is applied once, to the next whole-word occurrence of
+    its original phrase after the previous change; changes that can't be
+    located that way are dropped. Lean mode changes are diffed again, so their
+    offsets match text.
+    """
+    ordered = result.get("changes", [])
+    if all(isinstance(change.get("offset"), int) for change in ordered):
+        ordered = sorted(ordered, key=lambda change: change["offset"])
+    parts = []
+    changes = []
+    position = 0
+    for change in ordered:
+        original = change.get("original")
+        start = _find_phrase(text, original, position) if original else -1
+        if start == -1:
+            continue
+        replacement = change.get("replacement", "")
+        parts.append(text[position:start])
+        change = dict(change)
+        if "offset" in change:
+            change["offset"] = start
+        change.pop("processed_offset", None)
+        parts.append(replacement)
+        position = start + len(original)
+        changes.append(change)
+    parts.append(text[position:])
+    processed_text = "".join(parts)
+    
+    if result.get("lean"):
+        changes = _diff_changes(text, processed_text, [dict(change, phrase=change["original"]) for change in changes])
+    result["processed_text"] = processed_text
+    result["changes"] = changes
+    return result
+
+def _find_phrase(text, phrase, start):
+    """Find the first occurrence of phrase in text at or after start that isn't part of a longer word, or -1."""
+    position = text.find(phrase, start)
+    while position != -1:
+        end = position + len(phrase)
+        cuts_word_before = phrase[0].isalnum() and position > 0 and text[position - 1].isalnum()
+        cuts_word_after = phrase[-1].isalnum() and end < len(text) and text[end].isalnum()
+        if not cuts_word_before and not cuts_word_after:
+            return position
+        position = text.find(phrase, position + 1)
+    return -1
+
+def _diff_changes(text, processed_text, edits):
+    """
+    Derive the changes of a lean mode result from a word diff.
+    
+    Each change takes the reason and confidence of the first unused edit
+    whose phrase it contains (or that contains it); changes without one
+    have neither.
+    
+    Args:
+        text: The original text.
+        processed_text: The text returned by the model.
+        edits: The model's {"phrase", "reason", "confidence"} notes.
+    
+    Returns:
+        The changes, with their offsets in text and processed_text.
+    """
+    edits = [edit for edit in edits if isinstance(edit, dict) and isinstance(edit.get("phrase"), str) and edit["phrase"].strip()]
+    changes = diff_changes(text, processed_text)
+    for change in changes:
+        changed = (change["original"] or change["replacement"]).lower()
+        for edit in edits:
+            phrase = edit["phrase"].strip().lower()
+            if phrase in changed or changed in phrase:
+                edits.remove(edit)
+                for field in ("reason", "confidence"):
+                    if field in edit:
+                        change[field] = edit[field]
+                break
+    return changes
+
+def invalidate_hype_cache():
+    """Drop every cached hype removal result."""
+    get_result_cache(HYPE_CACHE_NAME, ttl=current_app.config.get("HYPE_CACHE_TTL")).invalidate()
+
+def _remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+    """
+    Remove hype from text with a provider call, bypassing the result cache.
+    
+    Takes the same arguments as remove_hype, plus the model to use (the
+    provider's LLM_MODELS entry by default). Scores left out by a fast model
+    are not filled in, so fast mode escalates such results. In lean mode the
+    model returns no changes, only short notes, and the changes come from
+    a word diff of the text and the processed text.
+    
     Returns:
         A dictionary containing the original text, processed text, changes made, and confidence scores.
     """
@@ -54,7 +739,26 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
         system_prompt += f"\n\nContext about the text: {context}\nUse this context to better understand the domain and ensure you don't remove legitimate terminology or claims that are factual within this context."
     
     # Prepare the user message
-    user_message = f"""Process the following text to remove hype and exaggerated claims according to the guidelines. 
+    if lean:
+        user_message = f"""Process the following text to remove hype and exaggerated claims according to the guidelines. 
+    Keep everything that isn't hype word for word. Return a JSON object with the following structure:
+    {{
+        "processed_text": "The text with hype removed",
+        "edits": [
+            {{
+                "phrase": "One word of the original phrase you changed",
+                "reason": "Reason in at most five words",
+                "confidence": 0.95 // A number between 0 and 1 indicating your confidence in this change
+            }}
+        ],
+        "overall_hype_score": 0.75, // A number between 0 and 1 indicating the overall level of hype in the original text
+        "accuracy_score": 0.9 // A number between 0 and 1 indicating your confidence in the accuracy of the processed text
+    }}
+    
+    Text to process:
+    {text}"""
+    else:
+        user_message = f"""Process the following text to remove hype and exaggerated claims according to the guidelines. 
     Return a JSON object with the following structure:
     {{
         "processed_text": "The text with hype removed",
@@ -85,41 +789,43 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
         }
     ]
     
+    schema = HYPE_LEAN_RESULT_SCHEMA if lean else HYPE_RESULT_SCHEMA
+    
     try:
         if use_gemini:
             # Use Gemini API
             content = gemini_chat_completion(
                 messages=messages,
-                model="gemini-2.0-flash",  # Use Gemini Flash 2.0
+                model=model or LLM_MODELS["gemini"],  # Use Gemini Flash 2.0
                 temperature=0.2,  # Lower temperature for more consistent results
-                max_tokens=4000   # Adjust based on expected response length
+                max_tokens=4000,  # Adjust based on expected response length
+                json_mode=True
             )
             
             if not content:
                 raise Exception("Failed to get response from Gemini API")
             
-            # Parse the response
-            result = json.loads(content)
+            # Parse the response (tolerating code fences, surrounding prose and truncation)
+            result, method = parse_json_response(content, schema, "remove_hype")
             
         elif use_xai:
             # Use xAI API
             content = chat_completion(
                 messages=messages,
-                model="grok-2-1212",  # Use available model
+                model=model or LLM_MODELS["xai"],  # Use available model
                 temperature=0.2,  # Lower temperature for more consistent results
-                max_tokens=4000   # Adjust based on expected response length
+                max_tokens=4000,  # Adjust based on expected response length
+                json_mode=True
             )
             
             if not content:
                 raise Exception("Failed to get response from xAI API")
             
-            # Parse the response
-            result = json.loads(content)
+            # Parse the response (tolerating code fences, surrounding prose and truncation)
+            result, method = parse_json_response(content, schema, "remove_hype")
             
         else:
             # Use OpenAI API (legacy code path)
-            import requests
-            
             url = "https://api.openai.com/v1/chat/completions"
             
             headers = {
@@ -128,7 +834,7 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
             }
             
             data = {
-                "model": "gpt-4-turbo",
+                "model": model or LLM_MODELS["openai"],
                 "messages": messages,
                 "temperature": 0.2,
                 "max_tokens": 2000,
@@ -136,11 +842,11 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
             }
             
             # Check if the model supports response_format
-            if "gpt-4-turbo" not in data["model"] and "gpt-4-0125" not in data["model"] and "gpt-3.5-turbo-0125" not in data["model"]:
+            if not any(name in data["model"] for name in OPENAI_JSON_MODE_MODELS):
                 # Remove response_format for models that don't support it
                 data.pop("response_format", None)
             
-            response = requests.post(url, json=data, headers=headers)
+            response = http_client.post("openai", url, json=data, headers=headers)
             
             if response.status_code != 200:
                 error_message = f"OpenAI API error: {response.status_code} - {response.text}"
@@ -149,10 +855,20 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
             
             response_data = response.json()
             content = response_data["choices"][0]["message"]["content"]
-            result = json.loads(content)
+            result, method = parse_json_response(content, schema, "remove_hype")
+        
+        # A response cut off inside the processed text would "repair" into a shorter text
+        if method == "repaired" and not string_closed(content, "processed_text"):
+            raise Exception("Response cut off in the processed text")
+        
+        if lean:
+            result["changes"] = _diff_changes(text, result["processed_text"], result.pop("edits", None) or [])
+            result["lean"] = True
         
         # Add the original text to the result
         result["original_text"] = text
+        if model in FAST_LLM_MODELS.values():
+            return result
         
         # Ensure all changes have confidence scores
         for change in result.get("changes", []):
@@ -168,21 +884,94 @@ def remove_hype(text, strength="moderate", custom_hype_terms=None, context=None,
         
         return result
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         error_message = f"Error processing text: {e}"
         current_app.logger.error(error_message)
         raise Exception(error_message)
 
-def research_topic(topic, api_key=None, use_xai=True, use_gemini=False):
+def research_cache_key(topic, provider):
+    """Build the result cache key for a topic; case and whitespace don't matter."""
+    return make_key("research_topic", RESEARCH_PROMPT_VERSION, normalize_text(topic).lower(), provider, LLM_MODELS[provider])
+
+def research_topic(topic, api_key=None, use_xai=True, use_gemini=False, force_refresh=False, hedge=None, providers=None):
     """
     Research the latest information on a topic using Gemini, xAI, or OpenAI API.
     
+    Results are cached per topic and preferred provider (see
+    _preferred_provider); a result the router got from another provider is
+    not cached. For RESEARCH_CACHE_TTL seconds
+    a result is served as is; after that it is served stale for up to
+    RESEARCH_CACHE_MAX_STALE seconds while a background call refreshes it.
+    An almost identical topic (NEAR_DUPLICATE_THRESHOLD, off by default)
+    reuses its result, fresh or stale like the topic's own entry would be.
+    
     Args:
         topic: The topic to research.
         api_key: The API key (not used when use_xai or use_gemini is True).
         use_xai: Whether to use xAI API instead of OpenAI API.
         use_gemini: Whether to use Google Gemini API. Takes precedence over use_xai if both are True.
+            The provider router may pick another provider if this one has no
+            API key or is failing or much slower.
+        providers: Optional providers the router may fall back to (all by default).
+        force_refresh: Whether to ignore the cached result and research the topic again.
+        hedge: Whether to also ask a second provider if the first is slow (default HEDGE_REQUESTS).
         
+    Returns:
+        A dictionary containing the research results, and whether they came
+        from the cache and were stale.
+    """
+    provider = _preferred_provider(use_xai, use_gemini, api_key, providers)
+    key = research_cache_key(topic, provider)
+    
+    def compute():
+        # Concurrent requests for the same topic share one provider call
+        return coalesce(provider, "research_topic", key, lambda: _llm_call(
+            provider, api_key, hedge,
+            lambda llm, llm_api_key: _research_topic(topic, llm_api_key, llm == "xai", llm == "gemini"),
+            providers=providers
+        ))
+    
+    def cacheable(result):
+        return result.get("provider") == provider
+    
+    fresh_ttl = current_app.config.get("RESEARCH_CACHE_TTL")
+    if not fresh_ttl:
+        result, state = compute(), "miss"
+    else:
+        cache = get_result_cache(RESEARCH_CACHE_NAME)
+        scope = research_cache_key("", provider)
+        max_stale = current_app.config.get("RESEARCH_CACHE_MAX_STALE", 0)
+        # A near-duplicate topic's entry is served with its own freshness, and refreshed like it
+        match = None if force_refresh else _near_duplicate_key(RESEARCH_CACHE_NAME, scope, topic, key)
+        result, state = cache.get_or_revalidate(
+            match[0] if match else key,
+            compute,
+            fresh_ttl=fresh_ttl,
+            max_stale=max_stale,
+            force_refresh=force_refresh,
+            cacheable=cacheable
+        )
+        if match is not None and state != "miss":
+            result["near_duplicate"] = round(match[1], 3)
+        elif cacheable(result):
+            if match is not None:
+                # The similar topic's entry was gone; keep the new result under this topic too
+                cache.set(key, result, ttl=fresh_ttl + max_stale)
+            _index_input(RESEARCH_CACHE_NAME, scope, topic, key)
+    
+    result["topic"] = topic
+    result["cached"] = state in ("fresh", "stale")
+    result["stale"] = state == "stale"
+    return result
+
+def _research_topic(topic, api_key, use_xai, use_gemini):
+    """
+    Research a topic with a provider call, bypassing the result cache.
+    
+    Takes the same arguments as research_topic.
+    
     Returns:
         A dictionary containing the research results.
     """
@@ -232,36 +1021,36 @@ def research_topic(topic, api_key=None, use_xai=True, use_gemini=False):
             # Use Gemini API
             content = gemini_chat_completion(
                 messages=messages,
-                model="gemini-2.0-flash",  # Use Gemini Flash 2.0
+                model=LLM_MODELS["gemini"],  # Use Gemini Flash 2.0
                 temperature=0.2,  # Lower temperature for more consistent results
-                max_tokens=4000   # Adjust based on expected response length
+                max_tokens=4000,  # Adjust based on expected response length
+                json_mode=True
             )
             
             if not content:
                 raise Exception("Failed to get response from Gemini API")
             
-            # Parse the response
-            result = json.loads(content)
+            # Parse the response (tolerating code fences, surrounding prose and truncation)
+            result, method = parse_json_response(content, RESEARCH_RESULT_SCHEMA, "research_topic")
             
         elif use_xai:
             # Use xAI API
             content = chat_completion(
                 messages=messages,
-                model="grok-2-1212",  # Use available model
+                model=LLM_MODELS["xai"],  # Use available model
                 temperature=0.2,  # Lower temperature for more consistent results
-                max_tokens=4000   # Adjust based on expected response length
+                max_tokens=4000,  # Adjust based on expected response length
+                json_mode=True
             )
             
             if not content:
                 raise Exception("Failed to get response from xAI API")
             
-            # Parse the response
-            result = json.loads(content)
+            # Parse the response (tolerating code fences, surrounding prose and truncation)
+            result, method = parse_json_response(content, RESEARCH_RESULT_SCHEMA, "research_topic")
             
         else:
             # Use OpenAI API
-            import requests
-            
             url = "https://api.openai.com/v1/chat/completions"
             
             headers = {
@@ -270,7 +1059,7 @@ def research_topic(topic, api_key=None, use_xai=True, use_gemini=False):
             }
             
             data = {
-                "model": "gpt-4-turbo",
+                "model": LLM_MODELS["openai"],
                 "messages": messages,
                 "temperature": 0.2,
                 "max_tokens": 2000,
@@ -278,11 +1067,11 @@ def research_topic(topic, api_key=None, use_xai=True, use_gemini=False):
             }
             
             # Check if the model supports response_format
-            if "gpt-4-turbo" not in data["model"] and "gpt-4-0125" not in data["model"] and "gpt-3.5-turbo-0125" not in data["model"]:
+            if not any(name in data["model"] for name in OPENAI_JSON_MODE_MODELS):
                 # Remove response_format for models that don't support it
                 data.pop("response_format", None)
             
-            response = requests.post(url, json=data, headers=headers)
+            response = http_client.post("openai", url, json=data, headers=headers)
             
             if response.status_code != 200:
                 error_message = f"OpenAI API error: {response.status_code} - {response.text}"
@@ -291,21 +1080,33 @@ def research_topic(topic, api_key=None, use_xai=True, use_gemini=False):
             
             response_data = response.json()
             content = response_data["choices"][0]["message"]["content"]
-            result = json.loads(content)
+            result, method = parse_json_response(content, RESEARCH_RESULT_SCHEMA, "research_topic")
+        
+        # A response cut off inside the summary would "repair" into a shorter summary
+        if method == "repaired" and not string_closed(content, "summary"):
+            raise Exception("Response cut off in the summary")
         
         # Add the original topic to the result
         result["topic"] = topic
         
         return result
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         error_message = f"Error researching topic: {e}"
         current_app.logger.error(error_message)
         raise Exception(error_message)
 
+def _saved_outputs_key():
+    """Get the state store key of the current user's saved outputs."""
+    # Get a unique user ID (in a real app, this would be the user's ID)
+    user_id = session.get('user_id', 'anonymous')
+    return f"{SAVED_OUTPUTS_PREFIX}{user_id}"
+
 def save_output(title, original_text, processed_text, source_url=None):
     """
-    Save processed text to local memory.
+    Save processed text to the state store.
     
     Args:
         title: Title for the saved output.
@@ -317,18 +1118,10 @@ def save_output(title, original_text, processed_text, source_url=None):
         The ID of the saved output.
     """
     try:
-        # Get a unique user ID (in a real app, this would be the user's ID)
-        user_id = session.get('user_id', 'anonymous')
-        
-        # Initialize user's saved outputs if not exists
-        if user_id not in saved_outputs:
-            saved_outputs[user_id] = {}
-        
         # Generate a unique ID for this output
         output_id = str(int(time.time()))
         
-        # Save the output
-        saved_outputs[user_id][output_id] = {
+        output = {
             'timestamp': datetime.now().isoformat(),
             'title': title,
             'original_text': original_text,
@@ -336,6 +1129,9 @@ def save_output(title, original_text, processed_text, source_url=None):
             'source_url': source_url
         }
         
+        # Save the output (other workers may be saving outputs of the same user)
+        get_state_store().update(_saved_outputs_key(), lambda outputs: dict(outputs or {}, **{output_id: output}))
+        
         return output_id
     
     except Exception as e:
@@ -350,11 +1146,8 @@ def get_saved_outputs():
         A dictionary of saved outputs.
     """
     try:
-        # Get a unique user ID (in a real app, this would be the user's ID)
-        user_id = session.get('user_id', 'anonymous')
-        
         # Return user's saved outputs or empty dict if none
-        return saved_outputs.get(user_id, {})
+        return get_state_store().get(_saved_outputs_key()) or {}
     
     except Exception as e:
         current_app.logger.error(f"Error getting saved outputs: {e}")
@@ -371,11 +1164,8 @@ def get_saved_output(output_id):
         The saved output or None if not found.
     """
     try:
-        # Get a unique user ID (in a real app, this would be the user's ID)
-        user_id = session.get('user_id', 'anonymous')
-        
         # Return the specific saved output or None if not found
-        return saved_outputs.get(user_id, {}).get(output_id)
+        return (get_state_store().get(_saved_outputs_key()) or {}).get(output_id)
     
     except Exception as e:
         current_app.logger.error(f"Error getting saved output: {e}")
@@ -392,15 +1182,15 @@ def delete_saved_output(output_id):
         True if deleted successfully, False otherwise.
     """
     try:
-        # Get a unique user ID (in a real app, this would be the user's ID)
-        user_id = session.get('user_id', 'anonymous')
+        store = get_state_store()
+        key = _saved_outputs_key()
         
         # Delete the output if it exists
-        if user_id in saved_outputs and output_id in saved_outputs[user_id]:
-            del saved_outputs[user_id][output_id]
-            return True
+        if output_id not in (store.get(key) or {}):
+            return False
         
-        return False
+        store.update(key, lambda outputs: {saved_id: output for saved_id, output in (outputs or {}).items() if saved_id != output_id})
+        return True
     
     except Exception as e:
         current_app.logger.error(f"Error deleting saved output: {e}")
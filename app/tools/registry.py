@@ -0,0 +1,104 @@
+"""
+Minocrisy AI Tools - Tool Registry
+Registers tool blueprints from the tool list served at /api/tools.
+"""
+import threading
+from importlib import import_module
+from flask import Flask, current_app, request
+from app.routes import TOOLS
+
+# HTTP methods routed to lazily loaded tools
+LAZY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+
+def load_blueprint(tool):
+    """
+    Import a tool package and return its blueprint.
+    
+    Tool packages follow the app.tools.<name> layout and expose <name>_bp.
+    """
+    package = import_module(tool["package"])
+    name = tool["package"].rsplit(".", 1)[-1]
+    return getattr(package, f"{name}_bp")
+
+class LazyTool:
+    """
+    Placeholder for a tool whose blueprint is imported on its first request.
+    
+    At startup only two URL rules are added for the tool's url prefix: its
+    index page (so url_for("<tool>.index") keeps working in templates) and a
+    catch-all for everything below it. The first request imports the tool
+    package, maps its blueprint on a private URL map and dispatches to it.
+    """
+    
+    def __init__(self, tool):
+        self.tool = tool
+        self.name = tool["package"].rsplit(".", 1)[-1]
+        self.url_prefix = tool["endpoint"]
+        self._lock = threading.Lock()
+        self._url_map = None
+        self._view_functions = None
+    
+    @property
+    def loaded(self):
+        """Whether the tool's blueprint has been imported."""
+        return self._url_map is not None
+    
+    def register(self, app):
+        """Add the placeholder URL rules to the app."""
+        app.add_url_rule(f"{self.url_prefix}/", f"{self.name}.index", self.dispatch, methods=LAZY_METHODS)
+        app.add_url_rule(f"{self.url_prefix}/<path:path>", f"{self.name}._lazy", self.dispatch, methods=LAZY_METHODS)
+    
+    def load(self):
+        """Import the tool's blueprint and build its URL map (once)."""
+        if self._url_map is not None:
+            return
+        
+        with self._lock:
+            if self._url_map is None:
+                blueprint = load_blueprint(self.tool)
+                
+                # Map the blueprint on a private app so the real app's setup stays closed
+                shadow_app = Flask(self.tool["package"])
+                shadow_app.register_blueprint(blueprint, url_prefix=self.url_prefix)
+                
+                self._view_functions = shadow_app.view_functions
+                self._url_map = shadow_app.url_map
+    
+    def dispatch(self, **kwargs):
+        """Route a request to the tool's real view function."""
+        self.load()
+        
+        # Raises NotFound/MethodNotAllowed/redirects just like the main URL map
+        adapter = self._url_map.bind_to_environ(request.environ)
+        endpoint, args = adapter.match()
+        
+        return current_app.ensure_sync(self._view_functions[endpoint])(**args)
+
+def register_tools(app):
+    """
+    Register the blueprint of every available tool.
+    
+    Tools that need an API key are skipped when the key is not configured.
+    With LAZY_TOOL_LOADING enabled a tool package is only imported on the
+    first request to it instead of at startup.
+    
+    Args:
+        app: The Flask application.
+    """
+    lazy_tools = app.extensions.setdefault("lazy_tools", {})
+    
+    for tool in TOOLS:
+        if tool.get("api") and not app.config.get(f"{tool['api'].upper()}_API_KEY"):
+            continue
+        
+        if app.config.get("LAZY_TOOL_LOADING"):
+            lazy_tool = LazyTool(tool)
+            lazy_tool.register(app)
+            lazy_tools[tool["id"]] = lazy_tool
+        else:
+            app.register_blueprint(load_blueprint(tool), url_prefix=tool["endpoint"])
+
+def load_tools(app):
+    """Import every lazily registered tool now (e.g. during warmup or preload)."""
+    for lazy_tool in app.extensions.get("lazy_tools", {}).values():
+        lazy_tool.load()
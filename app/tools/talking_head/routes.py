@@ -8,7 +8,9 @@ import uuid
 from flask import request, jsonify, current_app, render_template, url_for
 from werkzeug.utils import secure_filename
 from app.tools.talking_head import talking_head_bp
-from app.tools.talking_head.service import generate_audio, generate_talking_head, generate_image
+from app.tools.talking_head.service import generate_audio, generate_talking_head, generate_image, MIN_STAGE_SECONDS
+from app.utils.deadline import DeadlineExceeded, check_deadline
+from app.utils.rate_limit import RateLimitExceeded
 from app.utils.openai_api import download_image
 from app.utils.secrets import get_elevenlabs_api_key, get_elevenlabs_voice_id, get_runwayml_api_key, get_openai_api_key, get_xai_api_key
 
@@ -272,12 +274,14 @@ def generate():
         with tempfile.TemporaryDirectory() as temp_dir:
             # Generate audio from text using ElevenLabs
             audio_path = os.path.join(temp_dir, f"{request_id}.mp3")
+            check_deadline("text-to-speech", MIN_STAGE_SECONDS["audio"])
             generate_audio(text, audio_path, voice_id, elevenlabs_api_key)
             
             # Generate or get the face image
             image_url = None
             if image_generator != "default":
                 # Generate an image using the specified generator and get it as a data URI
+                check_deadline("image generation", MIN_STAGE_SECONDS["image"])
                 image_url = generate_image(
                     image_prompt, 
                     generator=image_generator, 
@@ -315,6 +319,7 @@ def generate():
                         base64_image = base64.b64encode(image_data).decode("utf-8")
                         image_url = f"data:{mime_type};base64,{base64_image}"
             
+            check_deadline("video generation", MIN_STAGE_SECONDS["video"])
             generate_talking_head(audio_path, video_path, runwayml_api_key, image_url)
             
             # Save the video to a permanent location
@@ -370,6 +375,8 @@ def generate():
             
             return jsonify(response_data)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error generating talking head: {e}")
         return jsonify({"error": str(e)}), 500
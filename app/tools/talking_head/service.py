@@ -3,28 +3,67 @@ Minocrisy AI Tools - Talking Head Service
 Implementation of the Talking Head tool functionality.
 """
 import os
-import requests
 import json
 import time
+import asyncio
 import uuid
+import base64
+import threading
 from flask import current_app
-from app.utils.openai_api import generate_image_dalle, generate_image_gpt4o, download_image
+from app.utils import async_http, http_client
+from app.utils.deadline import DeadlineExceeded, check_deadline
+from app.utils.rate_limit import RateLimitExceeded
+from app.utils.openai_api import generate_image_dalle, generate_image_gpt4o, download_image, download_image_async
 from app.utils.xai_api import generate_image as generate_image_xai
 from app.utils.gemini_api import generate_image as generate_image_gemini
 
-def generate_audio(text, output_path, voice_id, api_key):
+# Minimum remaining request budget (in seconds) needed to start each stage
+MIN_STAGE_SECONDS = {
+    "audio": 2,
+    "image": 5,
+    "video": 30,
+}
+
+# RunwayML image-to-video endpoint (Gen-3 Turbo)
+RUNWAYML_URL = "https://api.dev.runwayml.com/v1/image_to_video"
+
+# Seconds between RunwayML job status polls, and polls before giving up (5 minutes)
+POLL_INTERVAL = 5
+MAX_POLL_ATTEMPTS = 60
+
+# Face image used when no image is generated or uploaded
+DEFAULT_FACE_URL = "https://storage.googleapis.com/minocrisy-ai-tools/default_face.jpg"
+
+# The default face image is downloaded once per process and kept in memory
+_default_face_data = None
+_default_face_lock = threading.Lock()
+
+def get_default_face():
     """
-    Generate audio from text using ElevenLabs API.
+    Get the default face image, downloading it on first use.
     
-    Args:
-        text: The text to convert to speech.
-        output_path: The path to save the audio file.
-        voice_id: The ID of the voice to use.
-        api_key: The ElevenLabs API key.
-        
     Returns:
-        The path to the generated audio file.
+        The image data as bytes, or None if it could not be downloaded.
     """
+    global _default_face_data
+    
+    if _default_face_data is None:
+        with _default_face_lock:
+            if _default_face_data is None:
+                _default_face_data = download_image(DEFAULT_FACE_URL)
+    
+    return _default_face_data
+
+def get_default_face_data_uri():
+    """Get the default face image as a data URI, or None if it is unavailable."""
+    image_data = get_default_face()
+    if not image_data:
+        return None
+    base64_image = base64.b64encode(image_data).decode("utf-8")
+    return f"data:image/jpeg;base64,{base64_image}"
+
+def _audio_request(text, voice_id, api_key):
+    """Build the URL, headers and body of an ElevenLabs text-to-speech request."""
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
     
     headers = {
@@ -42,19 +81,57 @@ def generate_audio(text, output_path, voice_id, api_key):
         }
     }
     
-    response = requests.post(url, json=data, headers=headers)
-    
+    return url, headers, data
+
+def _raise_for_status(response, error_prefix):
+    """Log and raise an error for any response other than 200 OK."""
     if response.status_code != 200:
-        error_message = f"ElevenLabs API error: {response.status_code} - {response.text}"
+        error_message = f"{error_prefix}: {response.status_code} - {response.text}"
         current_app.logger.error(error_message)
         raise Exception(error_message)
-    
-    # Save the audio file
+
+def _save_file(response, output_path):
+    """Write a response body to a file and return the file's path."""
     with open(output_path, "wb") as f:
         f.write(response.content)
     
     return output_path
 
+def generate_audio(text, output_path, voice_id, api_key):
+    """
+    Generate audio from text using ElevenLabs API.
+    
+    Args:
+        text: The text to convert to speech.
+        output_path: The path to save the audio file.
+        voice_id: The ID of the voice to use.
+        api_key: The ElevenLabs API key.
+        
+    Returns:
+        The path to the generated audio file.
+    """
+    url, headers, data = _audio_request(text, voice_id, api_key)
+    
+    response = http_client.post("elevenlabs", url, json=data, headers=headers)
+    _raise_for_status(response, "ElevenLabs API error")
+    
+    # Save the audio file
+    return _save_file(response, output_path)
+
+async def generate_audio_async(text, output_path, voice_id, api_key):
+    """
+    Generate audio from text using ElevenLabs API without blocking a thread.
+    
+    Takes the same arguments and returns the same value as generate_audio.
+    """
+    url, headers, data = _audio_request(text, voice_id, api_key)
+    
+    response = await async_http.post("elevenlabs", url, json=data, headers=headers)
+    _raise_for_status(response, "ElevenLabs API error")
+    
+    # Save the audio file
+    return _save_file(response, output_path)
+
 def generate_image(prompt, generator="default", model=None, save_path=None, as_data_uri=False):
     """
     Generate an image using the specified AI image generator.
@@ -102,27 +179,21 @@ def generate_image(prompt, generator="default", model=None, save_path=None, as_d
         
         else:
             # Default to using a pre-defined image
-            default_url = "https://storage.googleapis.com/minocrisy-ai-tools/default_face.jpg"
             if as_data_uri:
                 # Convert default image to data URI
-                image_data = download_image(default_url)
-                if image_data:
-                    import base64
-                    base64_image = base64.b64encode(image_data).decode("utf-8")
-                    return f"data:image/jpeg;base64,{base64_image}"
-            return default_url
+                data_uri = get_default_face_data_uri()
+                if data_uri:
+                    return data_uri
+            return DEFAULT_FACE_URL
         
         if not image_url:
             current_app.logger.error(f"Failed to generate image with {generator}")
-            default_url = "https://storage.googleapis.com/minocrisy-ai-tools/default_face.jpg"
             if as_data_uri:
                 # Convert default image to data URI
-                image_data = download_image(default_url)
-                if image_data:
-                    import base64
-                    base64_image = base64.b64encode(image_data).decode("utf-8")
-                    return f"data:image/jpeg;base64,{base64_image}"
-            return default_url
+                data_uri = get_default_face_data_uri()
+                if data_uri:
+                    return data_uri
+            return DEFAULT_FACE_URL
         
         # If save_path is provided, download and save the image
         if save_path or as_data_uri:
@@ -133,7 +204,6 @@ def generate_image(prompt, generator="default", model=None, save_path=None, as_d
                         f.write(image_data)
                 
                 if as_data_uri:
-                    import base64
                     import mimetypes
                     mime_type = mimetypes.guess_type(image_url)[0] or "image/jpeg"
                     base64_image = base64.b64encode(image_data).decode("utf-8")
@@ -144,9 +214,66 @@ def generate_image(prompt, generator="default", model=None, save_path=None, as_d
         
         return image_url
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error generating image: {e}")
-        return "https://storage.googleapis.com/minocrisy-ai-tools/default_face.jpg"
+        return DEFAULT_FACE_URL
+
+def _runwayml_headers(api_key):
+    """Get the headers for RunwayML API requests."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "X-Runway-Version": "2024-11-06"
+    }
+
+def _image_data_uri(image_url, image_data):
+    """Encode downloaded image data as a data URI, keeping the URL if the download failed."""
+    if not image_data:
+        return image_url
+    
+    import mimetypes
+    mime_type = mimetypes.guess_type(image_url)[0] or "image/jpeg"
+    base64_image = base64.b64encode(image_data).decode("utf-8")
+    return f"data:{mime_type};base64,{base64_image}"
+
+def _video_job(audio_path, image_url):
+    """Build the body of a RunwayML generation job."""
+    # Read the audio file
+    with open(audio_path, "rb") as f:
+        audio_data = f.read()
+    
+    return {
+        "model": "gen3a_turbo",
+        "promptImage": image_url,
+        "promptText": "Generate a talking head video",
+        "promptAudio": f"data:audio/mpeg;base64,{audio_data.hex()}"
+    }
+
+def _finished_video_url(status_data):
+    """
+    Check the status of a RunwayML job.
+    
+    Returns:
+        The URL of the finished video, or None while the job is still running.
+    """
+    status = status_data.get("status")
+    
+    if status == "SUCCEEDED":
+        video_url = status_data.get("result", {}).get("video")
+        
+        if not video_url:
+            raise Exception("No video URL in RunwayML response")
+        
+        return video_url
+    
+    elif status == "FAILED":
+        error_message = f"RunwayML job failed: {status_data.get('error', 'Unknown error')}"
+        current_app.logger.error(error_message)
+        raise Exception(error_message)
+    
+    return None
 
 def generate_talking_head(audio_path, output_path, api_key, image_url=None):
     """
@@ -161,96 +288,78 @@ def generate_talking_head(audio_path, output_path, api_key, image_url=None):
     Returns:
         The path to the generated video file.
     """
-    # RunwayML API endpoint for Gen-3 Turbo
-    url = "https://api.dev.runwayml.com/v1/image_to_video"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "X-Runway-Version": "2024-11-06"
-    }
-    
-    # Read the audio file
-    with open(audio_path, "rb") as f:
-        audio_data = f.read()
+    headers = _runwayml_headers(api_key)
     
     # Use the provided image URL or default to the pre-defined image
-    default_image_url = "https://storage.googleapis.com/minocrisy-ai-tools/default_face.jpg"
-    if not image_url:
-        image_url = default_image_url
+    if not image_url or image_url == DEFAULT_FACE_URL:
+        image_url = get_default_face_data_uri() or DEFAULT_FACE_URL
     
     # Download the image and convert to base64 if it's a URL
     if not image_url.startswith("data:image/"):
-        image_data = download_image(image_url)
-        if image_data:
-            import base64
-            import mimetypes
-            mime_type = mimetypes.guess_type(image_url)[0] or "image/jpeg"
-            base64_image = base64.b64encode(image_data).decode("utf-8")
-            image_url = f"data:{mime_type};base64,{base64_image}"
-    
-    # Create a generation job
-    data = {
-        "model": "gen3a_turbo",
-        "promptImage": image_url,
-        "promptText": "Generate a talking head video",
-        "promptAudio": f"data:audio/mpeg;base64,{audio_data.hex()}"
-    }
+        image_url = _image_data_uri(image_url, download_image(image_url))
     
     # Start the generation job
-    response = requests.post(url, json=data, headers=headers)
-    
-    if response.status_code != 200:
-        error_message = f"RunwayML API error: {response.status_code} - {response.text}"
-        current_app.logger.error(error_message)
-        raise Exception(error_message)
-    
-    job_id = response.json().get("id")
+    response = http_client.post("runwayml", RUNWAYML_URL, json=_video_job(audio_path, image_url), headers=headers)
+    _raise_for_status(response, "RunwayML API error")
     
     # Poll for job completion
-    status_url = f"https://api.dev.runwayml.com/v1/image_to_video/{job_id}"
+    status_url = f"{RUNWAYML_URL}/{response.json().get('id')}"
     
-    max_attempts = 60  # 5 minutes (5 seconds * 60)
-    attempts = 0
-    
-    while attempts < max_attempts:
-        time.sleep(5)  # Wait 5 seconds between polls
-        
-        status_response = requests.get(status_url, headers=headers)
+    for attempt in range(MAX_POLL_ATTEMPTS):
+        # Give up early if the request can't afford another poll
+        check_deadline("RunwayML status poll", POLL_INTERVAL)
+        time.sleep(POLL_INTERVAL)
         
-        if status_response.status_code != 200:
-            error_message = f"RunwayML API error: {status_response.status_code} - {status_response.text}"
-            current_app.logger.error(error_message)
-            raise Exception(error_message)
+        status_response = http_client.get("runwayml", status_url, headers=headers)
+        _raise_for_status(status_response, "RunwayML API error")
         
-        status_data = status_response.json()
-        status = status_data.get("status")
-        
-        if status == "SUCCEEDED":
+        video_url = _finished_video_url(status_response.json())
+        if video_url:
             # Download the video
-            video_url = status_data.get("result", {}).get("video")
-            
-            if not video_url:
-                raise Exception("No video URL in RunwayML response")
-            
-            video_response = requests.get(video_url)
-            
-            if video_response.status_code != 200:
-                error_message = f"Error downloading video: {video_response.status_code} - {video_response.text}"
-                current_app.logger.error(error_message)
-                raise Exception(error_message)
-            
-            # Save the video file
-            with open(output_path, "wb") as f:
-                f.write(video_response.content)
-            
-            return output_path
+            video_response = http_client.get("downloads", video_url)
+            _raise_for_status(video_response, "Error downloading video")
+            return _save_file(video_response, output_path)
+    
+    raise Exception("RunwayML job timed out")
+
+async def generate_talking_head_async(audio_path, output_path, api_key, image_url=None):
+    """
+    Generate a talking head video using RunwayML API without blocking a thread.
+    
+    Takes the same arguments and returns the same value as generate_talking_head.
+    While the job runs, the status polls wait on the event loop, so one worker
+    can follow many generations at once.
+    """
+    headers = _runwayml_headers(api_key)
+    
+    # Use the provided image URL or default to the pre-defined image
+    if not image_url or image_url == DEFAULT_FACE_URL:
+        image_url = await asyncio.to_thread(get_default_face_data_uri) or DEFAULT_FACE_URL
+    
+    # Download the image and convert to base64 if it's a URL
+    if not image_url.startswith("data:image/"):
+        image_url = _image_data_uri(image_url, await download_image_async(image_url))
+    
+    # Start the generation job
+    response = await async_http.post("runwayml", RUNWAYML_URL, json=_video_job(audio_path, image_url), headers=headers)
+    _raise_for_status(response, "RunwayML API error")
+    
+    # Poll for job completion
+    status_url = f"{RUNWAYML_URL}/{response.json().get('id')}"
+    
+    for attempt in range(MAX_POLL_ATTEMPTS):
+        # Give up early if the request can't afford another poll
+        check_deadline("RunwayML status poll", POLL_INTERVAL)
+        await asyncio.sleep(POLL_INTERVAL)
         
-        elif status == "FAILED":
-            error_message = f"RunwayML job failed: {status_data.get('error', 'Unknown error')}"
-            current_app.logger.error(error_message)
-            raise Exception(error_message)
+        status_response = await async_http.get("runwayml", status_url, headers=headers)
+        _raise_for_status(status_response, "RunwayML API error")
         
-        attempts += 1
+        video_url = _finished_video_url(status_response.json())
+        if video_url:
+            # Download the video
+            video_response = await async_http.get("downloads", video_url)
+            _raise_for_status(video_response, "Error downloading video")
+            return _save_file(video_response, output_path)
     
     raise Exception("RunwayML job timed out")
@@ -0,0 +1,256 @@
+"""
+Minocrisy AI Tools - Async HTTP Client
+Awaitable provider API calls multiplexed on one shared event loop and connection pool.
+"""
+import asyncio
+import threading
+from collections import Counter
+from app.utils.deadline import current_deadline, DeadlineExceeded
+from app.utils.http_client import (
+    IDEMPOTENT_METHODS, IDEMPOTENT_RETRY_STATUSES, RETRY_STATUSES,
+    _config, _fits_deadline, _pool_size, _retry_counts, _retry_lock, get_timeout
+)
+from app.utils.rate_limit import estimate_tokens, get_limiter, max_wait
+from app.utils.resilience import get_breaker, parse_retry_after, backoff_delay
+
+def load_sdk():
+    """
+    Import httpx.
+    
+    Only loaded once an async provider call is made, so the synchronous
+    request path doesn't pay for it at startup.
+    """
+    import httpx
+    return httpx
+
+class ProviderLoop:
+    """
+    A background event loop that runs every async provider call.
+    
+    Flask runs each async view on an event loop of its own, which would give
+    every request a fresh connection pool. Running the calls on one
+    long-lived loop instead lets all requests share the provider clients
+    (and their kept-alive connections), however many views are awaiting.
+    Cancelling the awaiting task cancels the call on the provider loop.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._clients = {}  # (provider, verify) -> httpx.AsyncClient, used on the loop only
+        self.requests = Counter()
+        self.in_flight = Counter()
+    
+    def loop(self):
+        """Get the provider loop, starting its thread on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="provider-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+    
+    async def run(self, coro):
+        """
+        Run a coroutine on the provider loop and wait for its result.
+        
+        Args:
+            coro: The coroutine to run.
+        
+        Returns:
+            The coroutine's result.
+        """
+        loop = self.loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        
+        # Cancelling the wrapper future also cancels the task on the provider loop
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    def client(self, provider, pool_size, verify=True):
+        """Get the shared client for a provider (call on the provider loop)."""
+        key = (provider, verify)
+        client = self._clients.get(key)
+        if client is None:
+            httpx = load_sdk()
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            client = httpx.AsyncClient(limits=limits, verify=verify)
+            self._clients[key] = client
+        return client
+    
+    def close(self):
+        """Close every client and stop the loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+        
+        async def close_clients():
+            clients = list(self._clients.values())
+            self._clients.clear()
+            for client in clients:
+                await client.aclose()
+        
+        asyncio.run_coroutine_threadsafe(close_clients(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+    
+    def reset(self):
+        """Forget the loop and clients without closing them (after fork, where the thread is gone)."""
+        with self._lock:
+            self._loop = None
+            self._clients = {}
+    
+    def stats(self):
+        """Return request counts and calls in flight per provider."""
+        return {
+            provider: {"requests": self.requests[provider], "in_flight": self.in_flight[provider]}
+            for provider in self.requests
+        }
+
+# Provider loop shared by the whole process
+_provider_loop = ProviderLoop()
+
+async def run(coro):
+    """Run a coroutine on the shared provider loop (e.g. an SDK's async call)."""
+    return await _provider_loop.run(coro)
+
+async def request(provider, method, url, timeout=None, max_retries=None, verify=True, **kwargs):
+    """
+    Send a request through the provider's shared async client.
+    
+    Behaves like http_client.request (timeouts, retries, circuit breakers,
+    rate limits and request deadlines) without blocking a thread while waiting.
+    
+    Args:
+        provider: The provider name used to pick the connection pool.
+        method: The HTTP method.
+        url: The URL to request.
+        timeout: Optional (connect, read) timeout overriding the provider default.
+        max_retries: Optional retry limit overriding HTTP_MAX_RETRIES.
+        verify: Whether to verify TLS certificates.
+        **kwargs: Passed through to httpx.AsyncClient.request.
+    
+    Returns:
+        The httpx.Response object.
+    """
+    # Read request-scoped settings here; the provider loop has no app context
+    payload = kwargs.get("json")
+    settings = {
+        "timeout": timeout or get_timeout(provider),
+        "max_retries": _config("HTTP_MAX_RETRIES", 2) if max_retries is None else max_retries,
+        "max_retry_delay": _config("HTTP_MAX_RETRY_DELAY", 10),
+        "pool_size": _pool_size(provider),
+        "deadline": current_deadline(),
+        "breaker": get_breaker(
+            provider,
+            failure_threshold=_config("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5),
+            recovery_timeout=_config("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 30)
+        ),
+        "limiter": get_limiter(provider, payload.get("model") if isinstance(payload, dict) else None),
+        "tokens": estimate_tokens(payload),
+        "max_wait": max_wait(),
+    }
+    return await _provider_loop.run(_send(provider, method, url, settings, verify, kwargs))
+
+async def _send(provider, method, url, settings, verify, kwargs):
+    """Send a request with retries on the provider loop."""
+    httpx = load_sdk()
+    client = _provider_loop.client(provider, settings["pool_size"], verify)
+    breaker = settings["breaker"]
+    limiter = settings["limiter"]
+    deadline = settings["deadline"]
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    stage = f"{provider} {method.upper()} request"
+    
+    _provider_loop.in_flight[provider] += 1
+    try:
+        attempt = 0
+        while True:
+            connect_timeout, read_timeout = settings["timeout"]
+            if deadline is not None:
+                deadline.check(stage)
+            
+            slot = None
+            if limiter is not None:
+                wait = settings["max_wait"] if deadline is None else min(settings["max_wait"], deadline.remaining())
+                slot = await limiter.acquire_async(settings["tokens"], wait)
+            
+            try:
+                breaker.allow()
+                _provider_loop.requests[provider] += 1
+                if deadline is not None:
+                    # Time spent queueing counts against the budget
+                    connect_timeout, read_timeout = deadline.clamp_timeout(settings["timeout"])
+                response = await client.request(
+                    method, url, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **kwargs
+                )
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except httpx.TransportError as e:
+                if deadline is not None and isinstance(e, httpx.TimeoutException) and deadline.remaining() <= 0:
+                    # The timeout was shortened by the deadline; don't count it against the provider
+                    breaker.release()
+                    raise DeadlineExceeded(stage, deadline.remaining()) from e
+                
+                breaker.record_failure()
+                
+                # A connect timeout never reached the provider, so it is always safe to retry
+                retryable = isinstance(e, httpx.ConnectTimeout) or (idempotent and isinstance(e, httpx.NetworkError))
+                retryable = retryable or (idempotent and isinstance(e, httpx.TimeoutException))
+                delay = backoff_delay(attempt)
+                if not retryable or attempt >= settings["max_retries"] or not _fits_deadline(deadline, delay):
+                    raise
+            else:
+                if response.status_code == 429 and limiter is not None:
+                    # Hold back the other queued calls too
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    limiter.pause(backoff_delay(attempt) if retry_after is None else retry_after)
+                
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                
+                retryable = response.status_code in RETRY_STATUSES or (
+                    idempotent and response.status_code in IDEMPOTENT_RETRY_STATUSES
+                )
+                if not retryable or attempt >= settings["max_retries"]:
+                    return response
+                
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                if delay > settings["max_retry_delay"] or not _fits_deadline(deadline, delay):
+                    return response
+            finally:
+                if slot is not None:
+                    slot.release()
+            
+            with _retry_lock:
+                _retry_counts[provider] += 1
+            
+            await asyncio.sleep(delay)
+            attempt += 1
+    finally:
+        _provider_loop.in_flight[provider] -= 1
+
+async def get(provider, url, **kwargs):
+    """Send a GET request through the provider's shared async client."""
+    return await request(provider, "GET", url, **kwargs)
+
+async def post(provider, url, **kwargs):
+    """Send a POST request through the provider's shared async client."""
+    return await request(provider, "POST", url, **kwargs)
+
+def get_async_stats():
+    """Get request counts and in-flight calls per provider."""
+    return _provider_loop.stats()
+
+def close_async_clients():
+    """Close the async clients and stop the provider loop."""
+    _provider_loop.close()
+
+def reset_after_fork():
+    """Drop the provider loop inherited from the parent process."""
+    _provider_loop.reset()
@@ -0,0 +1,136 @@
+"""
+Minocrisy AI Tools - Request Deadlines
+Request-scoped time budgets shared by every stage and provider call of a request.
+"""
+import time
+from flask import current_app, g, has_app_context, jsonify, request
+
+# Header a client can use to ask for a tighter budget (in seconds)
+DEADLINE_HEADER = "X-Request-Deadline"
+
+class DeadlineExceeded(Exception):
+    """Raised when the remaining request budget cannot cover the next stage."""
+    
+    def __init__(self, stage, remaining, needed=0.0):
+        self.stage = stage
+        self.remaining = remaining
+        self.needed = needed
+        super().__init__(
+            f"Request deadline exceeded before {stage}: "
+            f"{max(remaining, 0.0):.1f}s left, {needed:.1f}s needed"
+        )
+
+class Deadline:
+    """An absolute point in time by which a request must be finished."""
+    
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+    
+    def remaining(self):
+        """Get the number of seconds left in the budget."""
+        return self.expires_at - time.monotonic()
+    
+    def check(self, stage, needed=0.0):
+        """
+        Make sure there is enough budget left for a stage.
+        
+        Args:
+            stage: A short description of the next stage, used in the error.
+            needed: The minimum number of seconds the stage needs.
+        
+        Raises:
+            DeadlineExceeded: If the remaining budget is below needed (or exhausted).
+        """
+        remaining = self.remaining()
+        if remaining <= 0 or remaining < needed:
+            raise DeadlineExceeded(stage, remaining, needed)
+        return remaining
+    
+    def clamp_timeout(self, timeout):
+        """
+        Shrink a timeout so it does not outlive the deadline.
+        
+        Args:
+            timeout: A number of seconds or a (connect, read) tuple.
+        
+        Returns:
+            The timeout with every component capped at the remaining budget.
+        """
+        remaining = max(self.remaining(), 0.001)
+        if isinstance(timeout, (tuple, list)):
+            return tuple(min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+def current_deadline():
+    """Get the deadline of the current request, or None if it has no deadline."""
+    if not has_app_context():
+        return None
+    return g.get("_deadline")
+
+def set_deadline(budget):
+    """
+    Start a deadline for the current request.
+    
+    Args:
+        budget: The number of seconds the request may take, or None to clear it.
+    
+    Returns:
+        The new Deadline, or None.
+    """
+    g._deadline = Deadline(budget) if budget else None
+    return g._deadline
+
+def adopt_deadline(deadline):
+    """
+    Use a deadline started elsewhere in the current app context.
+    
+    Lets work done on another thread for a request stay within that
+    request's budget.
+    
+    Args:
+        deadline: The Deadline (or None).
+    """
+    g._deadline = deadline
+
+def check_deadline(stage, needed=0.0):
+    """Check the current request's deadline (no-op for requests without one)."""
+    deadline = current_deadline()
+    if deadline is not None:
+        return deadline.check(stage, needed)
+    return None
+
+def clamp_timeout(timeout):
+    """Cap a timeout at the current request's remaining budget."""
+    deadline = current_deadline()
+    if deadline is not None:
+        return deadline.clamp_timeout(timeout)
+    return timeout
+
+def start_request_deadline():
+    """
+    Start the deadline for an incoming request.
+    
+    The budget comes from REQUEST_DEADLINES for the request path, falling back
+    to REQUEST_DEADLINE_DEFAULT. A client may ask for a shorter budget with the
+    X-Request-Deadline header, but never for a longer one than configured.
+    """
+    budget = current_app.config.get("REQUEST_DEADLINES", {}).get(request.path)
+    if budget is None:
+        budget = current_app.config.get("REQUEST_DEADLINE_DEFAULT")
+    
+    header_value = request.headers.get(DEADLINE_HEADER)
+    if header_value:
+        try:
+            requested = float(header_value)
+            if requested > 0:
+                budget = min(budget, requested) if budget else requested
+        except ValueError:
+            current_app.logger.warning(f"Ignoring invalid {DEADLINE_HEADER} header: {header_value}")
+    
+    set_deadline(budget)
+
+def handle_deadline_exceeded(error):
+    """Turn a DeadlineExceeded error into a 504 response."""
+    current_app.logger.warning(str(error))
+    return jsonify({"error": str(error), "stage": error.stage}), 504
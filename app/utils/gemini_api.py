@@ -2,12 +2,28 @@
 Minocrisy AI Tools - Google Gemini API Utilities
 Utilities for interacting with the Google Gemini API.
 """
-import google.generativeai as genai
+import asyncio
 from flask import current_app
+from app.utils import async_http
+from app.utils.deadline import DeadlineExceeded, check_deadline, clamp_timeout, current_deadline
+from app.utils.http_client import get_timeout
+from app.utils.rate_limit import RateLimitExceeded, estimate_tokens, get_limiter, max_wait
+from app.utils.resilience import get_breaker, CircuitOpenError
 from app.utils.secrets import get_gemini_api_key
+from app.utils.shared_cache import get_state_store
 
-# Simple in-memory storage for conversation history
-_conversation_memory = {}
+# Conversation history is kept in the state store for a day after the last message
+CONVERSATION_MEMORY_TTL = 24 * 60 * 60
+
+def load_sdk():
+    """
+    Import the Gemini SDK.
+    
+    The SDK takes a large share of application startup time to import, so it
+    is only loaded when Gemini is actually used (or during warmup).
+    """
+    import google.generativeai as genai
+    return genai
 
 def initialize_gemini():
     """Initialize the Gemini API with the API key."""
@@ -16,6 +32,7 @@ def initialize_gemini():
         current_app.logger.error("Gemini API key not configured")
         return False
     
+    genai = load_sdk()
     genai.configure(api_key=api_key)
     return True
 
@@ -83,7 +100,47 @@ def generate_image(prompt, model="imagen-3.0-generate-002", aspect_ratio="1:1",
         current_app.logger.error(f"Error calling Imagen API: {e}")
         return None
 
-def chat_completion(messages, model="gemini-1.5-flash", temperature=0.7, max_tokens=1000):
+def _get_breaker():
+    """Get Gemini's circuit breaker, configured from the app config."""
+    return get_breaker(
+        "gemini",
+        failure_threshold=current_app.config.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5),
+        recovery_timeout=current_app.config.get("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 30)
+    )
+
+def _start_chat(messages, model, temperature, max_tokens, json_mode=False):
+    """Start a Gemini chat from the messages and return it with the message to send."""
+    # Configure generation parameters
+    generation_config = {
+        "temperature": temperature,
+        "top_p": 1,
+        "top_k": 32,
+        "max_output_tokens": max_tokens,
+    }
+    if json_mode:
+        generation_config["response_mime_type"] = "application/json"
+    
+    # Create a model instance
+    genai = load_sdk()
+    model_instance = genai.GenerativeModel(model_name=model, generation_config=generation_config)
+    
+    # Convert messages to Gemini format
+    gemini_messages = []
+    for msg in messages:
+        role = "user" if msg["role"] == "user" else "model"
+        gemini_messages.append({"role": role, "content": msg["content"]})
+    
+    return model_instance.start_chat(history=gemini_messages), gemini_messages[-1]["content"]
+
+def _chat_result(response):
+    """Extract the reply text from a Gemini response."""
+    if response and hasattr(response, 'text'):
+        return response.text
+    
+    current_app.logger.error("No text generated by Gemini API")
+    return None
+
+def chat_completion(messages, model="gemini-1.5-flash", temperature=0.7, max_tokens=1000, json_mode=False):
     """
     Generate a chat completion using the Gemini API.
     
@@ -93,6 +150,7 @@ def chat_completion(messages, model="gemini-1.5-flash", temperature=0.7, max_tok
                Options: "gemini-1.5-flash", "gemini-1.5-pro", "gemini-2.0-flash"
         temperature: Controls randomness (0-1).
         max_tokens: Maximum number of tokens to generate.
+        json_mode: Whether to ask for a JSON object as the response.
         
     Returns:
         The generated response as a string, or None if an error occurred.
@@ -100,54 +158,102 @@ def chat_completion(messages, model="gemini-1.5-flash", temperature=0.7, max_tok
     if not initialize_gemini():
         return None
     
+    # Fail fast while Gemini is unhealthy
+    breaker = _get_breaker()
     try:
-        # Configure generation parameters
-        generation_config = {
-            "temperature": temperature,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": max_tokens,
-        }
-        
-        # Create a model instance
-        model_instance = genai.GenerativeModel(model_name=model, generation_config=generation_config)
+        breaker.allow()
+    except CircuitOpenError as e:
+        current_app.logger.error(f"Error calling Gemini API: {e}")
+        return None
+    
+    try:
+        chat, content = _start_chat(messages, model, temperature, max_tokens, json_mode)
         
-        # Convert messages to Gemini format
-        gemini_messages = []
-        for msg in messages:
-            role = "user" if msg["role"] == "user" else "model"
-            gemini_messages.append({"role": role, "content": msg["content"]})
+        # Generate response, queueing while Gemini is at its rate limits
+        check_deadline("gemini request")
+        limiter = get_limiter("gemini", model)
+        tokens = estimate_tokens({"messages": messages, "max_tokens": max_tokens})
+        slot = limiter.acquire(tokens, max_wait(current_deadline())) if limiter is not None else None
+        try:
+            response = chat.send_message(
+                content,
+                request_options={"timeout": clamp_timeout(get_timeout("gemini")[1])}
+            )
+        finally:
+            if slot is not None:
+                slot.release()
+        breaker.record_success()
         
-        # Generate response
-        chat = model_instance.start_chat(history=gemini_messages)
-        response = chat.send_message(gemini_messages[-1]["content"])
+        return _chat_result(response)
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        breaker.release()
+        raise
+    except Exception as e:
+        breaker.record_failure()
+        current_app.logger.error(f"Error calling Gemini API: {e}")
+        return None
+
+async def chat_completion_async(messages, model="gemini-1.5-flash", temperature=0.7, max_tokens=1000, json_mode=False):
+    """
+    Generate a chat completion using the Gemini API without blocking a thread.
+    
+    Takes the same arguments and returns the same value as chat_completion.
+    The SDK's async call runs on the shared provider loop, where its gRPC
+    channel lives.
+    """
+    if not initialize_gemini():
+        return None
+    
+    # Fail fast while Gemini is unhealthy
+    breaker = _get_breaker()
+    try:
+        breaker.allow()
+    except CircuitOpenError as e:
+        current_app.logger.error(f"Error calling Gemini API: {e}")
+        return None
+    
+    try:
+        chat, content = _start_chat(messages, model, temperature, max_tokens, json_mode)
         
-        if response and hasattr(response, 'text'):
-            return response.text
+        # Generate response, queueing while Gemini is at its rate limits
+        check_deadline("gemini request")
+        limiter = get_limiter("gemini", model)
+        tokens = estimate_tokens({"messages": messages, "max_tokens": max_tokens})
+        slot = await limiter.acquire_async(tokens, max_wait(current_deadline())) if limiter is not None else None
+        try:
+            response = await async_http.run(chat.send_message_async(
+                content,
+                request_options={"timeout": clamp_timeout(get_timeout("gemini")[1])}
+            ))
+        finally:
+            if slot is not None:
+                slot.release()
+        breaker.record_success()
         
-        current_app.logger.error("No text generated by Gemini API")
-        return None
+        return _chat_result(response)
     
+    except (DeadlineExceeded, RateLimitExceeded, asyncio.CancelledError):
+        breaker.release()
+        raise
     except Exception as e:
+        breaker.record_failure()
         current_app.logger.error(f"Error calling Gemini API: {e}")
         return None
 
 def get_conversation_memory(session_id):
     """Get conversation memory for a session."""
-    if session_id not in _conversation_memory:
-        _conversation_memory[session_id] = []
-    return _conversation_memory[session_id]
+    return get_state_store().get(f"conversation:{session_id}") or []
 
 def add_to_conversation_memory(session_id, role, content):
     """Add a message to conversation memory."""
-    if session_id not in _conversation_memory:
-        _conversation_memory[session_id] = []
-    
-    _conversation_memory[session_id].append({
-        "role": role,
-        "content": content
-    })
+    def append(messages):
+        messages = (messages or []) + [{
+            "role": role,
+            "content": content
+        }]
+        
+        # Limit memory size to prevent excessive token usage
+        return messages[-20:]
     
-    # Limit memory size to prevent excessive token usage
-    if len(_conversation_memory[session_id]) > 20:
-        _conversation_memory[session_id] = _conversation_memory[session_id][-20:]
+    get_state_store().update(f"conversation:{session_id}", append, ttl=CONVERSATION_MEMORY_TTL)
@@ -0,0 +1,180 @@
+"""
+Minocrisy AI Tools - Hedged Requests
+Send a slow LLM call to a second provider and use whichever answers first.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from flask import current_app
+from app.utils.deadline import adopt_deadline, current_deadline, DeadlineExceeded
+from app.utils.provider_router import get_router
+
+# Threads running hedged calls in each process
+HEDGE_WORKERS = 32
+
+class HedgeStats:
+    """Hedging outcomes per provider."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hedges = Counter()  # hedges launched while this provider was the primary
+        self.wins = Counter()  # calls this provider answered first, as primary or hedge
+        self.saved_seconds = Counter()  # time saved when the hedge beat this provider
+        self.saved_samples = Counter()
+    
+    def count(self, counter, provider, amount=1):
+        with self._lock:
+            getattr(self, counter)[provider] += amount
+    
+    def stats(self):
+        """Return hedge outcomes per provider."""
+        with self._lock:
+            providers = sorted(set(self.hedges) | set(self.wins))
+        return {
+            provider: {
+                "hedges": self.hedges[provider],
+                "wins": self.wins[provider],
+                "saved_seconds": round(self.saved_seconds[provider], 3),
+                "average_saved_seconds": (
+                    self.saved_seconds[provider] / self.saved_samples[provider] if self.saved_samples[provider] else 0.0
+                )
+            }
+            for provider in providers
+        }
+
+# Statistics and executor shared by every request of the process
+_stats = HedgeStats()
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Get the hedge thread pool (a new one in a forked worker)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+            _executor_pid = os.getpid()
+        return _executor
+
+def hedge_delay(provider, model):
+    """
+    Get how long to wait for a provider before hedging.
+    
+    The delay is the HEDGE_PERCENTILE latency the provider router observed
+    for the provider and model (over every call, hedged or not) once
+    HEDGE_MIN_SAMPLES calls have succeeded, and HEDGE_DEFAULT_DELAY before
+    that, but never below HEDGE_MIN_DELAY.
+    """
+    config = current_app.config
+    window = get_router().backend(provider, model).latency
+    delay = None
+    if len(window) >= config.get("HEDGE_MIN_SAMPLES", 20):
+        delay = window.percentile(config.get("HEDGE_PERCENTILE", 90))
+    if delay is None:
+        delay = config.get("HEDGE_DEFAULT_DELAY", 4.0)
+    return max(delay, config.get("HEDGE_MIN_DELAY", 0.25))
+
+def _run_in_context(app, deadline, fn):
+    """Run a provider call on a pool thread, inside an app context with the request's deadline."""
+    with app.app_context():
+        adopt_deadline(deadline)
+        return fn()
+
+def hedged_call(calls, models, hedge=True):
+    """
+    Call the primary provider and, if it is slow, a second one.
+    
+    The primary call starts at once. If it hasn't answered within its hedge
+    delay (or fails), the next call starts, and the first to return a value
+    wins. A losing call still running is left to finish in the background
+    and its result is ignored; calls that haven't started are cancelled.
+    
+    Args:
+        calls: (provider, function) pairs in order of preference; the first is the primary.
+            The functions should record their latency with the provider
+            router (see ProviderRouter.timed), which the hedge delay is based on.
+        models: The model each provider's call uses.
+        hedge: Whether to hedge at all (False just makes the primary call).
+    
+    Returns:
+        A (value, report) tuple. The report names the provider that answered,
+        whether a hedge was sent and the seconds taken.
+    
+    Raises:
+        Exception: The last error if every call failed.
+    """
+    primary = calls[0][0]
+    started = time.monotonic()
+    if not hedge or len(calls) < 2:
+        value = calls[0][1]()
+        _stats.count("wins", primary)
+        return value, {"provider": primary, "hedged": False, "seconds": round(time.monotonic() - started, 3)}
+    
+    app = current_app._get_current_object()
+    deadline = current_deadline()
+    executor = _get_executor()
+    waiting = list(calls)
+    futures = {}
+    
+    def launch():
+        provider, fn = waiting.pop(0)
+        futures[executor.submit(_run_in_context, app, deadline, fn)] = provider
+    
+    launch()
+    timeout = hedge_delay(primary, models[primary])
+    hedged = False
+    error = None
+    while futures:
+        if deadline is not None:
+            timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+            if timeout <= 0:
+                raise DeadlineExceeded("hedged provider call", deadline.remaining())
+        
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if waiting and not hedged:
+                hedged = True
+                _stats.count("hedges", primary)
+                launch()
+            timeout = None
+            continue
+        
+        for future in done:
+            provider = futures.pop(future)
+            try:
+                value = future.result()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                current_app.logger.warning(f"Hedged call to {provider} failed: {e}")
+                error = e
+                # Fail over to the next provider at once
+                if waiting and not futures:
+                    hedged = True
+                    timeout = None
+                    launch()
+                continue
+            
+            elapsed = time.monotonic() - started
+            _stats.count("wins", provider)
+            for loser, loser_provider in futures.items():
+                if not loser.cancel() and loser_provider == primary:
+                    loser.add_done_callback(_record_saved(primary, started, elapsed))
+            return value, {"provider": provider, "hedged": hedged, "seconds": round(elapsed, 3)}
+    
+    raise error
+
+def _record_saved(primary, started, elapsed):
+    """Build a callback recording how much later the primary answered than the winning hedge."""
+    def record(future):
+        if not future.cancelled() and future.exception() is None:
+            _stats.count("saved_seconds", primary, time.monotonic() - started - elapsed)
+            _stats.count("saved_samples", primary)
+    return record
+
+def get_hedge_stats():
+    """Get hedging outcomes per provider."""
+    return _stats.stats()
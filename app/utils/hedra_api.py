@@ -3,25 +3,17 @@ Minocrisy AI Tools - Hedra API Utilities
 Utilities for interacting with the Hedra API for character video generation.
 """
 import os
-import requests
 import json
 import tempfile
 from flask import current_app
+from app.utils import async_http, http_client
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
 from app.utils.secrets import get_hedra_api_key, get_hedra_api_url
+from app.utils.singleflight import coalesce
 
-def generate_character_video(text, character_id=None, voice_id=None, output_path=None):
-    """
-    Generate a character video using the Hedra API.
-    
-    Args:
-        text: The text for the character to speak.
-        character_id: The ID of the character to use (optional).
-        voice_id: The ID of the voice to use (optional).
-        output_path: The path to save the video file (optional).
-        
-    Returns:
-        The path to the generated video file, or None if an error occurred.
-    """
+def _video_request(text, character_id, voice_id):
+    """Build the URL, headers and body of a video generation request (None without an API key)."""
     api_key = get_hedra_api_key()
     api_url = get_hedra_api_url()
     
@@ -44,28 +36,70 @@ def generate_character_video(text, character_id=None, voice_id=None, output_path
     if voice_id:
         data["voice_id"] = voice_id
     
-    try:
-        response = requests.post(
-            f"{api_url}/generate",
-            headers=headers,
-            json=data
-        )
-        
-        if response.status_code != 200:
-            current_app.logger.error(f"Hedra API error: {response.status_code} - {response.text}")
-            return None
-        
-        # If no output path is provided, create a temporary file
-        if not output_path:
-            temp_dir = tempfile.mkdtemp()
-            output_path = os.path.join(temp_dir, "hedra_video.mp4")
-        
-        # Save the video file
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+    return f"{api_url}/generate", headers, data
+
+def _save_video(response, output_path):
+    """Save the video from a generation response and return its path (None on an API error)."""
+    if response.status_code != 200:
+        current_app.logger.error(f"Hedra API error: {response.status_code} - {response.text}")
+        return None
+    
+    # If no output path is provided, create a temporary file
+    if not output_path:
+        temp_dir = tempfile.mkdtemp()
+        output_path = os.path.join(temp_dir, "hedra_video.mp4")
+    
+    # Save the video file
+    with open(output_path, "wb") as f:
+        f.write(response.content)
+    
+    return output_path
+
+def generate_character_video(text, character_id=None, voice_id=None, output_path=None):
+    """
+    Generate a character video using the Hedra API.
+    
+    Args:
+        text: The text for the character to speak.
+        character_id: The ID of the character to use (optional).
+        voice_id: The ID of the voice to use (optional).
+        output_path: The path to save the video file (optional).
         
-        return output_path
+    Returns:
+        The path to the generated video file, or None if an error occurred.
+    """
+    video_request = _video_request(text, character_id, voice_id)
+    if video_request is None:
+        return None
+    url, headers, data = video_request
+    
+    try:
+        response = http_client.post("hedra", url, headers=headers, json=data)
+        return _save_video(response, output_path)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error calling Hedra API: {e}")
+        return None
+
+async def generate_character_video_async(text, character_id=None, voice_id=None, output_path=None):
+    """
+    Generate a character video using the Hedra API without blocking a thread.
+    
+    Takes the same arguments and returns the same value as generate_character_video.
+    """
+    video_request = _video_request(text, character_id, voice_id)
+    if video_request is None:
+        return None
+    url, headers, data = video_request
+    
+    try:
+        response = await async_http.post("hedra", url, headers=headers, json=data)
+        return _save_video(response, output_path)
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling Hedra API: {e}")
         return None
@@ -88,8 +122,9 @@ def list_characters():
         "Authorization": f"Bearer {api_key}"
     }
     
-    try:
-        response = requests.get(
+    def fetch():
+        response = http_client.get(
+            "hedra",
             f"{api_url}/characters",
             headers=headers
         )
@@ -100,6 +135,12 @@ def list_characters():
         
         return response.json()
     
+    try:
+        # Every page load asks for the list; concurrent requests share one call
+        return coalesce("hedra", "characters", api_url, fetch)
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling Hedra API: {e}")
         return None
@@ -122,8 +163,9 @@ def list_voices():
         "Authorization": f"Bearer {api_key}"
     }
     
-    try:
-        response = requests.get(
+    def fetch():
+        response = http_client.get(
+            "hedra",
             f"{api_url}/voices",
             headers=headers
         )
@@ -134,6 +176,12 @@ def list_voices():
         
         return response.json()
     
+    try:
+        # Every page load asks for the list; concurrent requests share one call
+        return coalesce("hedra", "voices", api_url, fetch)
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling Hedra API: {e}")
         return None
@@ -0,0 +1,328 @@
+"""
+Minocrisy AI Tools - HTTP Client
+Pooled keep-alive HTTP sessions shared by all outbound provider API calls.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app, has_app_context
+from app.utils.deadline import current_deadline, DeadlineExceeded
+from app.utils.rate_limit import estimate_tokens, get_limiter, max_wait
+from app.utils.resilience import get_breaker, parse_retry_after, backoff_delay
+
+# Connection pool size per provider (maximum kept-alive connections per host)
+PROVIDER_POOL_SIZES = {
+    "xai": 10,
+    "openai": 10,
+    "elevenlabs": 10,
+    "runwayml": 10,
+    "hedra": 4,
+    "downloads": 4,
+}
+
+# Pool size for providers not listed above
+DEFAULT_POOL_SIZE = 4
+
+# (connect, read) timeouts in seconds per provider
+PROVIDER_TIMEOUTS = {
+    "xai": (3.05, 60),
+    "openai": (3.05, 90),
+    "gemini": (3.05, 60),
+    "elevenlabs": (3.05, 60),
+    "runwayml": (3.05, 30),
+    "hedra": (3.05, 180),
+    "downloads": (3.05, 60),
+}
+
+# Timeouts for providers not listed above
+DEFAULT_TIMEOUT = (3.05, 60)
+
+# Status codes retried for every method (the provider did not process the request)
+RETRY_STATUSES = {429, 503}
+
+# Status codes and read timeouts are only retried for idempotent methods
+IDEMPOTENT_RETRY_STATUSES = {500, 502, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+class ProviderSessions:
+    """
+    One requests.Session per provider, created lazily and shared across threads.
+    
+    Each session keeps its own urllib3 pool manager, so connections to a
+    provider's hosts are kept alive and reused by every request and thread
+    instead of paying a new TCP+TLS handshake per call.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}  # provider -> requests.Session
+        self._adapters = {}  # provider -> HTTPAdapter
+    
+    def session(self, provider):
+        """Get the shared session for a provider, creating it on first use."""
+        session = self._sessions.get(provider)
+        if session is not None:
+            return session
+        
+        with self._lock:
+            if provider not in self._sessions:
+                pool_size = _pool_size(provider)
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._adapters[provider] = adapter
+                self._sessions[provider] = session
+            return self._sessions[provider]
+    
+    def close(self):
+        """Close every session and drop its pooled connections."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+    
+    def stats(self):
+        """
+        Return connection reuse statistics per provider and host.
+        
+        "requests" counts requests sent through the pool, "connections" the
+        connections opened for them; the difference was served by keep-alive.
+        """
+        with self._lock:
+            adapters = dict(self._adapters)
+        
+        stats = {}
+        for provider, adapter in adapters.items():
+            hosts = {}
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                    "reused": max(pool.num_requests - pool.num_connections, 0),
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "maxsize": adapter._pool_maxsize
+                }
+            stats[provider] = hosts
+        return stats
+
+# Sessions shared by the whole process
+_sessions = ProviderSessions()
+
+# Number of retried calls per provider
+_retry_counts = Counter()
+_retry_lock = threading.Lock()
+
+def _pool_size(provider):
+    """Get the pool size for a provider, honoring HTTP_POOL_SIZES in the app config."""
+    sizes = {}
+    if has_app_context():
+        sizes = current_app.config.get("HTTP_POOL_SIZES") or {}
+    return sizes.get(provider) or PROVIDER_POOL_SIZES.get(provider, DEFAULT_POOL_SIZE)
+
+def _config(key, default):
+    """Read a setting from the app config when an app context is available."""
+    if has_app_context():
+        value = current_app.config.get(key)
+        if value is not None:
+            return value
+    return default
+
+def get_timeout(provider):
+    """
+    Get the (connect, read) timeout for a provider.
+    
+    Args:
+        provider: The provider name.
+        
+    Returns:
+        A (connect, read) tuple in seconds, honoring HTTP_TIMEOUTS in the app config.
+    """
+    timeouts = _config("HTTP_TIMEOUTS", {})
+    return tuple(timeouts.get(provider) or PROVIDER_TIMEOUTS.get(provider, DEFAULT_TIMEOUT))
+
+def get_session(provider):
+    """
+    Get the pooled session for a provider.
+    
+    Args:
+        provider: The provider name (e.g. "xai", "openai", "runwayml").
+    
+    Returns:
+        A requests.Session shared by all callers for that provider.
+    """
+    return _sessions.session(provider)
+
+def request(provider, method, url, timeout=None, max_retries=None, **kwargs):
+    """
+    Send a request through the provider's pooled session.
+    
+    Every call has a connect/read timeout and goes through the provider's
+    circuit breaker, so an open breaker fails fast with CircuitOpenError,
+    and through the provider's rate limiter, so a call queues for up to
+    RATE_LIMIT_MAX_WAIT seconds when the provider is at its limits and then
+    fails with RateLimitExceeded. A 429 pauses the limiter. 429 and 503
+    responses are retried with jittered backoff, honoring Retry-After up to
+    HTTP_MAX_RETRY_DELAY seconds; 5xx responses and timeouts are only
+    retried for idempotent methods. When the request has a deadline,
+    timeouts and retries are shrunk to fit the remaining budget and
+    DeadlineExceeded is raised once it runs out.
+    
+    Args:
+        provider: The provider name used to pick the connection pool.
+        method: The HTTP method.
+        url: The URL to request.
+        timeout: Optional (connect, read) timeout overriding the provider default.
+        max_retries: Optional retry limit overriding HTTP_MAX_RETRIES.
+        **kwargs: Passed through to requests.Session.request.
+    
+    Returns:
+        The requests.Response object.
+    """
+    breaker = get_breaker(
+        provider,
+        failure_threshold=_config("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5),
+        recovery_timeout=_config("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 30)
+    )
+    payload = kwargs.get("json")
+    limiter = get_limiter(provider, payload.get("model") if isinstance(payload, dict) else None)
+    tokens = estimate_tokens(payload)
+    session = get_session(provider)
+    timeout = timeout or get_timeout(provider)
+    max_retries = _config("HTTP_MAX_RETRIES", 2) if max_retries is None else max_retries
+    max_retry_delay = _config("HTTP_MAX_RETRY_DELAY", 10)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    deadline = current_deadline()
+    stage = f"{provider} {method.upper()} request"
+    
+    attempt = 0
+    while True:
+        request_timeout = timeout
+        if deadline is not None:
+            deadline.check(stage)
+        
+        slot = limiter.acquire(tokens, max_wait(deadline)) if limiter is not None else None
+        try:
+            breaker.allow()
+            if deadline is not None:
+                # Time spent queueing counts against the budget
+                request_timeout = deadline.clamp_timeout(timeout)
+            response = session.request(method, url, timeout=request_timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if deadline is not None and isinstance(e, requests.exceptions.Timeout) and deadline.remaining() <= 0:
+                # The timeout was shortened by the deadline; don't count it against the provider
+                breaker.release()
+                raise DeadlineExceeded(stage, deadline.remaining()) from e
+            
+            breaker.record_failure()
+            
+            # A connect timeout never reached the provider, so it is always safe to retry
+            retryable = isinstance(e, requests.exceptions.ConnectTimeout) or (
+                idempotent and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            )
+            delay = backoff_delay(attempt)
+            if not retryable or attempt >= max_retries or not _fits_deadline(deadline, delay):
+                raise
+        else:
+            if response.status_code == 429 and limiter is not None:
+                # Hold back the other queued calls too
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                limiter.pause(backoff_delay(attempt) if retry_after is None else retry_after)
+            
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            
+            retryable = response.status_code in RETRY_STATUSES or (
+                idempotent and response.status_code in IDEMPOTENT_RETRY_STATUSES
+            )
+            if not retryable or attempt >= max_retries:
+                return response
+            
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if delay > max_retry_delay or not _fits_deadline(deadline, delay):
+                # Waiting would tie up the worker for too long; let the caller handle it
+                return response
+            
+            response.close()
+        finally:
+            if slot is not None:
+                slot.release()
+        
+        with _retry_lock:
+            _retry_counts[provider] += 1
+        
+        time.sleep(delay)
+        attempt += 1
+
+def _fits_deadline(deadline, delay):
+    """Check whether there is budget left to wait delay seconds and try again."""
+    return deadline is None or deadline.remaining() > delay
+
+def get(provider, url, **kwargs):
+    """Send a GET request through the provider's pooled session."""
+    return request(provider, "GET", url, **kwargs)
+
+def post(provider, url, **kwargs):
+    """Send a POST request through the provider's pooled session."""
+    return request(provider, "POST", url, **kwargs)
+
+def warm_pools(targets, timeout=(3.05, 5)):
+    """
+    Open a kept-alive connection to each provider ahead of real traffic.
+    
+    A HEAD request completes the TCP and TLS handshakes and leaves the
+    connection in the provider's pool; the response status is irrelevant.
+    
+    Args:
+        targets: A dictionary mapping provider names to a URL on their API host.
+        timeout: The (connect, read) timeout for each warming request.
+        
+    Returns:
+        A dictionary mapping each provider to True if a connection was opened,
+        or to the error message otherwise.
+    """
+    def warm(provider, url):
+        try:
+            get_session(provider).head(url, timeout=timeout, allow_redirects=False).close()
+            return True
+        except requests.exceptions.RequestException as e:
+            return str(e)
+    
+    # Create the sessions here so pool sizes from the app config apply
+    for provider in targets:
+        get_session(provider)
+    
+    with ThreadPoolExecutor(max_workers=max(len(targets), 1)) as executor:
+        futures = {provider: executor.submit(warm, provider, url) for provider, url in targets.items()}
+    
+    return {provider: future.result() for provider, future in futures.items()}
+
+def get_pool_stats():
+    """Get connection reuse statistics for all provider pools."""
+    return _sessions.stats()
+
+def get_retry_stats():
+    """Get the number of retried calls per provider."""
+    with _retry_lock:
+        return dict(_retry_counts)
+
+def reset_retry_stats():
+    """Forget the retry counts (used by tests)."""
+    with _retry_lock:
+        _retry_counts.clear()
+
+def close_sessions():
+    """Close all pooled sessions (e.g. before forking worker processes)."""
+    _sessions.close()
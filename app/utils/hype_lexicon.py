@@ -0,0 +1,209 @@
+"""
+Minocrisy AI Tools - Hype Lexicon
+Local scoring of sentences against a hype lexicon with an Aho-Corasick automaton.
+"""
+import threading
+from collections import Counter, deque
+from functools import lru_cache
+from app.utils.text_chunks import split_sentences
+
+# Built-in hype terms and their weights: 1.0 for hype on its own, 0.5 for
+# intensifiers that only count as hype together with others
+HYPE_LEXICON = {
+    "amazing": 1.0,
+    "astonishing": 1.0,
+    "best-in-class": 1.0,
+    "blazing fast": 1.0,
+    "breakthrough": 1.0,
+    "cutting-edge": 1.0,
+    "disruptive": 1.0,
+    "game changer": 1.0,
+    "game-changer": 1.0,
+    "game-changing": 1.0,
+    "groundbreaking": 1.0,
+    "incredible": 1.0,
+    "industry-leading": 1.0,
+    "jaw-dropping": 1.0,
+    "life-changing": 1.0,
+    "mind-blowing": 1.0,
+    "next-generation": 1.0,
+    "next-level": 1.0,
+    "paradigm shift": 1.0,
+    "revolutionary": 1.0,
+    "revolutionize": 1.0,
+    "revolutionizes": 1.0,
+    "second to none": 1.0,
+    "seamless": 1.0,
+    "seamlessly": 1.0,
+    "state-of-the-art": 1.0,
+    "unbelievable": 1.0,
+    "unmatched": 1.0,
+    "unparalleled": 1.0,
+    "unprecedented": 1.0,
+    "world-class": 1.0,
+    "best": 0.5,
+    "extremely": 0.5,
+    "guaranteed": 0.5,
+    "incredibly": 0.5,
+    "innovative": 0.5,
+    "leading": 0.5,
+    "magic": 0.5,
+    "massive": 0.5,
+    "perfect": 0.5,
+    "powerful": 0.5,
+    "ultimate": 0.5,
+    "unique": 0.5,
+}
+
+# Weight of a caller's custom hype term
+CUSTOM_TERM_WEIGHT = 1.0
+
+# Sentence score needed to flag a sentence, by hype removal strength
+STRENGTH_THRESHOLDS = {
+    "mild": 1.5,
+    "moderate": 1.0,
+    "strong": 0.5,
+}
+
+class HypeMatcher:
+    """
+    An Aho-Corasick automaton over a set of weighted terms.
+    
+    Matching is case-insensitive, treats any whitespace as a space and only
+    reports whole words, in one pass over the text whatever the number of
+    terms.
+    """
+    
+    def __init__(self, weights):
+        self.weights = weights
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for term in weights:
+            self._add(term)
+        self._link()
+    
+    def _add(self, term):
+        state = 0
+        for char in term:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = following
+            state = following
+        self._output[state].append(term)
+    
+    def _link(self):
+        """Set the failure links breadth-first, merging the outputs they lead to."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._output[following] = self._output[following] + self._output[self._fail[following]]
+    
+    def find(self, text, start=0, end=None):
+        """
+        Find the terms in text[start:end].
+        
+        Returns:
+            A list of (start, end, term) tuples of whole-word matches, in order of their end.
+        """
+        end = len(text) if end is None else end
+        matches = []
+        state = 0
+        for index in range(start, end):
+            char = text[index]
+            char = " " if char.isspace() else char.lower()
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for term in self._output[state]:
+                match_start = index + 1 - len(term)
+                if (match_start == start or not text[match_start - 1].isalnum()) and (index + 1 == end or not text[index + 1].isalnum()):
+                    matches.append((match_start, index + 1, term))
+        return matches
+
+@lru_cache(maxsize=64)
+def _matcher(custom_terms):
+    weights = dict(HYPE_LEXICON)
+    for term in custom_terms:
+        weights[term] = max(weights.get(term, 0.0), CUSTOM_TERM_WEIGHT)
+    return HypeMatcher(weights)
+
+def get_matcher(custom_terms=None):
+    """
+    Get the matcher for the built-in lexicon plus custom terms.
+    
+    Matchers are compiled once per set of custom terms and reused.
+    
+    Args:
+        custom_terms: Optional custom hype terms or phrases.
+    """
+    terms = frozenset(" ".join(term.lower().split()) for term in custom_terms or [] if isinstance(term, str) and term.strip())
+    return _matcher(terms)
+
+def score_sentences(text, custom_terms=None):
+    """
+    Score each sentence of a text by the hype terms it contains.
+    
+    Args:
+        text: The text to score.
+        custom_terms: Optional custom hype terms or phrases.
+    
+    Returns:
+        A list of {"start", "end", "score", "terms"} dictionaries, one per sentence.
+    """
+    matcher = get_matcher(custom_terms)
+    sentences = []
+    for start, end in split_sentences(text):
+        terms = [term for _, _, term in matcher.find(text, start, end)]
+        sentences.append({
+            "start": start,
+            "end": end,
+            "score": sum((matcher.weights[term] for term in terms), 0.0),
+            "terms": terms
+        })
+    return sentences
+
+class PrefilterStats:
+    """Counts of prefilter outcomes and of the characters kept from the LLM."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+    
+    def count(self, outcome, total_chars, sent_chars):
+        with self._lock:
+            self._counts[outcome] += 1
+            self._counts["total_chars"] += total_chars
+            self._counts["sent_chars"] += sent_chars
+    
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+    
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+_stats = PrefilterStats()
+
+def count_prefilter(outcome, total_chars, sent_chars):
+    """Count a prefilter outcome ("clean", "excerpts" or "full") and the characters sent to the LLM."""
+    _stats.count(outcome, total_chars, sent_chars)
+
+def get_prefilter_stats():
+    """Get how many texts were clean, sent in excerpts or sent in full, and the characters sent."""
+    return _stats.stats()
+
+def reset_prefilter_stats():
+    """Forget the prefilter counts."""
+    _stats.reset()
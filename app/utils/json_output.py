@@ -0,0 +1,258 @@
+"""
+Minocrisy AI Tools - JSON Output
+Tolerant extraction and validation of JSON objects in LLM responses.
+"""
+import json
+import re
+import threading
+from collections import Counter
+
+# A Markdown code fence around the JSON, with an optional language tag
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+
+# Closing characters of JSON containers
+CLOSERS = {"{": "}", "[": "]"}
+
+# Types of the JSON schema subset understood by validate
+SCHEMA_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+class JSONOutputError(Exception):
+    """Raised when an LLM response holds no usable JSON object."""
+
+def _scan(text, start):
+    """
+    Scan a JSON value starting at an opening brace.
+    
+    Returns:
+        A (end, stack, in_string, last_complete) tuple: the index after the
+        value's closing brace (None if the text ends first), the containers
+        still open, whether the text ends inside a string, and the index
+        after the last complete member when the value is unclosed.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    last_complete = start + 1
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            if not stack or CLOSERS[stack[-1]] != char:
+                return None, stack, False, last_complete
+            stack.pop()
+            if not stack:
+                return index + 1, stack, False, last_complete
+            last_complete = index + 1
+        elif char == ",":
+            last_complete = index
+    return None, stack, in_string, last_complete
+
+def _repair(text, start):
+    """
+    Close a JSON object cut off before its end (e.g. by max_tokens).
+    
+    The open containers are closed after the text as is (closing a cut-off
+    string) or, if that doesn't parse, after dropping the incomplete last
+    member. Returns the repaired JSON text, or None if neither parses.
+    """
+    _, _, in_string, last_complete = _scan(text, start)
+    # Keep everything (closing a cut-off string) or drop the incomplete last member
+    candidates = [text[start:] + ('"' if in_string else ""), text[start:last_complete]]
+    for candidate in candidates:
+        _, open_containers, _, _ = _scan(candidate, 0)
+        repaired = candidate.rstrip().rstrip(",") + "".join(CLOSERS[char] for char in reversed(open_containers))
+        try:
+            json.loads(repaired)
+            return repaired
+        except ValueError:
+            continue
+    return None
+
+def _find_object(text):
+    """
+    Find the outermost balanced JSON object in a text.
+    
+    Returns:
+        A (value, start) tuple: the first balanced {...} that parses as an
+        object (None if there is none), and the index of the brace that was
+        never closed (-1 if none).
+    """
+    start = text.find("{")
+    while start != -1:
+        end, _, _, _ = _scan(text, start)
+        if end is None:
+            break
+        try:
+            value = json.loads(text[start:end])
+            if isinstance(value, dict):
+                return value, start
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None, start
+
+def extract_json(content):
+    """
+    Extract a JSON object from an LLM response.
+    
+    Tries, in order: the whole response, the outermost balanced {...} in
+    the response, the same in the contents of a Markdown code fence, and
+    finally a repair of an object cut off before its end.
+    
+    Args:
+        content: The response text.
+    
+    Returns:
+        A (value, method) tuple, where method is "direct", "extracted" or "repaired".
+    
+    Raises:
+        JSONOutputError: If no JSON object can be found.
+    """
+    if not content:
+        raise JSONOutputError("Empty response")
+    
+    try:
+        value = json.loads(content)
+        if isinstance(value, dict):
+            return value, "direct"
+    except ValueError:
+        pass
+    
+    # A fence inside a JSON string would cut the fence body short, so the whole response goes first
+    fence = FENCE_PATTERN.search(content)
+    for text in [content] + ([fence.group(1)] if fence else []):
+        value, start = _find_object(text)
+        if value is not None:
+            return value, "extracted"
+    
+    if start != -1:
+        repaired = _repair(text, start)
+        if repaired is not None:
+            return json.loads(repaired), "repaired"
+    
+    raise JSONOutputError(f"No JSON object in response: {content[:100]!r}")
+
+def validate(value, schema, path="$"):
+    """
+    Check a value against a JSON schema subset.
+    
+    Supports "type" (object, array, string, number, integer, boolean),
+    "required", "properties" and "items".
+    
+    Returns:
+        A list of error messages, empty if the value is valid.
+    """
+    expected = schema.get("type")
+    if expected is not None:
+        types = SCHEMA_TYPES[expected]
+        if not isinstance(value, types) or (isinstance(value, bool) and expected in ("number", "integer")):
+            return [f"{path} should be of type {expected}"]
+    
+    errors = []
+    if isinstance(value, dict):
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name} is required")
+        for name, property_schema in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(validate(value[name], property_schema, f"{path}.{name}"))
+    if isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+class ParseStats:
+    """Counts of how each tool's LLM responses were parsed."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+    
+    def count(self, name, outcome):
+        with self._lock:
+            self._counts.setdefault(name, Counter())[outcome] += 1
+    
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+_stats = ParseStats()
+
+def parse_json_response(content, schema, name):
+    """
+    Extract and validate the JSON object of an LLM response.
+    
+    Args:
+        content: The response text.
+        schema: The JSON schema subset the object must match.
+        name: The tool name the outcome is counted under.
+    
+    Returns:
+        A (value, method) tuple: the parsed object, and how it was found
+        ("direct", "extracted" or "repaired", see extract_json).
+    
+    Raises:
+        JSONOutputError: If there is no JSON object or it doesn't match the schema.
+    """
+    try:
+        value, method = extract_json(content)
+    except JSONOutputError:
+        _stats.count(name, "failed")
+        raise
+    
+    errors = validate(value, schema)
+    if errors:
+        _stats.count(name, "invalid")
+        raise JSONOutputError(f"Invalid {name} response: {'; '.join(errors[:5])}")
+    
+    _stats.count(name, method)
+    return value, method
+
+def string_closed(content, key):
+    """
+    Check whether the string value of a key ends with its closing quote in a JSON text.
+    
+    A repaired object (see _repair) may end with a string that was cut off,
+    which the repair closed; this tells whether a given member was whole.
+    
+    Args:
+        content: The (possibly cut-off) JSON text.
+        key: The member name.
+    
+    Returns:
+        True if the key has a string value that is closed in content.
+    """
+    match = re.search(rf'"{re.escape(key)}"\s*:\s*"', content)
+    if match is None:
+        return False
+    escaped = False
+    for char in content[match.end():]:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            return True
+    return False
+
+def get_json_output_stats():
+    """Get how often each tool's responses parsed directly, needed extraction or repair, or failed."""
+    return _stats.stats()
@@ -0,0 +1,304 @@
+"""
+Minocrisy AI Tools - Near-Duplicate Index
+MinHash/LSH index for finding cached results of almost identical inputs.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+# MinHash signature length, split into LSH bands of 4 rows each. Pairs more
+# than ~50% similar become candidates; the threshold is checked afterwards.
+NUM_PERM = 64
+BANDS = 16
+
+# Inputs are shingled into overlapping 5-byte windows
+SHINGLE_SIZE = 5
+
+# Shingles hashed per step when computing a signature (bounds memory use)
+SIGNATURE_CHUNK = 4096
+
+# Band postings are buffered in dicts and merged into sorted arrays in batches
+MERGE_THRESHOLD = 4096
+
+# Defaults for indexes created without app config
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_ENTRIES = 100000
+
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+
+def load_numpy():
+    """
+    Import NumPy.
+    
+    Only loaded once an index is used, so the app doesn't pay for it at startup.
+    """
+    import numpy
+    return numpy
+
+def normalize(text):
+    """Normalize text for similarity: lowercase it and drop URLs and whitespace differences."""
+    return " ".join(URL_PATTERN.sub(" ", text or "").lower().split())
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """
+    Hash every window of size bytes of the normalized text.
+    
+    Returns:
+        A sorted NumPy array of the distinct window hashes (empty for empty text).
+    """
+    np = load_numpy()
+    data = np.frombuffer(normalize(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    size = min(size, len(data))
+    if size == 0:
+        return np.empty(0, dtype=np.uint64)
+    
+    count = len(data) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * np.uint64(257) + data[offset:offset + count]
+    return np.unique(hashes)
+
+def scope_hash(scope):
+    """Hash a scope string to a 64-bit integer."""
+    return int.from_bytes(hashlib.blake2b(scope.encode("utf-8"), digest_size=8).digest(), "little")
+
+class NearDuplicateIndex:
+    """
+    Find previously seen inputs that are almost identical to a new one.
+    
+    Each input is reduced to a MinHash signature of its byte shingles, whose
+    matching fraction estimates the Jaccard similarity of two inputs. The
+    signatures are split into bands and every band is looked up in a
+    hash -> slot table, so a lookup costs a few binary searches however
+    many entries are indexed. Only candidates sharing a band are compared.
+    
+    Entries belong to a scope (e.g. the non-text request options), and only
+    entries of the same scope can match. The oldest entries are evicted
+    beyond max_entries.
+    """
+    
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES, seed=1):
+        np = load_numpy()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+        
+        self._signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self._scopes = np.zeros(0, dtype=np.uint64)
+        self._slot_keys = []
+        self._slots = OrderedDict()  # key -> slot, oldest first
+        self._free = []
+        
+        # Per band: sorted band hashes with their slots, plus unmerged postings
+        self._sorted = [(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))] * BANDS
+        self._pending = [{} for _ in range(BANDS)]
+        self._pending_count = 0
+        
+        self.lookups = 0
+        self.matches = 0
+    
+    def signature(self, hashes):
+        """Compute the MinHash signature of shingle hashes."""
+        np = load_numpy()
+        signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+        for start in range(0, len(hashes), SIGNATURE_CHUNK):
+            chunk = hashes[start:start + SIGNATURE_CHUNK, None]
+            # Multiply-shift hashing; the uint64 products wrap around by design
+            values = ((chunk * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+            np.minimum(signature, values.min(axis=0), out=signature)
+        return signature
+    
+    def _band_hashes(self, scopes, signatures):
+        """Hash every band of the signatures together with their scope into an (n, BANDS) array."""
+        np = load_numpy()
+        rows = signatures.reshape(len(signatures), BANDS, -1).astype(np.uint64)
+        hashes = np.repeat(scopes[:, None], BANDS, axis=1)
+        for row in range(rows.shape[2]):
+            hashes = (hashes ^ rows[:, :, row]) * np.uint64(0x100000001B3)
+        return hashes
+    
+    def add(self, scope, text, key):
+        """
+        Index an input.
+        
+        Args:
+            scope: Only inputs of the same scope are compared.
+            text: The input text.
+            key: The key returned when a similar input is looked up.
+        """
+        np = load_numpy()
+        with self._lock:
+            if key in self._slots:
+                self._slots.move_to_end(key)
+                return
+        
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return
+        signature = self.signature(hashes)
+        scope = np.array([scope_hash(scope)], dtype=np.uint64)
+        band_hashes = self._band_hashes(scope, signature[None])[0]
+        
+        with self._lock:
+            if key in self._slots:
+                return
+            while len(self._slots) >= self.max_entries:
+                self._release(self._slots.popitem(last=False)[1])
+            
+            slot = self._free.pop() if self._free else self._grow()
+            self._signatures[slot] = signature
+            self._scopes[slot] = scope[0]
+            self._slot_keys[slot] = key
+            self._slots[key] = slot
+            
+            for band, value in enumerate(band_hashes.tolist()):
+                self._pending[band].setdefault(value, []).append(slot)
+            self._pending_count += 1
+            if self._pending_count >= max(MERGE_THRESHOLD, len(self._slots) // 4):
+                self._merge()
+    
+    def find(self, scope, text):
+        """
+        Find the most similar indexed input of a scope.
+        
+        Args:
+            scope: The scope to search.
+            text: The input text.
+        
+        Returns:
+            A (key, similarity) tuple for the best match at or above the
+            threshold, or None.
+        """
+        np = load_numpy()
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return None
+        signature = self.signature(hashes)
+        scope = scope_hash(scope)
+        band_hashes = self._band_hashes(np.array([scope], dtype=np.uint64), signature[None])[0]
+        
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for band, value in enumerate(band_hashes):
+                candidates.update(self._pending[band].get(int(value), ()))
+                sorted_hashes, sorted_slots = self._sorted[band]
+                start = np.searchsorted(sorted_hashes, value, side="left")
+                end = np.searchsorted(sorted_hashes, value, side="right")
+                candidates.update(sorted_slots[start:end].tolist())
+            
+            # Postings of evicted or reused slots are filtered (or re-verified) here
+            slots = [slot for slot in candidates if self._slot_keys[slot] is not None and self._scopes[slot] == scope]
+            if not slots:
+                return None
+            
+            similarities = (self._signatures[slots] == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None
+            
+            self.matches += 1
+            return self._slot_keys[slots[best]], float(similarities[best])
+    
+    def remove(self, key):
+        """Forget an indexed input."""
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                self._release(slot)
+    
+    def _grow(self):
+        """Allocate a new slot, doubling the signature storage when full (lock held)."""
+        np = load_numpy()
+        slot = len(self._slot_keys)
+        if slot == len(self._signatures):
+            capacity = min(max(2 * slot, 1024), self.max_entries)
+            signatures = np.zeros((capacity, NUM_PERM), dtype=np.uint32)
+            signatures[:slot] = self._signatures
+            scopes = np.zeros(capacity, dtype=np.uint64)
+            scopes[:slot] = self._scopes
+            self._signatures, self._scopes = signatures, scopes
+        self._slot_keys.append(None)
+        return slot
+    
+    def _release(self, slot):
+        """Free a slot; its postings are dropped at the next merge (lock held)."""
+        self._slot_keys[slot] = None
+        self._free.append(slot)
+    
+    def _merge(self):
+        """Rebuild the sorted band tables from the live slots (lock held)."""
+        np = load_numpy()
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        band_hashes = self._band_hashes(self._scopes[slots], self._signatures[slots])
+        for band in range(BANDS):
+            order = np.argsort(band_hashes[:, band], kind="stable")
+            self._sorted[band] = (band_hashes[order, band], slots[order])
+            self._pending[band] = {}
+        self._pending_count = 0
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._slots
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def stats(self):
+        """Return entry, lookup and match counts."""
+        with self._lock:
+            return {
+                "entries": len(self._slots),
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "match_rate": self.matches / self.lookups if self.lookups else 0.0,
+                "signature_bytes": int(self._signatures.nbytes)
+            }
+
+# Near-duplicate indexes keyed by name
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_near_duplicate_index(name):
+    """
+    Get a named near-duplicate index, creating it from the app config on first use.
+    
+    Inputs at least NEAR_DUPLICATE_THRESHOLD similar (0-1) match, and up to
+    NEAR_DUPLICATE_MAX_ENTRIES inputs are kept.
+    
+    Args:
+        name: The index name.
+    
+    Returns:
+        The NearDuplicateIndex, or None if NEAR_DUPLICATE_THRESHOLD is 0.
+    """
+    threshold = current_app.config.get("NEAR_DUPLICATE_THRESHOLD", DEFAULT_THRESHOLD)
+    if not threshold:
+        return None
+    
+    with _indexes_lock:
+        index = _indexes.get(name)
+        if index is None:
+            index = NearDuplicateIndex(
+                threshold=threshold,
+                max_entries=current_app.config.get("NEAR_DUPLICATE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            )
+            _indexes[name] = index
+        return index
+
+def get_near_duplicate_stats():
+    """Get the statistics of every near-duplicate index."""
+    with _indexes_lock:
+        indexes = dict(_indexes)
+    return {name: index.stats() for name, index in indexes.items()}
+
+def reset_near_duplicate_indexes():
+    """Forget all near-duplicate indexes."""
+    with _indexes_lock:
+        _indexes.clear()
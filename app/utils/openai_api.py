@@ -2,12 +2,49 @@
 Minocrisy AI Tools - OpenAI API Utilities
 Utilities for interacting with the OpenAI API.
 """
-import requests
 import json
 import base64
 from flask import current_app
+from app.utils import async_http, http_client
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
 from app.utils.secrets import get_openai_api_key
 
+# Image generation endpoint for the DALL-E models
+DALLE_URL = "https://api.openai.com/v1/images/generations"
+
+def _dalle_request(prompt, model, size, quality, n):
+    """Build the headers and body of an image generation request (None without an API key)."""
+    api_key = get_openai_api_key()
+    
+    if not api_key:
+        current_app.logger.error("OpenAI API key not configured")
+        return None
+    
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    
+    data = {
+        "model": model,
+        "prompt": prompt,
+        "size": size,
+        "quality": quality,
+        "n": n
+    }
+    
+    return headers, data
+
+def _dalle_result(response):
+    """Extract the image URLs from an image generation response (None on an API error)."""
+    if response.status_code != 200:
+        current_app.logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
+        return None
+    
+    result = response.json()
+    return [image["url"] for image in result["data"]]
+
 def generate_image_dalle(prompt, model="dall-e-3", size="1024x1024", quality="standard", n=1):
     """
     Generate an image using OpenAI's DALL-E models.
@@ -27,39 +64,38 @@ def generate_image_dalle(prompt, model="dall-e-3", size="1024x1024", quality="st
     Returns:
         A list of image URLs, or None if an error occurred.
     """
-    api_key = get_openai_api_key()
-    
-    if not api_key:
-        current_app.logger.error("OpenAI API key not configured")
+    dalle_request = _dalle_request(prompt, model, size, quality, n)
+    if dalle_request is None:
         return None
+    headers, data = dalle_request
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    try:
+        response = http_client.post("openai", DALLE_URL, headers=headers, json=data)
+        return _dalle_result(response)
     
-    data = {
-        "model": model,
-        "prompt": prompt,
-        "size": size,
-        "quality": quality,
-        "n": n
-    }
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error calling OpenAI API: {e}")
+        return None
+
+async def generate_image_dalle_async(prompt, model="dall-e-3", size="1024x1024", quality="standard", n=1):
+    """
+    Generate an image using OpenAI's DALL-E models without blocking a thread.
+    
+    Takes the same arguments and returns the same value as generate_image_dalle.
+    """
+    dalle_request = _dalle_request(prompt, model, size, quality, n)
+    if dalle_request is None:
+        return None
+    headers, data = dalle_request
     
     try:
-        response = requests.post(
-            "https://api.openai.com/v1/images/generations",
-            headers=headers,
-            json=data
-        )
-        
-        if response.status_code != 200:
-            current_app.logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
-            return None
-        
-        result = response.json()
-        return [image["url"] for image in result["data"]]
+        response = await async_http.post("openai", DALLE_URL, headers=headers, json=data)
+        return _dalle_result(response)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling OpenAI API: {e}")
         return None
@@ -106,7 +142,8 @@ def generate_image_gpt4o(prompt, model="gpt-4o-mini", size="1024x1024", quality=
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
+            "openai",
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
             json=data
@@ -121,6 +158,8 @@ def generate_image_gpt4o(prompt, model="gpt-4o-mini", size="1024x1024", quality=
         image_url = result["choices"][0]["message"]["content"]
         return image_url
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling OpenAI API: {e}")
         return None
@@ -136,7 +175,32 @@ def download_image(url):
         The image data as bytes, or None if an error occurred.
     """
     try:
-        response = requests.get(url)
+        response = http_client.get("downloads", url)
+        
+        if response.status_code != 200:
+            current_app.logger.error(f"Error downloading image: {response.status_code}")
+            return None
+        
+        return response.content
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error downloading image: {e}")
+        return None
+
+async def download_image_async(url):
+    """
+    Download an image from a URL without blocking a thread.
+    
+    Args:
+        url: The URL of the image to download.
+        
+    Returns:
+        The image data as bytes, or None if an error occurred.
+    """
+    try:
+        response = await async_http.get("downloads", url)
         
         if response.status_code != 200:
             current_app.logger.error(f"Error downloading image: {response.status_code}")
@@ -144,6 +208,8 @@ def download_image(url):
         
         return response.content
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error downloading image: {e}")
         return None
@@ -0,0 +1,227 @@
+"""
+Minocrisy AI Tools - Provider Router
+Pick the LLM provider for each request from observed latency and success rates.
+"""
+import threading
+import time
+from collections import Counter, deque
+from flask import current_app
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
+from app.utils.resilience import CircuitBreaker, get_breaker_states
+
+# Latencies of successful calls kept per backend
+LATENCY_WINDOW = 200
+
+# Outcomes kept per backend for its success rate
+OUTCOME_WINDOW = 50
+
+# Calls a backend needs before its latency and success rate are trusted
+MIN_SAMPLES = 5
+
+# Backends failing more often than this are only used when nothing else is left
+MIN_SUCCESS_RATE = 0.5
+
+# Expected latency of a backend without enough samples (seconds)
+DEFAULT_LATENCY = 5.0
+
+# The caller's preferred provider keeps the request unless another is over twice as good
+PREFERENCE_WEIGHT = 0.5
+
+class LatencyWindow:
+    """A rolling window of the latencies of successful calls."""
+    
+    def __init__(self, size=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+    
+    def record(self, seconds):
+        """Add a latency in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, percent):
+        """
+        Get a latency percentile.
+        
+        Returns:
+            The latency in seconds, or None without samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(int(len(samples) * percent / 100), len(samples) - 1)]
+    
+    def __len__(self):
+        return len(self._samples)
+
+class BackendStats:
+    """Rolling latency and outcomes of one provider and model."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = LatencyWindow()
+        self._outcomes = deque(maxlen=OUTCOME_WINDOW)
+    
+    def record(self, ok, seconds=None):
+        """Record a call's outcome, and its latency if it succeeded."""
+        with self._lock:
+            self._outcomes.append(ok)
+        if ok and seconds is not None:
+            self.latency.record(seconds)
+    
+    def success_rate(self):
+        """Get the share of recent calls that succeeded, or None without enough calls."""
+        with self._lock:
+            if len(self._outcomes) < MIN_SAMPLES:
+                return None
+            return sum(self._outcomes) / len(self._outcomes)
+    
+    def expected_seconds(self):
+        """Estimate the time to a successful answer: median latency over success rate."""
+        latency = self.latency.percentile(50) if len(self.latency) >= MIN_SAMPLES else None
+        rate = self.success_rate()
+        return (DEFAULT_LATENCY if latency is None else latency) / max(1.0 if rate is None else rate, 0.01)
+    
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._outcomes)
+        return {
+            "calls": calls,
+            "success_rate": self.success_rate(),
+            "p50": self.latency.percentile(50),
+            "p90": self.latency.percentile(90),
+            "expected_seconds": round(self.expected_seconds(), 3)
+        }
+
+class ProviderRouter:
+    """
+    Rank the configured providers for a request and fail over between them.
+    
+    Backends (a provider and model) are ranked by their expected time to a
+    successful answer. The caller's preferred provider gets a head start
+    (PREFERENCE_WEIGHT), so a request only moves when another backend is
+    clearly better. Backends with an open circuit breaker or a success rate
+    below MIN_SUCCESS_RATE go to the end of the list.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends = {}
+        self.selected = Counter()
+        self.failovers = Counter()
+    
+    def backend(self, provider, model):
+        """Get the statistics of a backend."""
+        with self._lock:
+            stats = self._backends.get((provider, model))
+            if stats is None:
+                stats = self._backends[(provider, model)] = BackendStats()
+            return stats
+    
+    def healthy(self, provider, model):
+        """Check that a backend's breaker is not open and it mostly succeeds."""
+        breaker = get_breaker_states().get(provider)
+        if breaker is not None and breaker["state"] == CircuitBreaker.OPEN and breaker["retry_in"] > 0:
+            return False
+        rate = self.backend(provider, model).success_rate()
+        return rate is None or rate >= MIN_SUCCESS_RATE
+    
+    def rank(self, models, keys, preferred=None, allowed=None):
+        """
+        Order the usable providers for a request, best first.
+        
+        Args:
+            models: The model used with each provider.
+            keys: The API key of each provider; providers without one are skipped.
+            preferred: The provider the caller asked for.
+            allowed: Optional providers the caller accepts (all by default).
+        
+        Returns:
+            A list of provider names, empty if none is configured.
+        """
+        def score(provider):
+            expected = self.backend(provider, models[provider]).expected_seconds()
+            if provider == preferred:
+                expected *= PREFERENCE_WEIGHT
+            return (not self.healthy(provider, models[provider]), expected)
+        
+        candidates = [provider for provider in (allowed or models) if provider in models and keys.get(provider)]
+        return sorted(candidates, key=score)
+    
+    def timed(self, provider, model, fn):
+        """
+        Wrap a provider call so its outcome and latency are recorded.
+        
+        Calls stopped by the request deadline or our own rate limits say
+        nothing about the provider and aren't recorded.
+        """
+        def call():
+            started = time.monotonic()
+            try:
+                value = fn()
+            except (DeadlineExceeded, RateLimitExceeded):
+                raise
+            except Exception:
+                self.backend(provider, model).record(False)
+                raise
+            self.backend(provider, model).record(True, time.monotonic() - started)
+            return value
+        return call
+    
+    def call(self, calls):
+        """
+        Try provider calls in order until one succeeds.
+        
+        Args:
+            calls: (provider, function) pairs, best first.
+        
+        Returns:
+            A (value, report) tuple; the report names the provider that answered
+            and the number of attempts.
+        
+        Raises:
+            Exception: The last error if every call failed.
+        """
+        error = None
+        for attempt, (provider, fn) in enumerate(calls, 1):
+            if attempt > 1:
+                self.failovers[calls[attempt - 2][0]] += 1
+            try:
+                value = fn()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                current_app.logger.warning(f"Call to {provider} failed, trying the next provider: {e}")
+                error = e
+                continue
+            self.selected[provider] += 1
+            return value, {"provider": provider, "attempts": attempt}
+        raise error
+    
+    def stats(self):
+        """Return backend statistics, selections and failovers."""
+        with self._lock:
+            backends = dict(self._backends)
+        return {
+            "backends": {f"{provider}/{model}": stats.snapshot() for (provider, model), stats in backends.items()},
+            "selected": dict(self.selected),
+            "failovers": dict(self.failovers)
+        }
+
+# Router shared by every request of the process
+_router = ProviderRouter()
+
+def get_router():
+    """Get the process-wide provider router."""
+    return _router
+
+def get_router_stats():
+    """Get the router's backend statistics."""
+    return _router.stats()
+
+def reset_router():
+    """Forget every backend's history."""
+    global _router
+    _router = ProviderRouter()
@@ -0,0 +1,326 @@
+"""
+Minocrisy AI Tools - Rate Limits
+Token-bucket rate limits and in-flight caps for outbound provider calls.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+from flask import current_app, has_app_context, jsonify
+
+# Concurrent calls allowed per provider listed in RATE_LIMITS without a max_in_flight of its own
+PROVIDER_MAX_IN_FLIGHT = {
+    "xai": 10,
+    "openai": 10,
+    "gemini": 10,
+    "elevenlabs": 5,
+    "runwayml": 5,
+    "hedra": 4,
+}
+
+# Seconds between checks for a free slot while an async call waits
+ASYNC_POLL_INTERVAL = 0.02
+
+# Characters per token when estimating the size of a prompt
+CHARS_PER_TOKEN = 4
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not get past its provider's rate limit in time."""
+    
+    def __init__(self, name, retry_in):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"{name} rate limit reached, retry in {retry_in:.1f}s")
+
+class TokenBucket:
+    """
+    A token bucket refilled at rate tokens per second up to capacity.
+    
+    Callers reserve tokens ahead of time: the bucket may go negative, and
+    each caller waits until its share has been refilled. Queued callers are
+    thus spaced out at exactly the refill rate.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, amount, now):
+        """
+        Take tokens, going into debt if needed.
+        
+        Returns:
+            The seconds to wait before the tokens are really available.
+        """
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return max(-self.tokens / self.rate, 0.0)
+    
+    def cancel(self, amount):
+        """Give back tokens of a reservation that was not used."""
+        self.tokens += min(amount, self.capacity)
+
+class Limiter:
+    """
+    Rate limits and an in-flight cap for one provider (or one provider model).
+    
+    A call waits for a free in-flight slot, then reserves one request from
+    the requests-per-second bucket and its estimated tokens from the
+    tokens-per-minute bucket, sleeping until both are available. Calls that
+    would wait longer than their max_wait fail with RateLimitExceeded
+    instead. A 429 from the provider pauses every call for its Retry-After.
+    """
+    
+    def __init__(self, name, rps=None, tpm=None, max_in_flight=None, burst=None):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self._condition = threading.Condition()
+        self._requests = TokenBucket(rps, burst or max(rps, 1)) if rps else None
+        self._tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+        self._paused_until = 0.0
+        self.in_flight = 0
+        self.queued = 0
+        self.counts = Counter()
+        self.wait_seconds = 0.0
+        self.max_queued = 0
+    
+    def _enqueue(self):
+        with self._condition:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+    
+    def _dequeue(self, waited):
+        with self._condition:
+            self.queued -= 1
+            if waited > 0:
+                self.counts["waited"] += 1
+                self.wait_seconds += waited
+    
+    def _try_admit(self, tokens, give_up_at):
+        """
+        Take a slot and reserve the buckets if a slot is free (lock held).
+        
+        Returns:
+            The seconds to wait for the buckets, or None if no slot is free.
+        
+        Raises:
+            RateLimitExceeded: If the buckets can't be available before give_up_at.
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return None
+        
+        now = time.monotonic()
+        wait = max(self._paused_until - now, 0.0)
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1, now))
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens, now))
+        if now + wait > give_up_at:
+            if self._requests is not None:
+                self._requests.cancel(1)
+            if self._tokens is not None and tokens:
+                self._tokens.cancel(tokens)
+            self.counts["rejected"] += 1
+            raise RateLimitExceeded(self.name, wait)
+        
+        self.in_flight += 1
+        self.counts["admitted"] += 1
+        return wait
+    
+    def _reject(self):
+        """Fail a call that gave up waiting for a slot (lock held)."""
+        self.counts["rejected"] += 1
+        raise RateLimitExceeded(self.name, max(self._paused_until - time.monotonic(), 0.0))
+    
+    def acquire(self, tokens=0, max_wait=None):
+        """
+        Wait for the limits to let a call through.
+        
+        Args:
+            tokens: The call's estimated tokens.
+            max_wait: The longest wait in seconds (None waits as long as needed).
+        
+        Returns:
+            A LimiterSlot to release once the call is done.
+        
+        Raises:
+            RateLimitExceeded: If the call would have to wait longer than max_wait.
+        """
+        started = time.monotonic()
+        give_up_at = float("inf") if max_wait is None else started + max_wait
+        blocked = False
+        self._enqueue()
+        try:
+            with self._condition:
+                while True:
+                    wait = self._try_admit(tokens, give_up_at)
+                    if wait is not None:
+                        break
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        self._reject()
+                    blocked = True
+                    self._condition.wait(None if remaining == float("inf") else remaining)
+            if wait > 0:
+                blocked = True
+                time.sleep(wait)
+        finally:
+            self._dequeue(time.monotonic() - started if blocked else 0.0)
+        return LimiterSlot(self)
+    
+    async def acquire_async(self, tokens=0, max_wait=None):
+        """Wait for the limits like acquire, without blocking the event loop."""
+        started = time.monotonic()
+        give_up_at = float("inf") if max_wait is None else started + max_wait
+        blocked = False
+        self._enqueue()
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(tokens, give_up_at)
+                    if wait is None and time.monotonic() >= give_up_at:
+                        self._reject()
+                if wait is not None:
+                    break
+                blocked = True
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+            if wait > 0:
+                blocked = True
+                try:
+                    await asyncio.sleep(wait)
+                except asyncio.CancelledError:
+                    self.release()
+                    raise
+        finally:
+            self._dequeue(time.monotonic() - started if blocked else 0.0)
+        return LimiterSlot(self)
+    
+    def release(self):
+        """Free an in-flight slot."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+    
+    def pause(self, seconds):
+        """Hold back every call for seconds (e.g. the Retry-After of a 429)."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.counts["throttled"] += 1
+    
+    def stats(self):
+        """Return in-flight and queued calls and admission counts."""
+        with self._condition:
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "admitted": self.counts["admitted"],
+                "waited": self.counts["waited"],
+                "wait_seconds": round(self.wait_seconds, 3),
+                "rejected": self.counts["rejected"],
+                "throttled": self.counts["throttled"],
+                "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 3)
+            }
+
+class LimiterSlot:
+    """An admitted call's in-flight slot; released exactly once."""
+    
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._released = False
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+
+# Limiters keyed by provider or provider/model
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _limits():
+    """Get the configured RATE_LIMITS when an app context is available."""
+    if has_app_context():
+        return current_app.config.get("RATE_LIMITS") or {}
+    return {}
+
+def get_limiter(provider, model=None):
+    """
+    Get the limiter for a provider call, creating it on first use.
+    
+    RATE_LIMITS maps a provider, or "provider/model" for a model with a quota
+    of its own, to {"rps", "tpm", "max_in_flight", "burst"}; missing values
+    are not limited, except max_in_flight, which defaults to
+    PROVIDER_MAX_IN_FLIGHT. Providers missing from RATE_LIMITS are not
+    limited at all.
+    
+    Args:
+        provider: The provider name.
+        model: The model called, if any.
+    
+    Returns:
+        The Limiter, or None if the provider isn't limited at all.
+    """
+    limits = _limits()
+    name = f"{provider}/{model}" if model and f"{provider}/{model}" in limits else provider
+    with _limiters_lock:
+        limiter = _limiters.get(name, False)
+        if limiter is False:
+            settings = dict(limits.get(name) or {})
+            if name in limits:
+                settings.setdefault("max_in_flight", PROVIDER_MAX_IN_FLIGHT.get(provider))
+            limiter = Limiter(name, **settings) if any(settings.values()) else None
+            _limiters[name] = limiter
+        return limiter
+
+def max_wait(deadline=None):
+    """Get how long a call may queue: RATE_LIMIT_MAX_WAIT, within the request deadline."""
+    wait = current_app.config.get("RATE_LIMIT_MAX_WAIT", 10) if has_app_context() else 10
+    if deadline is not None:
+        wait = min(wait, deadline.remaining())
+    return wait
+
+def estimate_tokens(payload):
+    """
+    Estimate the tokens of an LLM call from its JSON payload.
+    
+    Counts the prompt at CHARS_PER_TOKEN characters per token plus the
+    maximum completion tokens. Payloads without messages count as 0.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("messages"), list):
+        return 0
+    characters = sum(len(str(message.get("content", ""))) for message in payload["messages"] if isinstance(message, dict))
+    return characters // CHARS_PER_TOKEN + int(payload.get("max_tokens") or 0)
+
+def handle_rate_limit_exceeded(error):
+    """Turn a RateLimitExceeded error into a 429 response with a Retry-After header."""
+    current_app.logger.warning(str(error))
+    response = jsonify({"error": str(error), "limiter": error.name})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(math.ceil(error.retry_in), 1))
+    return response
+
+def get_rate_limit_stats():
+    """Get the in-flight and queued calls of every limiter."""
+    with _limiters_lock:
+        limiters = {name: limiter for name, limiter in _limiters.items() if limiter is not None}
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+def reset_limiters():
+    """Forget every limiter (used by tests and after config changes)."""
+    with _limiters_lock:
+        _limiters.clear()
@@ -0,0 +1,74 @@
+"""
+Minocrisy AI Tools - Request Body
+Reading JSON request bodies that may be gzip-encoded.
+"""
+import json
+import zlib
+from flask import request
+
+# Window bits telling zlib to expect a gzip header
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+class RequestBodyError(Exception):
+    """Raised when a request body can't be read; carries the HTTP status to answer with."""
+    
+    def __init__(self, message, status=400):
+        self.status = status
+        super().__init__(message)
+
+def _read_at_most(stream, limit):
+    """Read from a stream until its end or until limit bytes were read."""
+    chunks = []
+    size = 0
+    while size < limit:
+        chunk = stream.read(limit - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+def read_json_body(max_bytes):
+    """
+    Read the current request's JSON body, decompressing it if gzip-encoded.
+    
+    At most max_bytes + 1 bytes are read, so a body sent without a
+    Content-Length can't be buffered without bound either. A
+    "Content-Encoding: gzip" body is inflated in one pass, stopping as soon
+    as it exceeds max_bytes, so a small compressed body can't expand without
+    bound.
+    
+    Args:
+        max_bytes: The largest (decompressed) body accepted.
+    
+    Returns:
+        The parsed JSON value.
+    
+    Raises:
+        RequestBodyError: If the body is too large (413), in an unsupported encoding (415),
+            or not valid gzip or JSON (400).
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise RequestBodyError(f"Request body larger than {max_bytes} bytes", 413)
+    body = _read_at_most(request.stream, max_bytes + 1)
+    if len(body) > max_bytes:
+        raise RequestBodyError(f"Request body larger than {max_bytes} bytes", 413)
+    
+    encoding = request.headers.get("Content-Encoding", "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise RequestBodyError(f"Invalid gzip body: {e}")
+        if len(body) > max_bytes or decompressor.unconsumed_tail:
+            raise RequestBodyError(f"Decompressed request body larger than {max_bytes} bytes", 413)
+        if not decompressor.eof:
+            raise RequestBodyError("Truncated gzip body")
+    elif encoding not in ("", "identity"):
+        raise RequestBodyError(f"Unsupported Content-Encoding: {encoding}", 415)
+    
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise RequestBodyError(f"Invalid JSON body: {e}")
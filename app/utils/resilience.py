@@ -0,0 +1,176 @@
+"""
+Minocrisy AI Tools - Resilience Utilities
+Circuit breakers and retry backoff for outbound provider API calls.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the provider's circuit breaker is open."""
+    
+    def __init__(self, provider, retry_in):
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"{provider} circuit breaker is open, retry in {retry_in:.1f}s")
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single provider.
+    
+    After failure_threshold consecutive failures the breaker opens and calls
+    fail fast for recovery_timeout seconds. It then lets a single probe call
+    through (half-open); a success closes the breaker, a failure re-opens it.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.total_failures = 0
+        self.total_rejections = 0
+        self.times_opened = 0
+    
+    def allow(self):
+        """
+        Check whether a call may proceed.
+        
+        Raises:
+            CircuitOpenError: If the breaker is open.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.recovery_timeout:
+                    self.total_rejections += 1
+                    raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.total_rejections += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probe_in_flight = True
+    
+    def record_success(self):
+        """Record a successful call."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def release(self):
+        """Finish a call without judging the provider (e.g. the caller gave up)."""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        """Record a failed call, opening the breaker if the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+    
+    def snapshot(self):
+        """Return the breaker state for monitoring."""
+        with self._lock:
+            state = self._state
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "total_failures": self.total_failures,
+                "rejected_calls": self.total_rejections,
+                "times_opened": self.times_opened,
+                "retry_in": retry_in
+            }
+
+# Circuit breakers keyed by provider
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider, failure_threshold=5, recovery_timeout=30):
+    """
+    Get the circuit breaker for a provider, creating it on first use.
+    
+    Args:
+        provider: The provider name.
+        failure_threshold: Consecutive failures before the breaker opens.
+        recovery_timeout: Seconds the breaker stays open before a probe call.
+    
+    Returns:
+        The provider's CircuitBreaker.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider, failure_threshold, recovery_timeout)
+            _breakers[provider] = breaker
+        return breaker
+
+def get_breaker_states():
+    """Get the state of every provider's circuit breaker."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+def reset_breakers():
+    """Forget all circuit breakers (used by tests and after deploys)."""
+    with _breakers_lock:
+        _breakers.clear()
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+    
+    Args:
+        value: The header value, either delay seconds or an HTTP date.
+    
+    Returns:
+        The delay in seconds, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=8.0):
+    """
+    Get a jittered exponential backoff delay.
+    
+    Args:
+        attempt: The zero-based retry attempt.
+        base_delay: The delay before the first retry.
+        max_delay: The upper bound for any single delay.
+    
+    Returns:
+        A delay in seconds drawn uniformly from [0, min(max_delay, base_delay * 2**attempt)].
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
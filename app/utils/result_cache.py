@@ -0,0 +1,434 @@
+"""
+Minocrisy AI Tools - Result Cache
+Tiered (memory LRU, shared store, size-capped disk) cache for expensive provider results.
+"""
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils.shared_cache import get_shared_cache
+
+# Defaults for caches created without app config
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_BYTES = 50 * 1024 * 1024
+DEFAULT_TTL = 24 * 60 * 60
+
+def make_key(*parts):
+    """
+    Build a cache key from JSON-serializable parts.
+    
+    Returns:
+        A hex SHA-256 digest of the parts.
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def normalize_text(text):
+    """Normalize text for cache keys: collapse whitespace runs and strip the ends."""
+    return " ".join((text or "").split())
+
+class MemoryLRU:
+    """A bounded, thread-safe LRU of (value, expires_at) entries."""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, key):
+        """Get an unexpired entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def set(self, key, value, expires_at):
+        """Store an entry, evicting the least recently used ones beyond max_entries."""
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key=None):
+        """Remove one entry, or all entries if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+    
+    def __len__(self):
+        return len(self._entries)
+
+class DiskCache:
+    """
+    A directory of JSON entry files capped at max_bytes.
+    
+    Reading an entry touches its file, so when the cap is reached the least
+    recently used files are removed first.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json"))
+    
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def get(self, key):
+        """Get an unexpired (value, expires_at) entry, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if entry["expires_at"] <= time.time():
+            self.delete(key)
+            return None
+        
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"], entry["expires_at"]
+    
+    def set(self, key, value, expires_at):
+        """Write an entry atomically, then evict old entries beyond max_bytes."""
+        data = json.dumps({"expires_at": expires_at, "value": value}, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        
+        with self._lock:
+            self._size -= self._file_size(path)
+            os.replace(tmp_path, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+    
+    def delete(self, key=None):
+        """Remove one entry, or all entries if no key is given."""
+        with self._lock:
+            paths = [self._path(key)] if key else [
+                entry.path for entry in os.scandir(self.directory) if entry.name.endswith(".json")
+            ]
+            for path in paths:
+                size = self._file_size(path)
+                try:
+                    os.remove(path)
+                    self._size -= size
+                except OSError:
+                    pass
+    
+    def _evict(self):
+        """Remove least recently used files until the cache fits (lock held)."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    
+    @property
+    def size(self):
+        """The total size of the entry files in bytes."""
+        return self._size
+
+class ResultCache:
+    """
+    A memory LRU in front of an optional shared store and a disk tier.
+    
+    The shared store (see shared_cache) is seen by every worker and
+    instance, so a result computed by one worker is a hit for the others.
+    
+    Values must be JSON-serializable. Callers get a copy of the cached value,
+    so mutating a result never changes what is cached.
+    """
+    
+    def __init__(self, name, ttl=DEFAULT_TTL, max_entries=DEFAULT_MEMORY_ENTRIES, directory=None, max_bytes=DEFAULT_DISK_BYTES, shared=None):
+        self.name = name
+        self.ttl = ttl
+        self.memory = MemoryLRU(max_entries)
+        self.shared = shared
+        self.disk = DiskCache(os.path.join(directory, name), max_bytes) if directory else None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._refreshing = set()
+    
+    def _lookup(self, key):
+        """Find an entry in either tier and return a copy of (value, expires_at), or None."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count("memory_hits")
+            return copy.deepcopy(entry[0]), entry[1]
+        
+        if self.shared is not None:
+            entry = self._shared_get(key)
+            if entry is not None:
+                self.memory.set(key, entry[0], entry[1])
+                self._count("shared_hits")
+                return copy.deepcopy(entry[0]), entry[1]
+        
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                # Promote to the memory tier
+                self.memory.set(key, entry[0], entry[1])
+                self._count("disk_hits")
+                return copy.deepcopy(entry[0]), entry[1]
+        
+        self._count("misses")
+        return None
+    
+    def _shared_key(self, key):
+        return f"{self.name}:{key}"
+    
+    def _shared_get(self, key):
+        """Get an unexpired (value, expires_at) entry from the shared store, or None if it fails."""
+        try:
+            entry = self.shared.get(self._shared_key(key))
+        except Exception as e:
+            current_app.logger.warning(f"Could not read {self.name} cache entry from the shared cache: {e}")
+            return None
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        return entry["value"], entry["expires_at"]
+    
+    def get(self, key):
+        """
+        Look up a cached value.
+        
+        Returns:
+            A copy of the value, or None on a miss.
+        """
+        entry = self._lookup(key)
+        return entry[0] if entry is not None else None
+    
+    def set(self, key, value, ttl=None):
+        """Store a value in every tier for ttl seconds (the cache's TTL by default)."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl
+        value = copy.deepcopy(value)
+        self.memory.set(key, value, expires_at)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(key), {"value": value, "expires_at": expires_at}, ttl=ttl)
+            except Exception as e:
+                current_app.logger.warning(f"Could not write {self.name} cache entry to the shared cache: {e}")
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, expires_at)
+            except OSError as e:
+                current_app.logger.warning(f"Could not write {self.name} cache entry to disk: {e}")
+    
+    def get_or_compute(self, key, compute, bypass=False, cacheable=None):
+        """
+        Get a cached value, computing and storing it on a miss.
+        
+        Args:
+            key: The cache key.
+            compute: A function returning the value.
+            bypass: Skip the lookup and refresh the entry with a computed value.
+            cacheable: Optional function telling whether a computed value may be stored.
+        
+        Returns:
+            A (value, cached) tuple.
+        """
+        if bypass:
+            self._count("bypasses")
+        else:
+            value = self.get(key)
+            if value is not None:
+                return value, True
+        
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.set(key, value)
+        return value, False
+    
+    def get_or_revalidate(self, key, compute, fresh_ttl, max_stale, force_refresh=False, cacheable=None):
+        """
+        Get a value with stale-while-revalidate semantics.
+        
+        A value younger than fresh_ttl is returned as is. An older value is
+        still returned immediately (for up to max_stale more seconds) while a
+        single background thread recomputes it. Past that, or on a miss, the
+        value is computed in the caller.
+        
+        Args:
+            key: The cache key.
+            compute: A function returning the value. Background refreshes
+                run it in an app context of their own.
+            fresh_ttl: Seconds a value is served without refreshing it.
+            max_stale: Seconds a stale value may still be served.
+            force_refresh: Skip the lookup and recompute the value now.
+            cacheable: Optional function telling whether a computed value may be
+                stored; a background refresh producing another value keeps the old one.
+        
+        Returns:
+            A (value, state) tuple, where state is "fresh", "stale", "miss"
+            or "refreshed".
+        """
+        if force_refresh:
+            self._count("bypasses")
+        else:
+            entry = self._lookup(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at - max_stale > time.time():
+                    return value, "fresh"
+                
+                self._count("stale_hits")
+                self._refresh_in_background(key, compute, fresh_ttl + max_stale, cacheable)
+                return value, "stale"
+        
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.set(key, value, ttl=fresh_ttl + max_stale)
+        return value, "refreshed" if force_refresh else "miss"
+    
+    def _refresh_in_background(self, key, compute, ttl, cacheable=None):
+        """Recompute an entry on a background thread unless a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        app = current_app._get_current_object()
+        
+        def refresh():
+            try:
+                with app.app_context():
+                    value = compute()
+                    if cacheable is None or cacheable(value):
+                        self.set(key, value, ttl=ttl)
+                self._count("refreshes")
+            except Exception as e:
+                self._count("refresh_failures")
+                app.logger.warning(f"Background refresh of {self.name} cache entry failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+    
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry if no key is given."""
+        self.memory.delete(key)
+        if self.shared is not None:
+            if key is None:
+                self.shared.clear(f"{self.name}:")
+            else:
+                self.shared.delete(self._shared_key(key))
+        if self.disk is not None:
+            self.disk.delete(key)
+    
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            hits = self.memory_hits + self.shared_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self.memory),
+                "disk_bytes": self.disk.size if self.disk is not None else 0,
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "stale_hits": self.stale_hits,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
+
+# Result caches keyed by name
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_result_cache(name, ttl=None):
+    """
+    Get a named result cache, creating it from the app config on first use.
+    
+    The memory tier holds RESULT_CACHE_MEMORY_ENTRIES entries, entries are
+    shared through SHARED_CACHE_URL if it is set, and the disk tier lives in
+    RESULT_CACHE_DIR/<name>, capped at RESULT_CACHE_DISK_BYTES (an empty
+    RESULT_CACHE_DIR disables the disk tier).
+    
+    Args:
+        name: The cache name.
+        ttl: The time-to-live of entries in seconds.
+    
+    Returns:
+        The ResultCache.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            config = current_app.config
+            cache = ResultCache(
+                name,
+                ttl=ttl or DEFAULT_TTL,
+                max_entries=config.get("RESULT_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES),
+                directory=config.get("RESULT_CACHE_DIR"),
+                max_bytes=config.get("RESULT_CACHE_DISK_BYTES", DEFAULT_DISK_BYTES),
+                shared=get_shared_cache()
+            )
+            _caches[name] = cache
+        return cache
+
+def get_result_cache_stats():
+    """Get the statistics of every result cache."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
+
+def reset_result_caches():
+    """Forget all result caches (their disk entries are kept)."""
+    with _caches_lock:
+        _caches.clear()
@@ -3,48 +3,385 @@ Minocrisy AI Tools - Secrets Management
 Utilities for managing API keys and secrets.
 """
 import os
-from flask import current_app
-from google.cloud import secretmanager
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app, g, has_request_context
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Default lifetimes (in seconds) for cached Secret Manager lookups
+DEFAULT_SECRET_CACHE_TTL = 300
+DEFAULT_SECRET_CACHE_NEGATIVE_TTL = 60
+
+# Every secret the application knows how to use
+KNOWN_SECRETS = [
+    "ELEVENLABS_API_KEY",
+    "ELEVENLABS_VOICE_ID",
+    "OPENAI_API_KEY",
+    "RUNWAYML_API_KEY",
+    "XAI_API_KEY",
+    "XAI_API_URL",
+    "HEDRA_API_KEY",
+    "HEDRA_API_URL",
+    "GEMINI_API_KEY",
+]
+
+class SecretCache:
+    """
+    Process-wide cache for secrets resolved from Google Cloud Secret Manager.
+    
+    Found secrets are kept for a configurable TTL and missing secrets are
+    negatively cached, so repeated lookups never leave the process. A single
+    Secret Manager client is created lazily and reused by every lookup.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # secret_name -> (value or None, expires_at)
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, secret_name):
+        """
+        Look up a cached secret.
+        
+        Returns:
+            A (found, value) tuple. value is None for negatively cached secrets.
+        """
+        with self._lock:
+            entry = self._entries.get(secret_name)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return True, entry[0]
+            
+            self._entries.pop(secret_name, None)
+            self.misses += 1
+            return False, None
+    
+    def set(self, secret_name, value, ttl):
+        """Store a secret value (or None for a missing secret) for ttl seconds."""
+        with self._lock:
+            self._entries[secret_name] = (value, time.monotonic() + ttl)
+    
+    def reset_client(self):
+        """Drop the Secret Manager client so the next lookup creates a new one."""
+        with self._lock:
+            self._client = None
+    
+    def invalidate(self, secret_name=None):
+        """Drop one cached secret, or every cached secret if no name is given."""
+        with self._lock:
+            if secret_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(secret_name, None)
+    
+    def client(self):
+        """Get the shared Secret Manager client, creating it on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = load_sdk().SecretManagerServiceClient()
+            return self._client
+    
+    def stats(self):
+        """Return hit/miss counters for the cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+class SecretVault:
+    """
+    In-memory store of secrets resolved up front by prefetch_secrets.
+    
+    Secrets are resolved in parallel on worker threads and each value is
+    replaced as soon as it arrives, so a background refresh never blocks
+    requests reading from the vault.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # secret_name -> value or None
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+        self.last_refresh = None
+        self.refresh_count = 0
+    
+    def get(self, secret_name):
+        """
+        Look up a secret in the vault.
+        
+        Returns:
+            A (found, value) tuple. value is None for secrets known to be missing.
+        """
+        with self._lock:
+            if secret_name in self._values:
+                return True, self._values[secret_name]
+            return False, None
+    
+    def load(self, app, secret_names, timeout=None):
+        """
+        Resolve secrets concurrently and store them in the vault.
+        
+        Args:
+            app: The Flask application used for configuration and logging.
+            secret_names: The names of the secrets to resolve.
+            timeout: Maximum seconds to wait; secrets still resolving after
+                     that are stored when they arrive.
+            
+        Returns:
+            A dictionary of the secrets resolved within the timeout.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(len(secret_names), 1), thread_name_prefix="secret-prefetch")
+        futures = {
+            executor.submit(_fetch_secret_for_vault, app, secret_name): secret_name
+            for secret_name in secret_names
+        }
+        
+        for future in futures:
+            future.add_done_callback(lambda f, name=futures[future]: self._store(name, f.result()))
+        
+        done, _ = wait(futures, timeout=timeout)
+        executor.shutdown(wait=False)
+        
+        with self._lock:
+            self.last_refresh = time.time()
+            self.refresh_count += 1
+        
+        return {futures[future]: future.result() for future in done}
+    
+    def _store(self, secret_name, value):
+        """Store a single resolved secret."""
+        with self._lock:
+            self._values[secret_name] = value
+    
+    def start_refresh(self, app, secret_names, interval):
+        """Refresh the vault every interval seconds on a daemon thread."""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        
+        def refresh_loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.load(app, secret_names)
+                except Exception as e:
+                    app.logger.error(f"Error refreshing secrets: {e}")
+        
+        self._refresh_thread = threading.Thread(target=refresh_loop, name="secret-refresh", daemon=True)
+        self._refresh_thread.start()
+    
+    def stop_refresh(self):
+        """Stop the background refresh thread."""
+        self._stop_event.set()
+        self._refresh_thread = None
+    
+    def clear(self):
+        """Remove every secret from the vault."""
+        with self._lock:
+            self._values.clear()
+    
+    def stats(self):
+        """Return the state of the vault."""
+        with self._lock:
+            return {
+                "secrets": len(self._values),
+                "last_refresh": self.last_refresh,
+                "refresh_count": self.refresh_count,
+                "refreshing": bool(self._refresh_thread and self._refresh_thread.is_alive())
+            }
+
+def load_sdk():
+    """
+    Import the Secret Manager SDK.
+    
+    Only needed when a secret is missing from the environment, so the import
+    is deferred until then instead of slowing down every cold start.
+    """
+    from google.cloud import secretmanager
+    return secretmanager
+
+# Shared cache used by get_secret
+_secret_cache = SecretCache()
+
+# Secrets resolved at startup by prefetch_secrets
+_secret_vault = SecretVault()
+
+def get_secret_cache_stats():
+    """Get hit/miss statistics for the secret cache and the prefetch vault."""
+    stats = _secret_cache.stats()
+    stats["vault"] = _secret_vault.stats()
+    return stats
+
+def clear_secret_cache(secret_name=None):
+    """Clear one or all cached secrets, e.g. after rotating a key."""
+    _secret_cache.invalidate(secret_name)
+
+def reset_after_fork(app):
+    """
+    Prepare the secret caches for a forked worker process.
+    
+    Neither the Secret Manager client's gRPC channel nor the vault refresh
+    thread survive fork(), so the client is recreated on next use and the
+    refresh thread is restarted in the worker.
+    
+    Args:
+        app: The Flask application.
+    """
+    _secret_cache.reset_client()
+    
+    interval = app.config.get("SECRETS_REFRESH_INTERVAL")
+    if app.config.get("SECRETS_PREFETCH") and interval:
+        _secret_vault.stop_refresh()
+        _secret_vault.start_refresh(app, KNOWN_SECRETS, interval)
+
+def prefetch_secrets(app):
+    """
+    Resolve every known secret in parallel and keep them in the vault.
+    
+    Called from create_app when SECRETS_PREFETCH is enabled. Secrets are read
+    from environment variables and Google Cloud Secret Manager concurrently,
+    empty app.config entries are filled in, and a background thread refreshes
+    the vault every SECRETS_REFRESH_INTERVAL seconds.
+    
+    Args:
+        app: The Flask application.
+        
+    Returns:
+        A dictionary of the secrets resolved during startup.
+    """
+    start_time = time.monotonic()
+    resolved = _secret_vault.load(app, KNOWN_SECRETS, timeout=app.config.get("SECRETS_PREFETCH_TIMEOUT"))
+    
+    # Let config-based checks (e.g. optional tool registration) see Secret Manager values
+    for secret_name, value in resolved.items():
+        if value and not app.config.get(secret_name):
+            app.config[secret_name] = value
+    
+    app.logger.info(f"Prefetched {len(resolved)} secrets in {time.monotonic() - start_time:.3f}s")
+    
+    interval = app.config.get("SECRETS_REFRESH_INTERVAL")
+    if interval:
+        _secret_vault.start_refresh(app, KNOWN_SECRETS, interval)
+    
+    return resolved
+
+def warm_secret_cache(app):
+    """
+    Resolve every known secret in parallel into the secret cache.
+    
+    Unlike prefetch_secrets, values go through _resolve_secret, so they
+    expire after SECRET_CACHE_TTL (or SECRET_CACHE_NEGATIVE_TTL for failed
+    lookups) and are looked up again after that.
+    
+    Args:
+        app: The Flask application.
+    
+    Returns:
+        A dictionary of the resolved secrets.
+    """
+    def resolve(secret_name):
+        with app.app_context():
+            return _resolve_secret(secret_name)
+    
+    with ThreadPoolExecutor(max_workers=len(KNOWN_SECRETS), thread_name_prefix="secret-warmup") as executor:
+        return dict(zip(KNOWN_SECRETS, executor.map(resolve, KNOWN_SECRETS)))
+
+def _fetch_secret_for_vault(app, secret_name):
+    """Resolve a secret for the vault without going through the TTL cache."""
+    secret_value = os.environ.get(secret_name)
+    if secret_value:
+        return secret_value
+    
+    project_id = app.config.get("GCP_PROJECT_ID")
+    if not project_id:
+        return None
+    
+    try:
+        return _fetch_secret(secret_name, project_id)
+    except Exception as e:
+        app.logger.error(f"Error retrieving secret {secret_name}: {e}")
+        return None
+
+def _fetch_secret(secret_name, project_id):
+    """Fetch the latest version of a secret from Google Cloud Secret Manager."""
+    client = _secret_cache.client()
+    
+    # Build the resource name of the secret version
+    name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
+    
+    # Access the secret version
+    response = client.access_secret_version(request={"name": name})
+    
+    # Return the decoded payload
+    return response.payload.data.decode("UTF-8")
+
 def get_secret(secret_name):
     """
     Get a secret from environment variables or Google Cloud Secret Manager.
     
+    Secrets prefetched at startup are served from the vault. Other Secret
+    Manager lookups are cached process-wide (see SECRET_CACHE_TTL and
+    SECRET_CACHE_NEGATIVE_TTL) and snapshotted per request, so calling the
+    same getter several times while handling a request costs nothing.
+    
     Args:
         secret_name: The name of the secret to retrieve.
-        
+    
     Returns:
         The secret value as a string, or None if not found.
     """
+    # Reuse the value already resolved during this request
+    snapshot = g.setdefault("_secret_snapshot", {}) if has_request_context() else None
+    if snapshot is not None and secret_name in snapshot:
+        return snapshot[secret_name]
+    
+    found, secret_value = _secret_vault.get(secret_name)
+    if not found:
+        secret_value = _resolve_secret(secret_name)
+    
+    if snapshot is not None:
+        snapshot[secret_name] = secret_value
+    
+    return secret_value
+
+def _resolve_secret(secret_name):
+    """Resolve a secret from the environment, the cache or Secret Manager."""
     # First, try to get the secret from environment variables
     secret_value = os.environ.get(secret_name)
     if secret_value:
         return secret_value
     
-    # If not found in environment variables, try Google Cloud Secret Manager
+    # Check if GCP project ID is set
+    project_id = current_app.config.get("GCP_PROJECT_ID")
+    if not project_id:
+        return None
+    
+    found, secret_value = _secret_cache.get(secret_name)
+    if found:
+        return secret_value
+    
+    ttl = current_app.config.get("SECRET_CACHE_TTL", DEFAULT_SECRET_CACHE_TTL)
+    negative_ttl = current_app.config.get("SECRET_CACHE_NEGATIVE_TTL", DEFAULT_SECRET_CACHE_NEGATIVE_TTL)
+    
+    # If not found in environment variables or the cache, try Google Cloud Secret Manager
     try:
-        # Check if GCP project ID is set
-        project_id = current_app.config.get("GCP_PROJECT_ID")
-        if not project_id:
-            return None
-        
-        # Create the Secret Manager client
-        client = secretmanager.SecretManagerServiceClient()
-        
-        # Build the resource name of the secret version
-        name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
-        
-        # Access the secret version
-        response = client.access_secret_version(request={"name": name})
-        
-        # Return the decoded payload
-        return response.payload.data.decode("UTF-8")
+        secret_value = _fetch_secret(secret_name, project_id)
+        _secret_cache.set(secret_name, secret_value, ttl)
+        return secret_value
     except Exception as e:
         current_app.logger.error(f"Error retrieving secret {secret_name}: {e}")
+        # Remember the miss so we don't hit Secret Manager on every call
+        _secret_cache.set(secret_name, None, negative_ttl)
         return None
 
 def get_elevenlabs_api_key():
@@ -0,0 +1,159 @@
+"""
+Minocrisy AI Tools - Serving Utilities
+Worker sizing, startup checks and fork hooks for running under gunicorn.
+"""
+import gc
+import os
+from app.utils.async_http import reset_after_fork as reset_async_clients
+from app.utils.http_client import close_sessions
+from app.utils.secrets import reset_after_fork
+
+# Memory a worker process needs once every tool and SDK is imported (MB)
+DEFAULT_WORKER_MEMORY_MB = 160
+
+# Memory left for the gunicorn master and the runtime (MB)
+RESERVED_MEMORY_MB = 64
+
+# Requests mostly wait on provider APIs, so each CPU can serve many threads
+THREADS_PER_CPU = 32
+MAX_THREADS_PER_WORKER = 64
+
+def _read_file(path):
+    """Read a small file, returning None if it doesn't exist."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def available_cpus():
+    """
+    Get the number of CPUs this process may use.
+    
+    Honors CPU affinity and cgroup CPU quotas (containers), which
+    os.cpu_count() ignores.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    quota = _read_file("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        limit, period = quota.split()
+        cpus = min(cpus, max(int(int(limit) / int(period)), 1))
+    
+    return max(cpus, 1)
+
+def available_memory_mb():
+    """Get the memory limit of this process in MB (cgroup limit or physical memory)."""
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read_file(path)
+        if value and value.isdigit():
+            limits.append(int(value) // (1024 * 1024))
+    
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024))
+    except (ValueError, OSError, AttributeError):
+        pass
+    
+    return min(limits) if limits else 512
+
+def worker_settings(cpus=None, memory_mb=None, worker_memory_mb=None):
+    """
+    Size the gunicorn worker pool.
+    
+    One process per CPU (as far as memory allows) keeps Python code from
+    contending on the GIL, and threads inside each process absorb the long
+    blocking provider calls. WEB_CONCURRENCY and GUNICORN_THREADS override
+    the computed values.
+    
+    Args:
+        cpus: The number of usable CPUs (detected if omitted).
+        memory_mb: The memory limit in MB (detected if omitted).
+        worker_memory_mb: The memory one worker needs in MB.
+    
+    Returns:
+        A (workers, threads) tuple.
+    """
+    cpus = cpus or available_cpus()
+    memory_mb = memory_mb or available_memory_mb()
+    worker_memory_mb = worker_memory_mb or int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", DEFAULT_WORKER_MEMORY_MB))
+    
+    workers = min(cpus, (memory_mb - RESERVED_MEMORY_MB) // worker_memory_mb)
+    workers = int(os.environ.get("WEB_CONCURRENCY") or max(workers, 1))
+    
+    threads = min(max(THREADS_PER_CPU * cpus // workers, THREADS_PER_CPU), MAX_THREADS_PER_WORKER)
+    threads = int(os.environ.get("GUNICORN_THREADS") or threads)
+    
+    return workers, threads
+
+def check_startup(app, timeout=None):
+    """
+    Check the application before it starts serving.
+    
+    Compiles every template, makes sure at least one tool is available and
+    that the worker timeout can fit the longest request deadline.
+    
+    Args:
+        app: The Flask application.
+        timeout: The gunicorn worker timeout in seconds.
+    
+    Returns:
+        A list of warnings.
+    
+    Raises:
+        Exception: If the application cannot serve requests.
+    """
+    warnings = []
+    
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith(".html")]
+    if "index.html" not in templates:
+        raise Exception("Template index.html not found")
+    
+    for name in templates:
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            raise Exception(f"Template {name} failed to compile: {e}")
+    
+    if not app.extensions.get("lazy_tools") and set(app.blueprints) <= {"main"}:
+        warnings.append("No tools are available; configure at least one API key")
+    
+    if app.config.get("SECRET_KEY") == "dev":
+        warnings.append("SECRET_KEY is not set; sessions are signed with the development key")
+    
+    longest_deadline = max(app.config.get("REQUEST_DEADLINES", {}).values(), default=0)
+    if timeout and longest_deadline >= timeout:
+        warnings.append(
+            f"Worker timeout ({timeout}s) does not exceed the longest request deadline ({longest_deadline}s)"
+        )
+    
+    return warnings
+
+def preload(app):
+    """
+    Finish loading the application in the master process before forking.
+    
+    Importing every tool up front lets workers share those pages copy-on-write,
+    and gc.freeze() moves the loaded objects out of the garbage collector's
+    reach so collections in the workers don't write to (and copy) them.
+    """
+    from app.tools.registry import load_tools
+    
+    load_tools(app)
+    gc.collect()
+    gc.freeze()
+
+def after_fork(app):
+    """
+    Reset process-local resources in a freshly forked worker.
+    
+    Pooled connections must not be shared with the master or other workers,
+    and background threads don't survive the fork.
+    """
+    close_sessions()
+    reset_async_clients()
+    reset_after_fork(app)
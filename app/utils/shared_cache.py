@@ -0,0 +1,492 @@
+"""
+Minocrisy AI Tools - Shared Cache
+Key/value backends shared by every worker: SQLite (WAL) on one host, or a Redis server.
+"""
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlparse
+from flask import current_app
+
+# Attempts of a read-modify-write before giving up on a contended key, and
+# the base of the jittered delay between attempts in seconds
+UPDATE_ATTEMPTS = 10
+UPDATE_BACKOFF = 0.005
+
+# Expired SQLite rows are purged once every this many writes
+PURGE_INTERVAL = 1000
+
+# Socket timeout of Redis connections in seconds
+REDIS_TIMEOUT = 2.0
+
+def encode(value):
+    """Serialize a value canonically, so equal values have equal encodings."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+class SharedCache:
+    """
+    A key/value store with TTLs and compare-and-set.
+    
+    Values must be JSON-serializable and are compared by their canonical
+    encoding. Backends implement _get, _set, _delete, _compare_and_set and
+    _clear on encoded values.
+    """
+    
+    backend = None
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.conflicts = 0
+    
+    def get(self, key):
+        """
+        Get a value.
+        
+        Returns:
+            The value, or None if the key is missing or expired.
+        """
+        raw = self._get(key)
+        self._count("misses" if raw is None else "hits")
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key, value, ttl=None):
+        """Store a value, for ttl seconds if given."""
+        self._set(key, encode(value), ttl)
+        self._count("sets")
+    
+    def delete(self, key):
+        """Remove a key."""
+        self._delete(key)
+    
+    def compare_and_set(self, key, expected, value, ttl=None):
+        """
+        Store a value only if the current value equals expected.
+        
+        Args:
+            key: The key.
+            expected: The value read before; None means the key must not exist.
+            value: The new value.
+            ttl: Optional time-to-live of the new value in seconds.
+        
+        Returns:
+            True if the value was stored, False if the key had changed.
+        """
+        stored = self._compare_and_set(key, None if expected is None else encode(expected), encode(value), ttl)
+        self._count("sets" if stored else "conflicts")
+        return stored
+    
+    def update(self, key, function, ttl=None):
+        """
+        Atomically replace a value with function(value).
+        
+        The value is read, transformed and written back with compare_and_set,
+        retrying after a short random delay when another worker changed it
+        in between.
+        
+        Args:
+            key: The key.
+            function: Called with the current value (None if missing); returns the new value.
+            ttl: Optional time-to-live of the new value in seconds.
+        
+        Returns:
+            The new value.
+        
+        Raises:
+            Exception: If the key keeps changing.
+        """
+        for attempt in range(UPDATE_ATTEMPTS):
+            current = self.get(key)
+            value = function(json.loads(encode(current)))
+            if self.compare_and_set(key, current, value, ttl):
+                return value
+            time.sleep(random.uniform(0, UPDATE_BACKOFF * 2 ** attempt))
+        raise Exception(f"Could not update {key}: too many concurrent changes")
+    
+    def clear(self, prefix=""):
+        """Remove every key starting with prefix."""
+        self._clear(prefix)
+    
+    def close(self):
+        """Release connections."""
+    
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self):
+        """Return hit, miss, write and conflict counts."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "hits": self.hits,
+                "misses": self.misses,
+                "sets": self.sets,
+                "conflicts": self.conflicts,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class MemoryCache(SharedCache):
+    """A process-local store; the fallback when no shared backend is configured."""
+    
+    backend = "memory"
+    
+    def __init__(self):
+        super().__init__()
+        self._entries = {}  # key -> (encoded value, expires_at or None)
+        self._entries_lock = threading.Lock()
+    
+    def _live(self, key):
+        """Get the encoded value of an unexpired key (lock held)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        return entry[0]
+    
+    def _get(self, key):
+        with self._entries_lock:
+            return self._live(key)
+    
+    def _set(self, key, raw, ttl):
+        with self._entries_lock:
+            self._entries[key] = (raw, time.time() + ttl if ttl else None)
+    
+    def _delete(self, key):
+        with self._entries_lock:
+            self._entries.pop(key, None)
+    
+    def _compare_and_set(self, key, expected, raw, ttl):
+        with self._entries_lock:
+            if self._live(key) != expected:
+                return False
+            self._entries[key] = (raw, time.time() + ttl if ttl else None)
+            return True
+    
+    def _clear(self, prefix):
+        with self._entries_lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+class SQLiteCache(SharedCache):
+    """
+    A store in an SQLite database in WAL mode.
+    
+    Every worker on the host opens the same file, so readers never block
+    the writer and each write is a single atomic statement. Each thread
+    uses a connection of its own.
+    """
+    
+    backend = "sqlite"
+    
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+    
+    def _connection(self):
+        """Get this thread's connection (opened again in a forked worker)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def _get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _set(self, key, raw, ttl):
+        self._connection().execute(
+            "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, raw, time.time() + ttl if ttl else None)
+        )
+        self._written()
+    
+    def _delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+    
+    def _compare_and_set(self, key, expected, raw, ttl):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        if expected is None:
+            # Insert, or take over an expired row
+            cursor = self._connection().execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE entries.expires_at IS NOT NULL AND entries.expires_at <= ?",
+                (key, raw, expires_at, now)
+            )
+        else:
+            cursor = self._connection().execute(
+                "UPDATE entries SET value = ?, expires_at = ? "
+                "WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (raw, expires_at, key, expected, now)
+            )
+        stored = cursor.rowcount == 1
+        if stored:
+            self._written()
+        return stored
+    
+    def _clear(self, prefix):
+        self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+    
+    def _written(self):
+        """Purge expired rows every PURGE_INTERVAL writes."""
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_INTERVAL == 0
+        if purge:
+            self._connection().execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+    
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+class RedisConnection:
+    """A connection speaking the Redis protocol (RESP2)."""
+    
+    def __init__(self, host, port, password=None, db=0):
+        self.pid = os.getpid()
+        self.sock = socket.create_connection((host, port), timeout=REDIS_TIMEOUT)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+    
+    def command(self, *args):
+        """Send a command and return its reply."""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+        return self._read_reply()
+    
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, data = line[:1], line[1:-2]
+        if kind == b"+":
+            return data.decode()
+        if kind == b"-":
+            raise Exception(f"Redis error: {data.decode()}")
+        if kind == b":":
+            return int(data)
+        if kind == b"$":
+            length = int(data)
+            if length < 0:
+                return None
+            value = self.reader.read(length + 2)[:-2]
+            return value.decode("utf-8")
+        if kind == b"*":
+            length = int(data)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise Exception(f"Unexpected Redis reply: {line!r}")
+    
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class RedisCache(SharedCache):
+    """
+    A store on a Redis (or Redis-compatible) server, shared by every instance.
+    
+    Connections are pooled per process. compare_and_set uses SET NX for new
+    keys and WATCH/MULTI/EXEC otherwise, so it works without server scripts.
+    """
+    
+    backend = "redis"
+    
+    def __init__(self, url):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._pool = []
+        self._pool_lock = threading.Lock()
+    
+    def _command(self, *args):
+        """Run a command on a pooled connection."""
+        with self._connected() as connection:
+            return connection.command(*args)
+    
+    def _connected(self):
+        """Borrow a pooled connection for the duration of a with block."""
+        return _PooledConnection(self)
+    
+    def _acquire(self):
+        with self._pool_lock:
+            while self._pool:
+                connection = self._pool.pop()
+                if connection.pid == os.getpid():
+                    return connection
+        return RedisConnection(self.host, self.port, self.password, self.db)
+    
+    def _release(self, connection, healthy):
+        if not healthy:
+            connection.close()
+            return
+        with self._pool_lock:
+            self._pool.append(connection)
+    
+    @staticmethod
+    def _expiry(ttl):
+        return ["PX", max(int(ttl * 1000), 1)] if ttl else []
+    
+    def _get(self, key):
+        return self._command("GET", key)
+    
+    def _set(self, key, raw, ttl):
+        self._command("SET", key, raw, *self._expiry(ttl))
+    
+    def _delete(self, key):
+        self._command("DEL", key)
+    
+    def _compare_and_set(self, key, expected, raw, ttl):
+        if expected is None:
+            return self._command("SET", key, raw, "NX", *self._expiry(ttl)) == "OK"
+        
+        with self._connected() as connection:
+            connection.command("WATCH", key)
+            if connection.command("GET", key) != expected:
+                connection.command("UNWATCH")
+                return False
+            connection.command("MULTI")
+            connection.command("SET", key, raw, *self._expiry(ttl))
+            # EXEC returns nil when the watched key changed in between
+            return connection.command("EXEC") is not None
+    
+    def _clear(self, prefix):
+        pattern = "".join("\\" + char if char in "*?[]\\" else char for char in prefix) + "*"
+        with self._connected() as connection:
+            cursor = "0"
+            while True:
+                cursor, keys = connection.command("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+                if keys:
+                    connection.command("DEL", *keys)
+                if cursor == "0":
+                    break
+    
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for connection in pool:
+            connection.close()
+
+class _PooledConnection:
+    """Context manager lending a connection from a RedisCache pool."""
+    
+    def __init__(self, cache):
+        self.cache = cache
+        self.connection = None
+    
+    def __enter__(self):
+        self.connection = self.cache._acquire()
+        return self.connection
+    
+    def __exit__(self, exc_type, exc, traceback):
+        # A connection that failed mid-command may have unread replies
+        self.cache._release(self.connection, healthy=exc_type is None)
+        return False
+
+def create_shared_cache(url):
+    """
+    Create a backend from a URL.
+    
+    Args:
+        url: sqlite:///relative/path.db, sqlite:////absolute/path.db,
+            redis://[:password@]host[:port][/db] or memory://.
+    
+    Returns:
+        The SharedCache.
+    """
+    scheme = url.split("://", 1)[0].lower()
+    if scheme == "sqlite":
+        return SQLiteCache(url.split("://", 1)[1][1:])
+    if scheme in ("redis", "tcp"):
+        return RedisCache(url)
+    if scheme == "memory":
+        return MemoryCache()
+    raise Exception(f"Unsupported shared cache URL: {url}")
+
+# Backends keyed by URL, and the process-local fallback store
+_backends = {}
+_backends_lock = threading.Lock()
+_local_store = MemoryCache()
+
+def get_shared_cache():
+    """
+    Get the backend configured with SHARED_CACHE_URL.
+    
+    Returns:
+        The SharedCache, or None if no shared cache is configured.
+    """
+    url = current_app.config.get("SHARED_CACHE_URL")
+    if not url:
+        return None
+    
+    with _backends_lock:
+        cache = _backends.get(url)
+        if cache is None:
+            cache = _backends[url] = create_shared_cache(url)
+        return cache
+
+def get_state_store():
+    """
+    Get the store for application state (saved outputs, conversations).
+    
+    Returns:
+        The shared cache if one is configured, otherwise a process-local store.
+    """
+    return get_shared_cache() or _local_store
+
+def get_shared_cache_stats():
+    """Get the statistics of the shared cache backends and the local state store."""
+    with _backends_lock:
+        backends = dict(_backends)
+    stats = {url.split("@")[-1]: cache.stats() for url, cache in backends.items()}
+    stats["local"] = _local_store.stats()
+    return stats
+
+def reset_shared_caches():
+    """Close and forget every shared cache backend."""
+    with _backends_lock:
+        backends = list(_backends.values())
+        _backends.clear()
+    for cache in backends:
+        cache.close()
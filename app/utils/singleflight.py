@@ -0,0 +1,121 @@
+"""
+Minocrisy AI Tools - Singleflight
+Coalescing of identical provider calls made concurrently by different requests.
+"""
+import copy
+import threading
+from collections import Counter
+from app.utils.deadline import current_deadline, DeadlineExceeded
+from app.utils.result_cache import make_key
+
+class _Call:
+    """A call in flight and the number of callers waiting for it."""
+    
+    def __init__(self, provider):
+        self.provider = provider
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Share one call among concurrent callers with the same key.
+    
+    The first caller runs the call; callers arriving while it is in flight
+    wait for it and get a copy of its result (or its exception) instead of
+    making a call of their own. Nothing is kept once the call finishes, so
+    this only removes duplicate work that happens at the same time.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = Counter()
+        self.coalesced = Counter()
+    
+    def do(self, provider, endpoint, payload, fn):
+        """
+        Run fn, unless an identical call is already in flight.
+        
+        Args:
+            provider: The provider name, for statistics.
+            endpoint: The provider endpoint or operation.
+            payload: The JSON-serializable request payload; equal payloads are coalesced.
+            fn: A function making the call.
+        
+        Returns:
+            A (value, shared) tuple, where shared is True if the value came
+            from another caller's call.
+        
+        Raises:
+            DeadlineExceeded: If the request deadline passes while waiting.
+        """
+        key = make_key(provider, endpoint, payload)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(provider)
+                self.calls[provider] += 1
+            else:
+                call.waiters += 1
+                self.coalesced[provider] += 1
+        
+        if leader:
+            value = None
+            try:
+                value = fn()
+                return value, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    shared = call.waiters > 0
+                # Snapshot the value before the caller can change it
+                call.value = copy.deepcopy(value) if shared else None
+                call.done.set()
+        
+        deadline = current_deadline()
+        if not call.done.wait(deadline.remaining() if deadline is not None else None):
+            raise DeadlineExceeded(f"shared {provider} {endpoint} call", deadline.remaining())
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.value), True
+    
+    def stats(self):
+        """Return calls made, calls coalesced and calls in flight per provider."""
+        with self._lock:
+            in_flight = Counter(call.provider for call in self._calls.values())
+            return {
+                provider: {
+                    "calls": self.calls[provider],
+                    "coalesced": self.coalesced[provider],
+                    "in_flight": in_flight[provider]
+                }
+                for provider in self.calls
+            }
+
+# Coalescing shared by every thread of the process
+_flight = SingleFlight()
+
+def coalesce(provider, endpoint, payload, fn):
+    """
+    Run a provider call, sharing it with concurrent identical calls.
+    
+    Args:
+        provider: The provider name.
+        endpoint: The provider endpoint or operation.
+        payload: The JSON-serializable request payload identifying the call.
+        fn: A function making the call.
+    
+    Returns:
+        The call's result.
+    """
+    return _flight.do(provider, endpoint, payload, fn)[0]
+
+def get_singleflight_stats():
+    """Get the number of calls made and coalesced per provider."""
+    return _flight.stats()
@@ -0,0 +1,111 @@
+"""
+Minocrisy AI Tools - Text Chunks
+Splitting of long documents into chunks on paragraph and sentence boundaries.
+"""
+import re
+
+# Boundaries tried in order when a piece of text is too long: paragraphs,
+# sentences, then any whitespace
+BOUNDARY_PATTERNS = [
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+"),
+    re.compile(r"\s+"),
+]
+
+def _pieces(text, start, end, pattern):
+    """Yield the (start, end) spans between the pattern's matches, without surrounding whitespace."""
+    position = start
+    for match in pattern.finditer(text, start, end):
+        yield from _trimmed(text, position, match.start())
+        position = match.end()
+    yield from _trimmed(text, position, end)
+
+def _trimmed(text, start, end):
+    """Yield the span without leading and trailing whitespace, unless nothing is left."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+def _pack(text, start, end, max_chars, spans, level):
+    """Split text[start:end] at the level's boundaries and pack the pieces into spans of up to max_chars."""
+    if end - start <= max_chars:
+        spans.extend(_trimmed(text, start, end))
+        return
+    if level == len(BOUNDARY_PATTERNS):
+        # A single word longer than a chunk: cut it
+        for offset in range(start, end, max_chars):
+            spans.append((offset, min(offset + max_chars, end)))
+        return
+    
+    current = None
+    for piece_start, piece_end in _pieces(text, start, end, BOUNDARY_PATTERNS[level]):
+        if piece_end - piece_start > max_chars:
+            if current is not None:
+                spans.append(current)
+                current = None
+            _pack(text, piece_start, piece_end, max_chars, spans, level + 1)
+        elif current is not None and piece_end - current[0] <= max_chars:
+            current = (current[0], piece_end)
+        else:
+            if current is not None:
+                spans.append(current)
+            current = (piece_start, piece_end)
+    if current is not None:
+        spans.append(current)
+
+def split_text(text, max_chars):
+    """
+    Split text into chunks of at most max_chars characters.
+    
+    Consecutive paragraphs are packed into a chunk as long as they fit. A
+    paragraph too long for a chunk is split into sentences, and a sentence
+    too long into words. Chunks never start or end with whitespace; the
+    text between two chunks is whitespace only.
+    
+    Args:
+        text: The text to split.
+        max_chars: The maximum chunk length.
+    
+    Returns:
+        A list of (start, end) character offsets of the chunks, in order.
+    """
+    spans = []
+    _pack(text, 0, len(text), max_chars, spans, 0)
+    return spans
+
+def split_paragraphs(text, max_chars=None):
+    """
+    Split text into paragraphs.
+    
+    Unlike split_text, paragraphs are never packed together, so editing one
+    paragraph leaves the others' spans unchanged. A paragraph longer than
+    max_chars is split into chunks like split_text does.
+    
+    Returns:
+        A list of (start, end) character offsets of the paragraphs, in order.
+    """
+    spans = []
+    for start, end in _pieces(text, 0, len(text), BOUNDARY_PATTERNS[0]):
+        if max_chars and end - start > max_chars:
+            _pack(text, start, end, max_chars, spans, 1)
+        else:
+            spans.append((start, end))
+    return spans
+
+def split_sentences(text):
+    """
+    Split text into sentences.
+    
+    Paragraph breaks always end a sentence. Like chunks, sentences never
+    start or end with whitespace.
+    
+    Returns:
+        A list of (start, end) character offsets of the sentences, in order.
+    """
+    spans = []
+    for paragraph_start, paragraph_end in _pieces(text, 0, len(text), BOUNDARY_PATTERNS[0]):
+        spans.extend(_pieces(text, paragraph_start, paragraph_end, BOUNDARY_PATTERNS[1]))
+    return spans
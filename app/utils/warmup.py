@@ -0,0 +1,97 @@
+"""
+Minocrisy AI Tools - Instance Warmup
+Initialization work done by the App Engine warmup request before user traffic arrives.
+"""
+import time
+from flask import current_app
+from app.utils import http_client
+from app.utils.secrets import (
+    get_elevenlabs_api_key, get_hedra_api_key, get_hedra_api_url, get_openai_api_key,
+    get_runwayml_api_key, get_xai_api_key, get_xai_api_url, prefetch_secrets, warm_secret_cache
+)
+
+def _warm_secrets(app):
+    """Resolve every known secret concurrently, into the vault with SECRETS_PREFETCH and the TTL cache otherwise."""
+    resolved = prefetch_secrets(app) if app.config.get("SECRETS_PREFETCH") else warm_secret_cache(app)
+    return {"resolved": sum(1 for value in resolved.values() if value)}
+
+def _warm_sdks(app):
+    """Import the SDKs and tool packages that are otherwise loaded lazily."""
+    from app.tools.registry import load_tools
+    from app.utils import gemini_api, near_duplicate, secrets
+    
+    gemini_api.load_sdk()
+    secrets.load_sdk()
+    near_duplicate.load_numpy()
+    load_tools(app)
+    return {"tools": sorted(app.extensions.get("lazy_tools", {}))}
+
+def _warm_templates(app):
+    """Compile every Jinja template so the first page view doesn't have to."""
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith(".html")]
+    for name in templates:
+        app.jinja_env.get_template(name)
+    return {"templates": len(templates)}
+
+def _warm_http_pools(app):
+    """Open a connection to every configured provider."""
+    targets = {}
+    if get_openai_api_key():
+        targets["openai"] = "https://api.openai.com/v1/models"
+    if get_xai_api_key():
+        targets["xai"] = get_xai_api_url()
+    if get_elevenlabs_api_key():
+        targets["elevenlabs"] = "https://api.elevenlabs.io/v1/voices"
+    if get_runwayml_api_key():
+        targets["runwayml"] = "https://api.dev.runwayml.com/v1"
+    if get_hedra_api_key():
+        targets["hedra"] = get_hedra_api_url()
+    
+    return http_client.warm_pools(targets)
+
+def _warm_default_face(app):
+    """Load the talking head default face image into memory."""
+    from app.tools.talking_head.service import get_default_face
+    
+    image_data = get_default_face()
+    if not image_data:
+        raise Exception("Default face image could not be downloaded")
+    return {"bytes": len(image_data)}
+
+# Warmup steps in the order they run (secrets first, later steps need the keys)
+WARMUP_STEPS = [
+    ("secrets", _warm_secrets),
+    ("sdks", _warm_sdks),
+    ("templates", _warm_templates),
+    ("http_pools", _warm_http_pools),
+    ("default_face", _warm_default_face),
+]
+
+def run_warmup():
+    """
+    Run every warmup step and time it.
+    
+    A failing step is reported but doesn't stop the others, since the
+    instance can still serve requests and will do that work lazily instead.
+    
+    Returns:
+        A dictionary with the outcome and duration of each step.
+    """
+    app = current_app._get_current_object()
+    report = {"steps": {}}
+    start_time = time.monotonic()
+    
+    for name, step in WARMUP_STEPS:
+        step_start = time.monotonic()
+        try:
+            result = {"ok": True, "result": step(app)}
+        except Exception as e:
+            app.logger.error(f"Warmup step {name} failed: {e}")
+            result = {"ok": False, "error": str(e)}
+        result["seconds"] = round(time.monotonic() - step_start, 4)
+        report["steps"][name] = result
+    
+    report["seconds"] = round(time.monotonic() - start_time, 4)
+    report["ok"] = all(step["ok"] for step in report["steps"].values())
+    app.logger.info(f"Warmup finished in {report['seconds']}s")
+    return report
@@ -0,0 +1,66 @@
+"""
+Minocrisy AI Tools - Word Diff
+Word-level differences between a text and its rewrite, with character offsets.
+"""
+import re
+from difflib import SequenceMatcher
+
+# Words, and punctuation characters on their own
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Changes separated by at most this many unchanged tokens are reported as one
+MAX_GAP_TOKENS = 1
+
+def _tokens(text):
+    """Get the (start, end, token) of each token of a text."""
+    return [(match.start(), match.end(), match.group()) for match in TOKEN_PATTERN.finditer(text)]
+
+def _span(tokens, first, last, length):
+    """Get the character span of tokens[first:last], or the position before tokens[first] if empty."""
+    if first < last:
+        return tokens[first][0], tokens[last - 1][1]
+    position = tokens[first][0] if first < len(tokens) else length
+    return position, position
+
+def diff_changes(original, processed):
+    """
+    List the changes turning original into processed, word by word.
+    
+    Tokens (words and punctuation) are compared, so changes in whitespace
+    alone are ignored. Changes only separated by MAX_GAP_TOKENS unchanged
+    tokens are merged into one, so a rewritten phrase is one change.
+    
+    Args:
+        original: The original text.
+        processed: The rewritten text.
+    
+    Returns:
+        A list of {"original", "replacement", "offset", "processed_offset"}
+        dictionaries in text order, where the offsets are the start of the
+        change in the original and in the processed text. Deletions have an
+        empty replacement and insertions an empty original.
+    """
+    old_tokens = _tokens(original)
+    new_tokens = _tokens(processed)
+    matcher = SequenceMatcher(None, [token for _, _, token in old_tokens], [token for _, _, token in new_tokens], autojunk=False)
+    
+    hunks = []
+    for tag, old_first, old_last, new_first, new_last in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if hunks and old_first - hunks[-1][1] <= MAX_GAP_TOKENS and new_first - hunks[-1][3] <= MAX_GAP_TOKENS:
+            hunks[-1][1], hunks[-1][3] = old_last, new_last
+        else:
+            hunks.append([old_first, old_last, new_first, new_last])
+    
+    changes = []
+    for old_first, old_last, new_first, new_last in hunks:
+        start, end = _span(old_tokens, old_first, old_last, len(original))
+        processed_start, processed_end = _span(new_tokens, new_first, new_last, len(processed))
+        changes.append({
+            "original": original[start:end],
+            "replacement": processed[processed_start:processed_end],
+            "offset": start,
+            "processed_offset": processed_start
+        })
+    return changes
@@ -2,24 +2,15 @@
 Minocrisy AI Tools - xAI (Grok) API Utilities
 Utilities for interacting with the xAI API.
 """
-import requests
 import json
 from flask import current_app
+from app.utils import async_http, http_client
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import RateLimitExceeded
 from app.utils.secrets import get_xai_api_key, get_xai_api_url
 
-def chat_completion(messages, model="grok-3", temperature=0.7, max_tokens=1000):
-    """
-    Generate a chat completion using the xAI API.
-    
-    Args:
-        messages: A list of message objects with 'role' and 'content' keys.
-        model: The model to use (default: "grok-3").
-        temperature: Controls randomness (0-1).
-        max_tokens: Maximum number of tokens to generate.
-        
-    Returns:
-        The generated response as a string, or None if an error occurred.
-    """
+def _chat_request(messages, model, temperature, max_tokens, json_mode=False):
+    """Build the URL, headers and body of a chat completion request (None without an API key)."""
     api_key = get_xai_api_key()
     api_url = get_xai_api_url()
     
@@ -38,10 +29,43 @@ def chat_completion(messages, model="grok-3", temperature=0.7, max_tokens=1000):
         "temperature": temperature,
         "max_tokens": max_tokens
     }
+    if json_mode:
+        data["response_format"] = {"type": "json_object"}
+    
+    return f"{api_url}/chat/completions", headers, data
+
+def _chat_result(response):
+    """Extract the reply from a chat completion response (None on an API error)."""
+    if response.status_code != 200:
+        current_app.logger.error(f"xAI API error: {response.status_code} - {response.text}")
+        return None
+    
+    result = response.json()
+    return result["choices"][0]["message"]["content"]
+
+def chat_completion(messages, model="grok-3", temperature=0.7, max_tokens=1000, json_mode=False):
+    """
+    Generate a chat completion using the xAI API.
+    
+    Args:
+        messages: A list of message objects with 'role' and 'content' keys.
+        model: The model to use (default: "grok-3").
+        temperature: Controls randomness (0-1).
+        max_tokens: Maximum number of tokens to generate.
+        json_mode: Whether to ask for a JSON object as the response.
+        
+    Returns:
+        The generated response as a string, or None if an error occurred.
+    """
+    chat_request = _chat_request(messages, model, temperature, max_tokens, json_mode)
+    if chat_request is None:
+        return None
+    url, headers, data = chat_request
     
     try:
-        response = requests.post(
-            f"{api_url}/chat/completions",
+        response = http_client.post(
+            "xai",
+            url,
             headers=headers,
             json=data,
             verify=False  # Disable SSL certificate verification
@@ -50,13 +74,37 @@ def chat_completion(messages, model="grok-3", temperature=0.7, max_tokens=1000):
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
-        if response.status_code != 200:
-            current_app.logger.error(f"xAI API error: {response.status_code} - {response.text}")
-            return None
-        
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
+        return _chat_result(response)
+    
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error calling xAI API: {e}")
+        return None
+
+async def chat_completion_async(messages, model="grok-3", temperature=0.7, max_tokens=1000, json_mode=False):
+    """
+    Generate a chat completion using the xAI API without blocking a thread.
+    
+    Takes the same arguments and returns the same value as chat_completion.
+    """
+    chat_request = _chat_request(messages, model, temperature, max_tokens, json_mode)
+    if chat_request is None:
+        return None
+    url, headers, data = chat_request
+    
+    try:
+        response = await async_http.post(
+            "xai",
+            url,
+            headers=headers,
+            json=data,
+            verify=False  # Same as the synchronous client
+        )
+        return _chat_result(response)
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling xAI API: {e}")
         return None
@@ -96,7 +144,8 @@ def generate_image(prompt, model="grok-image-1", size="1024x1024", quality="stan
     }
     
     try:
-        response = requests.post(
+        response = http_client.post(
+            "xai",
             f"{api_url}/images/generations",
             headers=headers,
             json=data,
@@ -110,6 +159,8 @@ def generate_image(prompt, model="grok-image-1", size="1024x1024", quality="stan
         result = response.json()
         return [image["url"] for image in result["data"]]
     
+    except (DeadlineExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         current_app.logger.error(f"Error calling xAI API: {e}")
         return None
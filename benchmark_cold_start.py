@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Minocrisy AI Tools - Cold Start Benchmark
+Measure import time, app creation and time to first byte of a fresh process.
+
+Each run starts a new Python interpreter with -X importtime, imports the app,
+calls create_app(), serves it on a local port and requests /, /health and
+every tool page. The results are written as a JSON report and the script
+exits with a non-zero code when a budget is exceeded.
+
+Usage:
+    python benchmark_cold_start.py --runs 5 --output cold_start.json
+    python benchmark_cold_start.py --budget import=1.5 --budget total=4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Default budgets in seconds (medians across runs)
+DEFAULT_BUDGETS = {
+    "import": 1.5,
+    "create_app": 0.5,
+    "first_request": 1.0,
+    "total": 4.0,
+}
+
+# Placeholder keys so every tool is registered and its page can be measured
+PLACEHOLDER_KEYS = {
+    "XAI_API_KEY": "benchmark",
+    "OPENAI_API_KEY": "benchmark",
+    "GEMINI_API_KEY": "benchmark",
+    "ELEVENLABS_API_KEY": "benchmark",
+    "RUNWAYML_API_KEY": "benchmark",
+    "HEDRA_API_KEY": "benchmark",
+}
+
+# Code run in the measured child process; prints a JSON result on stdout
+CHILD_SCRIPT = r"""
+import http.client, json, threading, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+
+from werkzeug.serving import make_server
+from app.routes import TOOLS
+server = make_server("127.0.0.1", 0, app, threaded=True)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+paths = ["/", "/health"] + [tool["endpoint"] + "/" for tool in TOOLS]
+requests = []
+for path in paths:
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    sent = time.perf_counter()
+    connection.request("GET", path)
+    response = connection.getresponse()
+    first_byte = time.perf_counter()
+    response.read()
+    done = time.perf_counter()
+    connection.close()
+    requests.append({
+        "path": path,
+        "status": response.status,
+        "ttfb": first_byte - sent,
+        "seconds": done - sent
+    })
+server.shutdown()
+
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "requests": requests,
+    "total": time.perf_counter() - start
+}))
+"""
+
+def parse_importtime(output):
+    """
+    Parse the stderr of python -X importtime.
+    
+    Args:
+        output: The text written by the interpreter.
+    
+    Returns:
+        A list of (module, self seconds, cumulative seconds) tuples.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+        except ValueError:
+            continue
+    return modules
+
+def aggregate_imports(modules, top=25):
+    """
+    Attribute import time to top-level packages.
+    
+    Self times are summed per top-level package, so every microsecond is
+    counted once (unlike the cumulative column of -X importtime).
+    
+    Args:
+        modules: The output of parse_importtime.
+        top: The number of slowest modules to list individually.
+    
+    Returns:
+        A dictionary with per-package totals and the slowest modules.
+    """
+    packages = defaultdict(float)
+    for name, self_time, cumulative in modules:
+        packages[name.split(".", 1)[0]] += self_time
+    
+    return {
+        "total": sum(self_time for name, self_time, cumulative in modules),
+        "modules": len(modules),
+        "packages": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)),
+        "slowest_modules": [
+            {"module": name, "self": self_time, "cumulative": cumulative}
+            for name, self_time, cumulative in sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+        ]
+    }
+
+def run_once(env):
+    """
+    Measure one cold start in a fresh interpreter.
+    
+    Args:
+        env: The environment for the child process.
+    
+    Returns:
+        The child's timings with the aggregated import profile added.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        cwd=os.path.abspath(os.path.dirname(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise Exception(f"Benchmark process failed:\n{result.stderr[-4000:]}")
+    
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["first_request"] = timings["requests"][0]["ttfb"]
+    timings["imports"] = aggregate_imports(parse_importtime(result.stderr))
+    return timings
+
+def summarize(runs):
+    """
+    Combine several runs into medians.
+    
+    Args:
+        runs: The results of run_once.
+    
+    Returns:
+        A dictionary of median timings, with per-path TTFB.
+    """
+    summary = {key: statistics.median(run[key] for run in runs) for key in ("import", "create_app", "first_request", "total")}
+    
+    paths = [entry["path"] for entry in runs[0]["requests"]]
+    summary["ttfb"] = {
+        path: statistics.median(run["requests"][index]["ttfb"] for run in runs)
+        for index, path in enumerate(paths)
+    }
+    summary["status"] = {entry["path"]: entry["status"] for entry in runs[0]["requests"]}
+    return summary
+
+def check_budgets(summary, budgets):
+    """
+    Compare the median timings with their budgets.
+    
+    Args:
+        summary: The output of summarize.
+        budgets: A dictionary of metric names to seconds. Besides the summary
+            keys, "ttfb" limits the TTFB of every path.
+    
+    Returns:
+        A list of human readable budget violations.
+    """
+    violations = []
+    for metric, budget in budgets.items():
+        if metric == "ttfb":
+            values = summary["ttfb"]
+        elif metric in summary:
+            values = {metric: summary[metric]}
+        else:
+            violations.append(f"Unknown budget metric: {metric}")
+            continue
+        
+        for name, value in values.items():
+            if value > budget:
+                violations.append(f"{name}: {value:.3f}s exceeds budget of {budget:.3f}s")
+    return violations
+
+def parse_budget(value):
+    """Parse a --budget METRIC=SECONDS argument."""
+    try:
+        metric, seconds = value.split("=", 1)
+        return metric.strip(), float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected METRIC=SECONDS, got {value}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold start of the application.")
+    parser.add_argument("--runs", type=int, default=3, help="number of fresh processes to measure")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="override a budget, e.g. import=1.5 (metrics: %s, ttfb)" % ", ".join(DEFAULT_BUDGETS))
+    parser.add_argument("--real-keys", action="store_true",
+                        help="use the API keys from the environment instead of placeholders")
+    args = parser.parse_args(argv)
+    
+    env = dict(os.environ, SECRETS_PREFETCH="false", FLASK_ENV="production")
+    if not args.real_keys:
+        env.update({key: value for key, value in PLACEHOLDER_KEYS.items() if not env.get(key)})
+    
+    budgets = dict(DEFAULT_BUDGETS)
+    budgets.update(dict(args.budget))
+    
+    runs = [run_once(env) for _ in range(max(args.runs, 1))]
+    summary = summarize(runs)
+    violations = check_budgets(summary, budgets)
+    
+    report = {
+        "python": sys.version.split()[0],
+        "runs": len(runs),
+        "budgets": budgets,
+        "summary": summary,
+        "imports": runs[-1]["imports"],
+        "violations": violations,
+        "passed": not violations
+    }
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    
+    for violation in violations:
+        print(f"Budget exceeded - {violation}", file=sys.stderr)
+    
+    return 1 if violations else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
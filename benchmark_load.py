@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Minocrisy AI Tools - Load Test
+Measure throughput of the production server against a simulated slow provider.
+
+A local stub stands in for the xAI API and answers every chat completion
+after a fixed delay, so the results reflect how the server copes with
+requests that block on provider calls (not the provider's own speed).
+The app is started with gunicorn and /tools/xai-chat/chat is requested by
+a number of concurrent clients for a fixed duration.
+
+Usage:
+    python benchmark_load.py --concurrency 32 --duration 20 --provider-delay 0.5
+    python benchmark_load.py --server "gunicorn -b 127.0.0.1:{port} main:app"
+"""
+import argparse
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Server started for the test; {port} is replaced with a free port
+DEFAULT_SERVER = "gunicorn -c gunicorn.conf.py -b 127.0.0.1:{port}"
+
+class SlowProviderHandler(BaseHTTPRequestHandler):
+    """Answers chat completions like the xAI API, after a delay."""
+    
+    protocol_version = "HTTP/1.1"
+    delay = 0.5
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        body = json.dumps({"choices": [{"message": {"content": "Simulated reply"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def free_port():
+    """Find a free local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_server(url, timeout=30):
+    """Wait until the server answers /health."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise Exception(f"Server at {url} did not start within {timeout}s")
+
+def run_load(url, concurrency, duration):
+    """
+    Send chat requests from concurrent clients for a fixed duration.
+    
+    Returns:
+        A dictionary with throughput, latency percentiles and error counts.
+    """
+    payload = json.dumps({"message": "Hello"}).encode()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+    
+    def client():
+        while time.monotonic() < stop_at:
+            request = urllib.request.Request(
+                f"{url}/tools/xai-chat/chat",
+                data=payload,
+                headers={"Content-Type": "application/json"}
+            )
+            started = time.monotonic()
+            try:
+                urllib.request.urlopen(request, timeout=120).read()
+                with lock:
+                    latencies.append(time.monotonic() - started)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+    
+    started = time.monotonic()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else None,
+        "max": latencies[-1] if latencies else None
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the production server.")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="command starting the server ({port} is substituted)")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to send requests for")
+    parser.add_argument("--provider-delay", type=float, default=0.5, help="seconds the stub provider takes per call")
+    args = parser.parse_args(argv)
+    
+    SlowProviderHandler.delay = args.provider_delay
+    provider = ThreadingHTTPServer(("127.0.0.1", 0), SlowProviderHandler)
+    provider.daemon_threads = True
+    threading.Thread(target=provider.serve_forever, daemon=True).start()
+    
+    port = free_port()
+    env = dict(
+        os.environ,
+        XAI_API_KEY="load-test",
+        XAI_API_URL=f"http://127.0.0.1:{provider.server_port}",
+        SECRETS_PREFETCH="false",
+        FLASK_ENV="production"
+    )
+    server = subprocess.Popen(
+        shlex.split(args.server.format(port=port)),
+        cwd=os.path.abspath(os.path.dirname(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_for_server(url)
+        result = run_load(url, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        provider.shutdown()
+    
+    result.update({
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "provider_delay": args.provider_delay
+    })
+    print(json.dumps(result, indent=2))
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Minocrisy AI Tools - Gunicorn Configuration
+Production server settings, loaded automatically by gunicorn from the working directory.
+
+Requests spend most of their time waiting on provider APIs (and polling video
+jobs), so each worker runs a pool of threads instead of handling one request
+at a time. Worker and thread counts are derived from the CPUs and memory
+available to the instance; see app/utils/serving.py.
+"""
+import os
+import sys
+
+# Make the app importable when gunicorn is started from another directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import serving
+
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# Threaded workers sized for long I/O-bound requests
+worker_class = "gthread"
+workers, threads = serving.worker_settings()
+
+# Load the app once in the master and fork workers from it (copy-on-write)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Longest request deadline is 240s (talking head generation); leave room for it
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+
+# Let in-flight generations finish on shutdown or reload instead of cutting them off
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", timeout))
+
+keepalive = 5
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+def when_ready(server):
+    """
+    Check the application before workers are forked, and finish loading it if preloaded.
+    
+    Without preload_app each worker loads its own application, so the master
+    only checks a throwaway copy (without prefetching secrets) and never keeps
+    an application the workers would inherit.
+    """
+    if preload_app:
+        app = server.app.wsgi()
+    else:
+        from app import create_app
+        app = create_app({"SECRETS_PREFETCH": False})
+    
+    for warning in serving.check_startup(app, timeout=timeout):
+        server.log.warning(warning)
+    
+    if preload_app:
+        serving.preload(app)
+    
+    server.log.info(f"Serving with {workers} {worker_class} worker(s) x {threads} threads")
+
+def post_fork(server, worker):
+    """Reset connection pools and background threads inherited from the master."""
+    if preload_app:
+        serving.after_fork(server.app.wsgi())
@@ -8,12 +8,12 @@ from flask import Flask, render_template, jsonify
 from flask_cors import CORS
 from app import create_app
 
+# Create the Flask application (served by gunicorn as main:app, see gunicorn.conf.py)
+app = create_app()
+
 if __name__ == "__main__":
-    # Create the Flask application
-    app = create_app()
-    
     # Get port from environment variable (for Google Cloud App Engine)
     port = int(os.environ.get("PORT", 8080))
     
-    # Run the application
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Run the development server
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_ENV") != "production")
@@ -4,6 +4,11 @@ Tests for the Flask application.
 """
 import os
 import sys
+import gzip
+import json
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 
@@ -11,6 +16,7 @@ from unittest.mock import patch, MagicMock
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app
+from app.utils import hype_lexicon, near_duplicate, provider_router, result_cache, shared_cache
 
 class TestApp(unittest.TestCase):
     """Test the Flask application."""
@@ -124,5 +130,670 @@ class TestApp(unittest.TestCase):
         self.assertEqual(data['original_text'], 'Test text with AMAZING hype!')
         self.assertEqual(data['processed_text'], 'Test text with hype.')
 
+class TestToolRegistry(unittest.TestCase):
+    """Test lazy loading of tool blueprints."""
+    
+    def create_app(self, lazy):
+        """Create an app with every tool available."""
+        return create_app({
+            'TESTING': True,
+            'XAI_API_KEY': 'test-xai-key',
+            'HEDRA_API_KEY': 'test-hedra-key',
+            'LAZY_TOOL_LOADING': lazy
+        })
+    
+    def test_tool_is_loaded_on_first_request(self):
+        """Test that a lazy tool is only imported when it is first hit."""
+        app = self.create_app(lazy=True)
+        lazy_tool = app.extensions['lazy_tools']['hype-remover']
+        self.assertFalse(lazy_tool.loaded)
+        
+        response = app.test_client().get('/tools/hype-remover/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Hype Remover', response.data)
+        self.assertTrue(lazy_tool.loaded)
+    
+    def test_lazy_tool_routes(self):
+        """Test that nested routes, methods and 404s behave like eager blueprints."""
+        for lazy in (True, False):
+            client = self.create_app(lazy).test_client()
+            
+            response = client.post('/tools/hype-remover/export/x', json={'text': 'Plain text'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['formatted_text'], 'Plain text')
+            
+            self.assertEqual(client.get('/tools/hype-remover/export/x').status_code, 405)
+            self.assertEqual(client.get('/tools/hype-remover/missing').status_code, 404)
+    
+    def test_tools_list_matches_registry(self):
+        """Test that /api/tools lists the registered tools."""
+        response = self.create_app(lazy=True).test_client().get('/api/tools')
+        tool_ids = [tool['id'] for tool in response.get_json()]
+        self.assertEqual(tool_ids, ['talking-head', 'hype-remover', 'xai-chat', 'hedra-character'])
+        self.assertNotIn('package', response.get_json()[0])
+
+class TestHypeCache(unittest.TestCase):
+    """Test caching of hype removal results."""
+    
+    def setUp(self):
+        """Set up an app with a private cache directory."""
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'XAI_API_KEY': 'test-xai-key',
+            'RESULT_CACHE_DIR': self.cache_dir.name
+        })
+        self.client = self.app.test_client()
+        result_cache.reset_result_caches()
+        near_duplicate.reset_near_duplicate_indexes()
+        provider_router.reset_router()
+        hype_lexicon.reset_prefilter_stats()
+    
+    def tearDown(self):
+        """Drop the caches and their directory."""
+        result_cache.reset_result_caches()
+        near_duplicate.reset_near_duplicate_indexes()
+        self.cache_dir.cleanup()
+    
+    def process(self, text, **options):
+        """Post text to the hype remover."""
+        return self.client.post('/tools/hype-remover/process', json=dict(options, text=text)).get_json()
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_repeated_text_is_served_from_cache(self, mock_remove_hype):
+        """Test that equivalent requests only call the provider once."""
+        mock_remove_hype.return_value = {'processed_text': 'A product.', 'changes': []}
+        
+        self.assertFalse(self.process('An  AMAZING product!', custom_hype_terms=['b', 'a'])['cached'])
+        data = self.process(' An AMAZING product!\n', custom_hype_terms=['a', 'b'])
+        
+        self.assertTrue(data['cached'])
+        self.assertEqual(data['original_text'], ' An AMAZING product!\n')
+        self.assertEqual(mock_remove_hype.call_count, 1)
+        
+        # A different strength is a different result
+        self.assertFalse(self.process('An AMAZING product!', strength='strong')['cached'])
+        
+        stats = self.client.get('/api/metrics').get_json()['result_caches']['hype_remover']
+        self.assertEqual(stats['memory_hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_bypass_and_invalidation(self, mock_remove_hype):
+        """Test that the cache can be bypassed and cleared."""
+        mock_remove_hype.return_value = {'processed_text': 'A product.', 'changes': []}
+        
+        self.process('An AMAZING product!')
+        self.assertFalse(self.process('An AMAZING product!', use_cache=False)['cached'])
+        
+        # Clearing the cache needs the admin token
+        self.assertEqual(self.client.delete('/tools/hype-remover/cache').status_code, 404)
+        self.app.config['CACHE_ADMIN_TOKEN'] = 'admin-token'
+        self.assertEqual(self.client.delete('/tools/hype-remover/cache', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        self.assertTrue(self.process('An AMAZING product!')['cached'])
+        self.assertEqual(self.client.delete('/tools/hype-remover/cache', headers={'Authorization': 'Bearer admin-token'}).status_code, 200)
+        self.assertFalse(self.process('An AMAZING product!')['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 3)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_disk_tier_survives_restart(self, mock_remove_hype):
+        """Test that a new process is served from the disk tier."""
+        mock_remove_hype.return_value = {'processed_text': 'A product.', 'changes': []}
+        self.process('An AMAZING product!')
+        
+        # Simulate a new instance by dropping the in-memory caches
+        result_cache.reset_result_caches()
+        
+        self.assertTrue(self.process('An AMAZING product!')['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 1)
+        stats = result_cache.get_result_cache_stats()['hype_remover']
+        self.assertEqual(stats['disk_hits'], 1)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_near_duplicate_reuses_changes(self, mock_remove_hype):
+        """Test that a resubmitted article with a new date reuses the cached changes."""
+        self.app.config.update(NEAR_DUPLICATE_THRESHOLD=0.9)
+        article = (
+            'Updated 2024-05-01. Our revolutionary battery is the ultimate breakthrough in energy storage. '
+            'It charges in ten minutes and lasts for a full week of normal use, according to lab tests.'
+        )
+        mock_remove_hype.return_value = {
+            'processed_text': article.replace('revolutionary', 'new').replace('the ultimate breakthrough', 'an improvement'),
+            'changes': [
+                {'original': 'revolutionary', 'replacement': 'new', 'confidence': 0.9},
+                {'original': 'the ultimate breakthrough', 'replacement': 'an improvement', 'confidence': 0.8}
+            ]
+        }
+        self.process(article)
+        
+        data = self.process(article.replace('2024-05-01', '2024-06-12'))
+        self.assertTrue(data['cached'])
+        self.assertGreaterEqual(data['near_duplicate'], 0.9)
+        self.assertEqual(
+            data['processed_text'],
+            'Updated 2024-06-12. Our new battery is an improvement in energy storage. '
+            'It charges in ten minutes and lasts for a full week of normal use, according to lab tests.'
+        )
+        self.assertEqual(mock_remove_hype.call_count, 1)
+        
+        # Other options never match
+        self.assertNotIn('near_duplicate', self.process(article.replace('2024-05-01', '2024-06-12'), strength='strong'))
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_near_duplicate_changes_apply_once(self, mock_remove_hype):
+        """Test that a reused change replaces one whole-word occurrence, not every substring."""
+        self.app.config.update(NEAR_DUPLICATE_THRESHOLD=0.9)
+        article = (
+            'Updated 2024-05-01. The best bestseller of the year is best for families who read every night, '
+            'according to the publisher and several independent reviewers in the trade press.'
+        )
+        mock_remove_hype.return_value = {
+            'processed_text': article.replace('The best', 'The good'),
+            'changes': [{'original': 'best', 'replacement': 'good', 'confidence': 0.9}, {'original': 'missing', 'replacement': 'x'}]
+        }
+        self.process(article)
+        
+        data = self.process(article.replace('2024-05-01', '2024-06-12'))
+        self.assertIn('near_duplicate', data)
+        self.assertEqual(data['processed_text'], article.replace('2024-05-01', '2024-06-12').replace('The best', 'The good'))
+        self.assertEqual([change['original'] for change in data['changes']], ['best'])
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_concurrent_requests_share_one_call(self, mock_remove_hype):
+        """Test that simultaneous requests for the same text make one provider call."""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def remove_hype(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return {'processed_text': 'A product.', 'changes': []}
+        
+        mock_remove_hype.side_effect = remove_hype
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.app.test_client().post(
+                '/tools/hype-remover/process', json={'text': 'An AMAZING product!'}
+            ).get_json()))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        started.wait(5)
+        for _ in range(500):
+            if self.client.get('/api/metrics').get_json()['singleflight'].get('xai', {}).get('coalesced', 0) >= 2:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(mock_remove_hype.call_count, 1)
+        self.assertEqual([result['processed_text'] for result in results], ['A product.'] * 3)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_hedged_request(self, mock_remove_hype):
+        """Test that a slow primary provider is hedged with another configured one."""
+        self.app.config.update(GEMINI_API_KEY='test-gemini-key', HEDGE_DEFAULT_DELAY=0.05, HEDGE_MIN_DELAY=0.01)
+        
+        def remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+            if use_xai:
+                time.sleep(0.5)
+            return {'processed_text': 'From xAI' if use_xai else 'From Gemini', 'changes': []}
+        
+        mock_remove_hype.side_effect = remove_hype
+        data = self.process('An AMAZING product!', hedge=True)
+        
+        self.assertEqual(data['processed_text'], 'From Gemini')
+        self.assertEqual(data['provider'], 'gemini')
+        self.assertTrue(data['hedge']['hedged'])
+        
+        # Without hedging the primary's answer is awaited
+        self.assertEqual(self.process('Another AMAZING product!')['provider'], 'xai')
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_failing_provider_fails_over(self, mock_remove_hype):
+        """Test that a failing provider fails over to the next one and is then routed around."""
+        self.app.config.update(GEMINI_API_KEY='test-gemini-key')
+        
+        def remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+            if use_xai:
+                raise Exception('xAI is down')
+            return {'processed_text': 'From Gemini', 'changes': []}
+        
+        mock_remove_hype.side_effect = remove_hype
+        for attempt in range(provider_router.MIN_SAMPLES):
+            self.assertEqual(self.process(f'AMAZING product {attempt}!')['provider'], 'gemini')
+        self.assertEqual(mock_remove_hype.call_count, 2 * provider_router.MIN_SAMPLES)
+        
+        # xAI is now known to fail, so requests go to Gemini first
+        self.assertEqual(self.process('AMAZING product again!')['provider'], 'gemini')
+        self.assertEqual(mock_remove_hype.call_count, 2 * provider_router.MIN_SAMPLES + 1)
+        routing = self.client.get('/api/metrics').get_json()['routing']
+        self.assertEqual(routing['failovers'], {'xai': provider_router.MIN_SAMPLES})
+        self.assertEqual(routing['backends']['xai/grok-2-1212']['success_rate'], 0.0)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_fallback_results_are_not_cached(self, mock_remove_hype):
+        """Test that a fallback provider's result isn't cached as the preferred one's, and fallbacks can be limited."""
+        self.app.config.update(GEMINI_API_KEY='test-gemini-key')
+        
+        def remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+            if use_xai and mock_remove_hype.call_count == 1:
+                raise Exception('xAI is down')
+            return {'processed_text': 'From xAI' if use_xai else 'From Gemini', 'changes': []}
+        
+        mock_remove_hype.side_effect = remove_hype
+        self.assertEqual(self.process('An AMAZING product!')['provider'], 'gemini')
+        data = self.process('An AMAZING product!')
+        self.assertEqual((data['provider'], data['cached']), ('xai', False))
+        self.assertTrue(self.process('An AMAZING product!')['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 3)
+        
+        # Gemini isn't among the accepted providers
+        mock_remove_hype.side_effect = Exception('xAI is down')
+        response = self.client.post('/tools/hype-remover/process', json={'text': 'Another AMAZING product!', 'providers': ['xai', 'openai']})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mock_remove_hype.call_count, 4)
+        
+        for providers in (5, 'xai', ['xai', 'claude']):
+            response = self.client.post('/tools/hype-remover/process', json={'text': 'Another AMAZING product!', 'providers': providers})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/tools/hype-remover/research', json={'topic': 'Batteries', 'providers': 5}).status_code, 400)
+        self.assertEqual(mock_remove_hype.call_count, 4)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_results_are_cached_without_the_requested_provider(self, mock_remove_hype):
+        """Test that results are cached under the configured fallback when the requested provider has no key."""
+        self.app.config.update(XAI_API_KEY='', GEMINI_API_KEY='test-gemini-key')
+        mock_remove_hype.return_value = {'processed_text': 'A product.', 'changes': []}
+        
+        self.assertEqual(self.process('An AMAZING product!')['provider'], 'gemini')
+        self.assertTrue(self.process('An AMAZING product!')['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 1)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_fast_mode_escalates_unsure_results(self, mock_remove_hype):
+        """Test that fast mode keeps confident fast model results and escalates the others."""
+        def remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+            if model == 'grok-3-mini':
+                confidence = 0.5 if 'revolutionary' in text else 0.95
+                return {'processed_text': 'Fast.', 'changes': [{'original': 'AMAZING', 'replacement': 'a', 'confidence': confidence}], 'accuracy_score': 0.9}
+            return {'processed_text': 'Full.', 'changes': [], 'accuracy_score': 0.9}
+        
+        mock_remove_hype.side_effect = remove_hype
+        data = self.process('An AMAZING product!', fast=True)
+        self.assertEqual((data['processed_text'], data['tier']), ('Fast.', 'fast'))
+        self.assertEqual(mock_remove_hype.call_count, 1)
+        
+        data = self.process('An AMAZING revolutionary product!', fast=True)
+        self.assertEqual((data['processed_text'], data['tier']), ('Full.', 'full'))
+        self.assertEqual(mock_remove_hype.call_count, 3)
+        
+        # Fast and full results are cached separately
+        self.assertEqual(self.process('An AMAZING product!')['tier'], 'full')
+        self.assertTrue(self.process('An AMAZING product!', fast=True)['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 4)
+    
+    @patch('app.tools.hype_remover.service.chat_completion')
+    def test_wrapped_json_response(self, mock_chat_completion):
+        """Test that a JSON answer wrapped in prose and a code fence is still used, in JSON mode."""
+        mock_chat_completion.return_value = (
+            'Here is the result:\n```json\n'
+            '{"processed_text": "A product.", "changes": [{"original": "An AMAZING", "replacement": "A", "confidence": 0.9}]}\n```'
+        )
+        
+        data = self.process('An AMAZING product!')
+        
+        self.assertEqual(data['processed_text'], 'A product.')
+        self.assertTrue(mock_chat_completion.call_args[1]['json_mode'])
+    
+    @patch('app.tools.hype_remover.service.chat_completion')
+    def test_response_cut_off_in_processed_text_is_not_used(self, mock_chat_completion):
+        """Test that a response cut off inside the processed text fails instead of being cached shorter."""
+        mock_chat_completion.return_value = '{"processed_text": "A product that charges in ten'
+        
+        response = self.client.post('/tools/hype-remover/process', json={'text': 'An AMAZING product that charges in ten minutes!'})
+        self.assertNotEqual(response.status_code, 200)
+        
+        # Cut off later, the processed text is whole and only the last change is dropped
+        mock_chat_completion.return_value = (
+            '{"processed_text": "A product that charges in ten minutes.", '
+            '"changes": [{"original": "An AMAZING", "replacement": "A", "confidence": 0.9}, {"orig'
+        )
+        data = self.process('An AMAZING product that charges in ten minutes!')
+        self.assertEqual(data['processed_text'], 'A product that charges in ten minutes.')
+        self.assertFalse(data['cached'])
+    
+    @patch('app.tools.hype_remover.service.chat_completion')
+    def test_lean_mode_diffs_changes_locally(self, mock_chat_completion):
+        """Test that lean mode asks for the text only and derives the changes with offsets."""
+        text = 'Our revolutionary battery charges in ten minutes.'
+        mock_chat_completion.return_value = json.dumps({
+            'processed_text': 'Our new battery charges in ten minutes.',
+            'edits': [{'phrase': 'revolutionary', 'reason': 'Unsupported superlative', 'confidence': 0.9}],
+            'accuracy_score': 0.95
+        })
+        
+        data = self.process(text, lean=True)
+        
+        self.assertNotIn('"changes"', mock_chat_completion.call_args[1]['messages'][1]['content'])
+        self.assertEqual(data['changes'], [{
+            'original': 'revolutionary', 'replacement': 'new', 'offset': 4, 'processed_offset': 4,
+            'reason': 'Unsupported superlative', 'confidence': 0.9
+        }])
+        self.assertFalse(self.process(text)['cached'])
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_unconfigured_provider_is_skipped(self, mock_remove_hype):
+        """Test that a preferred provider without an API key is routed to a configured one."""
+        mock_remove_hype.return_value = {'processed_text': 'A product.', 'changes': []}
+        
+        data = self.process('An AMAZING product!', use_gemini=True)
+        
+        self.assertEqual(data['provider'], 'xai')
+        self.assertTrue(mock_remove_hype.call_args[0][5])
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_long_text_is_processed_in_chunks(self, mock_remove_hype):
+        """Test that long texts are split, processed concurrently and merged."""
+        self.app.config.update(HYPE_CHUNK_CHARS=30)
+        running = []
+        peak = []
+        lock = threading.Lock()
+        
+        def remove_hype(text, strength, custom_hype_terms, context, api_key, use_xai, use_gemini, model=None, lean=False):
+            with lock:
+                running.append(text)
+                peak.append(len(running))
+            time.sleep(0.1)
+            with lock:
+                running.remove(text)
+            return {
+                'processed_text': text.replace('AMAZING', 'good'),
+                'changes': [{'original': 'AMAZING', 'replacement': 'good'}] if 'AMAZING' in text else [],
+                'overall_hype_score': 1.0 if 'AMAZING' in text else 0.0,
+                'accuracy_score': 0.9
+            }
+        
+        mock_remove_hype.side_effect = remove_hype
+        text = 'An AMAZING product.\n\nIt ships in May.\n\nThe AMAZING team built it.'
+        data = self.process(text)
+        
+        self.assertEqual(data['chunks'], 3)
+        self.assertEqual(mock_remove_hype.call_count, 3)
+        self.assertGreater(max(peak), 1)
+        self.assertEqual(data['processed_text'], text.replace('AMAZING', 'good'))
+        self.assertEqual([change['offset'] for change in data['changes']], [3, text.rindex('AMAZING')])
+        self.assertAlmostEqual(data['overall_hype_score'], (19 + 26) / (19 + 16 + 26))
+        self.assertFalse(data['cached'])
+        
+        # Each chunk is cached on its own
+        self.assertTrue(self.process(text)['cached'])
+        self.assertEqual(mock_remove_hype.call_count, 3)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_incremental_mode_only_sends_edited_paragraphs(self, mock_remove_hype):
+        """Test that re-processing an edited text reuses the unchanged paragraphs."""
+        mock_remove_hype.side_effect = lambda text, *args, **kwargs: {
+            'processed_text': text.replace('AMAZING', 'good'),
+            'changes': [{'original': 'AMAZING', 'replacement': 'good', 'confidence': 0.9}],
+            'overall_hype_score': 0.8,
+            'accuracy_score': 0.9
+        }
+        text = 'An AMAZING product.\n\nAn AMAZING team.\n\nAn AMAZING price.'
+        self.assertEqual(self.process(text, incremental=True)['incremental'], {'paragraphs': 3, 'cached': 0})
+        
+        edited = text.replace('team', 'crew')
+        data = self.process(edited, incremental=True)
+        
+        self.assertEqual(data['incremental'], {'paragraphs': 3, 'cached': 2})
+        self.assertEqual(mock_remove_hype.call_count, 4)
+        self.assertEqual(mock_remove_hype.call_args[0][0], 'An AMAZING crew.')
+        self.assertEqual(data['processed_text'], edited.replace('AMAZING', 'good'))
+        self.assertEqual([change['offset'] for change in data['changes']], [3, 24, 42])
+        self.assertAlmostEqual(data['overall_hype_score'], 0.8)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_incremental_mode_sends_edited_long_paragraphs(self, mock_remove_hype):
+        """Test that an edited paragraph goes to the provider even when near-duplicate matching is on."""
+        self.app.config.update(NEAR_DUPLICATE_THRESHOLD=0.9)
+        mock_remove_hype.side_effect = lambda text, *args, **kwargs: {
+            'processed_text': text.replace('revolutionary ', '').replace('AMAZING', 'good'),
+            'changes': [],
+            'overall_hype_score': 0.8,
+            'accuracy_score': 0.9
+        }
+        paragraph = (
+            'The company released its AMAZING new battery this spring after three years of development in its lab near the river. '
+            'Engineers tested the cells through thousands of charge cycles in hot and cold rooms, and they published the results '
+            'together with the raw measurements so that other teams could check the numbers. The first customers are delivery '
+            'firms that run small electric vans in dense city centres, where daily ranges are short and charging stops are easy to plan.'
+        )
+        text = paragraph + '\n\n' + paragraph.replace('company', 'startup')
+        self.process(text, incremental=True)
+        self.assertEqual(mock_remove_hype.call_count, 2)
+        
+        edited = text.replace('AMAZING new battery', 'AMAZING revolutionary new battery', 1)
+        data = self.process(edited, incremental=True)
+        
+        self.assertEqual(data['incremental'], {'paragraphs': 2, 'cached': 1})
+        self.assertEqual(mock_remove_hype.call_count, 3)
+        self.assertNotIn('revolutionary', data['processed_text'])
+        self.assertNotIn('near_duplicate', data)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_batch_streams_results_as_they_finish(self, mock_remove_hype):
+        """Test that a gzip-encoded batch streams each item's result or error as it finishes."""
+        release = threading.Event()
+        
+        def remove_hype(text, strength, *args, **kwargs):
+            if 'slow' in text:
+                release.wait(5)
+            if 'broken' in text:
+                raise Exception('Provider error')
+            return {'processed_text': f'{text} ({strength})', 'changes': []}
+        
+        mock_remove_hype.side_effect = remove_hype
+        body = {'strength': 'strong', 'items': [
+            {'id': 'a', 'text': 'A slow AMAZING product.'},
+            {'id': 'b', 'text': 'A fast AMAZING product.', 'strength': 'moderate'},
+            {'id': 'c', 'text': 'A broken AMAZING product.'},
+            {'id': 'd'}
+        ]}
+        response = self.client.post(
+            '/tools/hype-remover/process/batch',
+            data=gzip.compress(json.dumps(body).encode()),
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+            buffered=False
+        )
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        
+        # The other items arrive while the slow one is still running
+        lines = iter(response.response)
+        first = [json.loads(next(lines)) for _ in range(3)]
+        self.assertEqual({(line['id'], line['status']) for line in first}, {('b', 200), ('c', 500), ('d', 400)})
+        self.assertEqual(next(line for line in first if line['id'] == 'b')['result']['processed_text'], 'A fast AMAZING product. (moderate)')
+        
+        release.set()
+        rest = [json.loads(line) for line in lines]
+        response.close()
+        self.assertEqual((rest[0]['id'], rest[0]['index'], rest[0]['result']['processed_text']), ('a', 0, 'A slow AMAZING product. (strong)'))
+        self.assertEqual(rest[1], {'done': True, 'items': 4, 'failed': 2})
+        
+        self.assertEqual(self.client.post('/tools/hype-remover/process/batch', json={'items': []}).status_code, 400)
+    
+    @patch('app.tools.hype_remover.service._remove_hype')
+    def test_prefilter_skips_and_shrinks_calls(self, mock_remove_hype):
+        """Test that clean texts skip the provider and only flagged sentences are sent."""
+        self.app.config.update(HYPE_PREFILTER=True)
+        mock_remove_hype.side_effect = lambda text, *args, **kwargs: {
+            'processed_text': text.replace('revolutionary', 'new'),
+            'changes': [{'original': 'revolutionary', 'replacement': 'new', 'confidence': 0.9}],
+            'overall_hype_score': 0.8,
+            'accuracy_score': 0.9
+        }
+        
+        data = self.process('The battery charges in ten minutes. It lasts a week.')
+        self.assertEqual((data['changes'], data['overall_hype_score'], data['provider']), ([], 0.0, None))
+        mock_remove_hype.assert_not_called()
+        
+        text = (
+            'The company was founded in 2010. It makes batteries. Sales grew last year. The plant is in Ohio. '
+            'It employs 200 people. Our revolutionary cell is here. It charges fast. Prices start at $99.'
+        )
+        data = self.process(text)
+        sent = mock_remove_hype.call_args[0][0]
+        self.assertEqual(sent, 'It employs 200 people. Our revolutionary cell is here. It charges fast.')
+        self.assertEqual(data['processed_text'], text.replace('revolutionary', 'new'))
+        self.assertEqual(data['changes'][0]['offset'], text.index('revolutionary'))
+        self.assertEqual(data['prefilter'], {'excerpts': 1, 'sent_chars': len(sent)})
+        
+        # Custom terms are flagged too
+        self.process('The plant is in Ohio. It is a unicorn factory.', custom_hype_terms=['Unicorn  factory'])
+        self.assertEqual(mock_remove_hype.call_count, 2)
+        metrics = self.client.get('/api/metrics').get_json()['prefilter']
+        self.assertEqual((metrics['clean'], metrics['excerpts'], metrics['full']), (1, 1, 1))
+
+class TestSharedState(unittest.TestCase):
+    """Test application state kept in the shared cache."""
+    
+    def setUp(self):
+        """Set up two apps (standing in for two workers) sharing an SQLite cache."""
+        self.directory = tempfile.TemporaryDirectory()
+        config = {
+            'TESTING': True,
+            'XAI_API_KEY': 'test-xai-key',
+            'SHARED_CACHE_URL': f'sqlite:///{self.directory.name}/shared.db'
+        }
+        self.workers = [create_app(config).test_client() for _ in range(2)]
+    
+    def tearDown(self):
+        """Close the shared cache and remove it."""
+        shared_cache.reset_shared_caches()
+        self.directory.cleanup()
+    
+    def test_saved_outputs_are_shared_between_workers(self):
+        """Test that an output saved by one worker is listed and deleted by another."""
+        response = self.workers[0].post('/tools/hype-remover/save', json={
+            'title': 'Battery',
+            'original_text': 'A revolutionary battery.',
+            'processed_text': 'A new battery.'
+        })
+        output_id = response.get_json()['output_id']
+        
+        outputs = self.workers[1].get('/tools/hype-remover/saved').get_json()['outputs']
+        self.assertEqual(outputs[output_id]['processed_text'], 'A new battery.')
+        
+        self.assertEqual(self.workers[1].delete(f'/tools/hype-remover/saved/{output_id}').status_code, 200)
+        self.assertEqual(self.workers[0].get('/tools/hype-remover/saved').get_json()['outputs'], {})
+
+class TestResearchCache(unittest.TestCase):
+    """Test stale-while-revalidate caching of research results."""
+    
+    def setUp(self):
+        """Set up an app with a memory-only research cache."""
+        self.app = create_app({
+            'TESTING': True,
+            'XAI_API_KEY': 'test-xai-key',
+            'RESULT_CACHE_DIR': '',
+            'RESEARCH_CACHE_TTL': 3600,
+            'RESEARCH_CACHE_MAX_STALE': 600
+        })
+        self.client = self.app.test_client()
+        result_cache.reset_result_caches()
+        near_duplicate.reset_near_duplicate_indexes()
+    
+    def tearDown(self):
+        """Drop the caches."""
+        result_cache.reset_result_caches()
+        near_duplicate.reset_near_duplicate_indexes()
+    
+    def research(self, topic, **options):
+        """Post a topic to the research endpoint."""
+        return self.client.post('/tools/hype-remover/research', json=dict(options, topic=topic)).get_json()
+    
+    def wait_for_refreshes(self, count):
+        """Wait until the background refreshes have finished."""
+        for _ in range(100):
+            if result_cache.get_result_cache_stats()['research']['refreshes'] >= count:
+                return
+            time.sleep(0.01)
+        self.fail('Background refresh did not finish')
+    
+    @patch('app.tools.hype_remover.service.chat_completion')
+    def test_response_cut_off_in_summary_is_not_used(self, mock_chat_completion):
+        """Test that a response cut off inside the summary fails instead of being cached shorter."""
+        mock_chat_completion.return_value = '{"summary": "Fusion power is still'
+        
+        response = self.client.post('/tools/hype-remover/research', json={'topic': 'Fusion power'})
+        self.assertNotEqual(response.status_code, 200)
+        
+        # Cut off later, the summary is whole and only the incomplete last member is dropped
+        mock_chat_completion.return_value = '{"summary": "Fusion power is still experimental.", "key_points": ["Costly"], "sour'
+        data = self.research('Fusion power')
+        self.assertEqual((data['summary'], data['key_points'], data['cached']), ('Fusion power is still experimental.', ['Costly'], False))
+    
+    @patch('app.tools.hype_remover.service._research_topic')
+    def test_stale_result_is_served_while_refreshing(self, mock_research):
+        """Test that a stale entry is returned at once and refreshed in the background."""
+        mock_research.side_effect = [{'summary': 'v1'}, {'summary': 'v2'}]
+        from app.tools.hype_remover.service import RESEARCH_CACHE_NAME, research_cache_key
+        
+        self.assertFalse(self.research('Fusion power')['cached'])
+        self.assertTrue(self.research('  fusion POWER ')['cached'])
+        
+        # Age the entry past its freshness TTL
+        with self.app.app_context():
+            cache = result_cache.get_result_cache(RESEARCH_CACHE_NAME)
+            cache.set(research_cache_key('Fusion power', 'xai'), {'summary': 'v1'}, ttl=300)
+        
+        data = self.research('Fusion power')
+        self.assertTrue(data['stale'])
+        self.assertEqual(data['summary'], 'v1')
+        
+        self.wait_for_refreshes(1)
+        data = self.research('Fusion power')
+        self.assertFalse(data['stale'])
+        self.assertEqual(data['summary'], 'v2')
+        self.assertEqual(mock_research.call_count, 2)
+    
+    @patch('app.tools.hype_remover.service._research_topic')
+    def test_force_refresh(self, mock_research):
+        """Test that force_refresh researches the topic again."""
+        mock_research.side_effect = [{'summary': 'v1'}, {'summary': 'v2'}]
+        
+        self.research('Fusion power')
+        data = self.research('Fusion power', force_refresh=True)
+        
+        self.assertFalse(data['cached'])
+        self.assertEqual(data['summary'], 'v2')
+        self.assertEqual(self.research('Fusion power')['summary'], 'v2')
+    
+    @patch('app.tools.hype_remover.service._research_topic')
+    def test_near_duplicate_topic_keeps_its_freshness(self, mock_research):
+        """Test that a near-duplicate topic's stale entry is served as stale and refreshed."""
+        self.app.config.update(NEAR_DUPLICATE_THRESHOLD=0.8)
+        mock_research.side_effect = [{'summary': 'v1'}, {'summary': 'v2'}]
+        from app.tools.hype_remover.service import RESEARCH_CACHE_NAME, research_cache_key
+        topic = 'Recent progress in commercial fusion power plants and the timelines announced by private companies'
+        self.research(topic)
+        
+        # Age the entry past its freshness TTL
+        with self.app.app_context():
+            cache = result_cache.get_result_cache(RESEARCH_CACHE_NAME)
+            cache.set(research_cache_key(topic, 'xai'), {'summary': 'v1'}, ttl=300)
+        
+        data = self.research(topic + '!')
+        self.assertIn('near_duplicate', data)
+        self.assertTrue(data['stale'])
+        self.assertEqual(data['summary'], 'v1')
+        
+        self.wait_for_refreshes(1)
+        data = self.research(topic + '!')
+        self.assertFalse(data['stale'])
+        self.assertEqual(data['summary'], 'v2')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+"""
+Minocrisy AI Tools - Benchmark Tests
+Tests for the cold start benchmark report and budgets.
+"""
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the benchmark
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import benchmark_cold_start
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   jinja2.utils
+import time:       300 |        400 | jinja2
+import time:      2000 |       2000 |     google.generativeai.types
+import time:       500 |       2500 |   google.generativeai
+import time:        50 |       2950 | app
+"""
+
+class TestColdStartBenchmark(unittest.TestCase):
+    """Test the cold start benchmark helpers."""
+    
+    def test_import_time_is_attributed_to_packages(self):
+        """Test that self times are summed per top-level package."""
+        modules = benchmark_cold_start.parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual(len(modules), 5)
+        
+        imports = benchmark_cold_start.aggregate_imports(modules, top=2)
+        self.assertAlmostEqual(imports['total'], 0.00295)
+        self.assertEqual(list(imports['packages']), ['google', 'jinja2', 'app'])
+        self.assertAlmostEqual(imports['packages']['google'], 0.0025)
+        self.assertEqual(imports['slowest_modules'][0]['module'], 'google.generativeai.types')
+    
+    def test_budgets_are_enforced(self):
+        """Test that metrics above their budget are reported."""
+        summary = {'import': 0.4, 'create_app': 0.1, 'ttfb': {'/': 0.05, '/health': 0.5}}
+        
+        violations = benchmark_cold_start.check_budgets(summary, {'import': 0.5, 'create_app': 0.05, 'ttfb': 0.2})
+        
+        self.assertEqual(len(violations), 2)
+        self.assertTrue(violations[0].startswith('create_app'))
+        self.assertTrue(violations[1].startswith('/health'))
+
+if __name__ == '__main__':
+    unittest.main()
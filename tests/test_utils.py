@@ -0,0 +1,1275 @@
+"""
+Minocrisy AI Tools - Utility Tests
+Tests for the shared helpers in app.utils.
+"""
+import os
+import sys
+import asyncio
+import fnmatch
+import importlib.util
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+import unittest
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils import async_http, deadline, hedging, http_client, hype_lexicon, json_output, near_duplicate, provider_router, rate_limit, request_body, resilience, result_cache, secrets, serving, shared_cache, singleflight, text_chunks, warmup, word_diff, xai_api
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive HTTP handler standing in for a provider API."""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class FlakyHandler(StubHandler):
+    """Stub handler that replies with queued status codes before succeeding."""
+    
+    statuses = []
+    
+    def do_GET(self):
+        # Consume the request body so the kept-alive connection stays usable
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.statuses:
+            return super().do_GET()
+        status = self.statuses.pop(0)
+        self.send_response(status)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+    
+    do_POST = do_GET
+
+class SlowHandler(StubHandler):
+    """Stub handler that takes a second to answer."""
+    
+    def do_GET(self):
+        time.sleep(1)
+        super().do_GET()
+
+class ChatHandler(StubHandler):
+    """Stub chat completions API that answers every request after a delay."""
+    
+    delay = 0.3
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with ChatHandler.lock:
+            ChatHandler.in_flight += 1
+            ChatHandler.max_in_flight = max(ChatHandler.max_in_flight, ChatHandler.in_flight)
+        time.sleep(self.delay)
+        with ChatHandler.lock:
+            ChatHandler.in_flight -= 1
+        body = json.dumps({"choices": [{"message": {"content": "stub reply"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_server(handler=StubHandler, threaded=False):
+    """Start a stub HTTP server on a free port and return it."""
+    server = (ThreadingHTTPServer if threaded else HTTPServer)(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    """Minimal Redis protocol server supporting the commands of the shared cache."""
+    
+    data = {}  # key -> (value, expires_at or None)
+    versions = {}
+    lock = threading.Lock()
+    
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+    
+    def encode(self, reply):
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(self.encode(item) for item in reply)
+        if reply == "OK":
+            return b"+OK\r\n"
+        data = reply.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    
+    def live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            entry = None
+        return entry[0] if entry else None
+    
+    def run(self, name, args):
+        if name == "GET":
+            return self.live(args[0])
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            if "NX" in options and self.live(key) is not None:
+                return None
+            expires_at = time.time() + int(options[options.index("PX") + 1]) / 1000 if "PX" in options else None
+            self.data[key] = (value, expires_at)
+            self.versions[key] = self.versions.get(key, 0) + 1
+            return "OK"
+        if name == "DEL":
+            for key in args:
+                self.data.pop(key, None)
+                self.versions[key] = self.versions.get(key, 0) + 1
+            return len(args)
+        if name == "SCAN":
+            pattern = args[args.index("MATCH") + 1].replace("\\", "")
+            return ["0", [key for key in list(self.data) if fnmatch.fnmatchcase(key, pattern)]]
+        return "OK"
+    
+    def handle(self):
+        watched, queued = {}, None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            with self.lock:
+                if name == "WATCH":
+                    watched.update({key: self.versions.get(key, 0) for key in args[1:]})
+                    reply = "OK"
+                elif name == "UNWATCH":
+                    watched, reply = {}, "OK"
+                elif name == "MULTI":
+                    queued, reply = [], "OK"
+                elif name == "EXEC":
+                    changed = any(self.versions.get(key, 0) != version for key, version in watched.items())
+                    reply = None if changed else [self.run(command[0].upper(), command[1:]) for command in queued]
+                    watched, queued = {}, None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = "QUEUED"
+                else:
+                    reply = self.run(name, args[1:])
+            self.wfile.write(b"+QUEUED\r\n" if reply == "QUEUED" else self.encode(reply))
+
+def start_redis_stand_in():
+    """Start a Redis stand-in server on a free port and return it."""
+    RedisStandInHandler.data = {}
+    RedisStandInHandler.versions = {}
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RedisStandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class TestSecretCache(unittest.TestCase):
+    """Test caching of secrets resolved from Secret Manager."""
+    
+    def setUp(self):
+        """Set up an app with a GCP project so Secret Manager is consulted."""
+        self.app = create_app({
+            'TESTING': True,
+            'GCP_PROJECT_ID': 'test-project',
+            'SECRET_CACHE_TTL': 300,
+            'SECRET_CACHE_NEGATIVE_TTL': 60
+        })
+        secrets.clear_secret_cache()
+    
+    def tearDown(self):
+        """Clean up the test environment."""
+        secrets.clear_secret_cache()
+    
+    @patch('app.utils.secrets._fetch_secret')
+    def test_secret_is_fetched_once(self, mock_fetch):
+        """Test that repeated lookups are served from the cache."""
+        mock_fetch.return_value = 'secret-value'
+        hits = secrets.get_secret_cache_stats()['hits']
+        
+        with self.app.app_context():
+            self.assertEqual(secrets.get_secret('TEST_CACHED_SECRET'), 'secret-value')
+            self.assertEqual(secrets.get_secret('TEST_CACHED_SECRET'), 'secret-value')
+        
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(secrets.get_secret_cache_stats()['hits'], hits + 1)
+    
+    @patch('app.utils.secrets._fetch_secret')
+    def test_missing_secret_is_negatively_cached(self, mock_fetch):
+        """Test that a missing secret is not looked up again."""
+        mock_fetch.side_effect = Exception('NotFound')
+        
+        with self.app.app_context():
+            self.assertIsNone(secrets.get_secret('TEST_CACHED_SECRET'))
+            self.assertIsNone(secrets.get_secret('TEST_CACHED_SECRET'))
+        
+        self.assertEqual(mock_fetch.call_count, 1)
+    
+    @patch('app.utils.secrets._fetch_secret')
+    def test_request_snapshot(self, mock_fetch):
+        """Test that a request reuses secrets it already resolved."""
+        mock_fetch.return_value = 'secret-value'
+        hits = secrets.get_secret_cache_stats()['hits']
+        
+        with self.app.test_request_context('/'):
+            secrets.get_secret('TEST_CACHED_SECRET')
+            secrets.get_secret('TEST_CACHED_SECRET')
+        
+        # The second lookup never reached the process-wide cache
+        self.assertEqual(secrets.get_secret_cache_stats()['hits'], hits)
+        self.assertEqual(mock_fetch.call_count, 1)
+    
+    @patch('app.utils.secrets._fetch_secret')
+    def test_prefetch_secrets(self, mock_fetch):
+        """Test that prefetched secrets are served from the vault."""
+        mock_fetch.side_effect = lambda name, project_id: f'{name.lower()}-value'
+        
+        with patch.dict(os.environ, {name: '' for name in secrets.KNOWN_SECRETS}):
+            app = create_app({
+                'TESTING': True,
+                'GCP_PROJECT_ID': 'test-project',
+                'SECRETS_PREFETCH': True,
+                'SECRETS_REFRESH_INTERVAL': 0
+            })
+            
+            try:
+                self.assertEqual(mock_fetch.call_count, len(secrets.KNOWN_SECRETS))
+                self.assertEqual(app.config['XAI_API_KEY'], 'xai_api_key-value')
+                
+                with app.test_request_context('/'):
+                    self.assertEqual(secrets.get_xai_api_key(), 'xai_api_key-value')
+                
+                # No further Secret Manager calls after startup
+                self.assertEqual(mock_fetch.call_count, len(secrets.KNOWN_SECRETS))
+            finally:
+                secrets._secret_vault.clear()
+    
+    def test_metrics_endpoint(self):
+        """Test that cache statistics are exposed."""
+        response = self.app.test_client().get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('secrets', response.get_json())
+
+class TestHttpClient(unittest.TestCase):
+    """Test the pooled provider sessions."""
+    
+    def setUp(self):
+        """Start a stub provider server."""
+        self.server = start_stub_server()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        http_client.close_sessions()
+    
+    def tearDown(self):
+        """Stop the stub server and drop pooled connections."""
+        http_client.close_sessions()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_session_is_shared_per_provider(self):
+        """Test that each provider gets a single shared session."""
+        self.assertIs(http_client.get_session('xai'), http_client.get_session('xai'))
+        self.assertIsNot(http_client.get_session('xai'), http_client.get_session('openai'))
+    
+    def test_connections_are_reused(self):
+        """Test that sequential requests reuse one kept-alive connection."""
+        for _ in range(3):
+            response = http_client.get('xai', self.url)
+            self.assertEqual(response.json(), {'ok': True})
+        
+        host_stats = list(http_client.get_pool_stats()['xai'].values())[0]
+        self.assertEqual(host_stats['requests'], 3)
+        self.assertEqual(host_stats['connections'], 1)
+        self.assertEqual(host_stats['reused'], 2)
+
+class TestResilience(unittest.TestCase):
+    """Test retries and circuit breakers in the HTTP client."""
+    
+    def setUp(self):
+        """Start a flaky stub provider server."""
+        self.server = start_stub_server(FlakyHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.app = create_app({
+            'TESTING': True,
+            'HTTP_MAX_RETRIES': 2,
+            'CIRCUIT_BREAKER_FAILURE_THRESHOLD': 2,
+            'CIRCUIT_BREAKER_RECOVERY_TIMEOUT': 60
+        })
+        resilience.reset_breakers()
+        http_client.reset_retry_stats()
+    
+    def tearDown(self):
+        """Stop the stub server."""
+        FlakyHandler.statuses = []
+        resilience.reset_breakers()
+        http_client.close_sessions()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_rate_limited_request_is_retried(self):
+        """Test that a 429 with Retry-After is retried, even for POST."""
+        FlakyHandler.statuses = [429]
+        
+        with self.app.app_context():
+            response = http_client.post('flaky', self.url, json={})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(http_client.get_retry_stats()['flaky'], 1)
+    
+    def test_breaker_opens_and_fails_fast(self):
+        """Test that repeated server errors open the breaker."""
+        FlakyHandler.statuses = [500, 500, 500]
+        
+        with self.app.app_context():
+            response = http_client.get('flaky', self.url, max_retries=0)
+            self.assertEqual(response.status_code, 500)
+            http_client.get('flaky', self.url, max_retries=0)
+            
+            with self.assertRaises(resilience.CircuitOpenError):
+                http_client.get('flaky', self.url)
+        
+        state = resilience.get_breaker_states()['flaky']
+        self.assertEqual(state['state'], 'open')
+        self.assertEqual(state['rejected_calls'], 1)
+        # The third queued error was never requested
+        self.assertEqual(FlakyHandler.statuses, [500])
+    
+    def test_retry_after_parsing(self):
+        """Test both forms of the Retry-After header."""
+        self.assertEqual(resilience.parse_retry_after('3'), 3.0)
+        self.assertEqual(resilience.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(resilience.parse_retry_after('soon'))
+
+class TestRateLimit(unittest.TestCase):
+    """Test provider rate limits and in-flight caps."""
+    
+    def setUp(self):
+        """Set up an app and forget existing limiters."""
+        self.app = create_app({'TESTING': True, 'RATE_LIMITS': {'throttled': {'rps': 20, 'burst': 1}}})
+        rate_limit.reset_limiters()
+    
+    def tearDown(self):
+        """Forget the limiters and retries of the tests."""
+        rate_limit.reset_limiters()
+        http_client.reset_retry_stats()
+    
+    def test_requests_are_spaced_at_the_rate(self):
+        """Test that queued calls pass at the requests-per-second rate instead of failing."""
+        limiter = rate_limit.Limiter('test', rps=20, burst=1)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire(max_wait=1).release()
+        
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        self.assertEqual(limiter.stats()['admitted'], 5)
+        self.assertEqual(limiter.stats()['waited'], 4)
+    
+    def test_in_flight_cap(self):
+        """Test that at most max_in_flight calls run at once and the others queue."""
+        limiter = rate_limit.Limiter('test', max_in_flight=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+        
+        def call():
+            with limiter.acquire(max_wait=5):
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.05)
+                with lock:
+                    running.pop()
+        
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = limiter.stats()
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(stats['admitted'], 6)
+        self.assertGreaterEqual(stats['max_queued'], 3)
+        self.assertEqual((stats['in_flight'], stats['queued']), (0, 0))
+    
+    def test_async_calls_queue(self):
+        """Test that async calls wait for a slot on the event loop."""
+        limiter = rate_limit.Limiter('test', max_in_flight=1)
+        
+        async def call():
+            slot = await limiter.acquire_async(max_wait=1)
+            await asyncio.sleep(0.05)
+            slot.release()
+        
+        async def main():
+            await asyncio.gather(call(), call(), call())
+        
+        started = time.monotonic()
+        asyncio.run(main())
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(limiter.stats()['admitted'], 3)
+        self.assertEqual(limiter.stats()['waited'], 2)
+    
+    def test_calls_waiting_too_long_are_rejected(self):
+        """Test that a call gives up after max_wait, for a slot or for tokens."""
+        limiter = rate_limit.Limiter('test', tpm=600, max_in_flight=1)
+        slot = limiter.acquire(tokens=600)
+        with self.assertRaises(rate_limit.RateLimitExceeded):
+            limiter.acquire(max_wait=0.05)
+        slot.release()
+        
+        # The token bucket is empty and refills 10 tokens a second
+        with self.assertRaises(rate_limit.RateLimitExceeded):
+            limiter.acquire(tokens=5, max_wait=0.1)
+        limiter.acquire(tokens=5, max_wait=1).release()
+        self.assertEqual(limiter.stats()['rejected'], 2)
+    
+    def test_only_configured_providers_are_capped(self):
+        """Test that in-flight caps only apply to providers listed in RATE_LIMITS."""
+        self.app.config['RATE_LIMITS'] = {'xai': {'rps': 5}}
+        with self.app.app_context():
+            self.assertEqual(rate_limit.get_limiter('xai').max_in_flight, rate_limit.PROVIDER_MAX_IN_FLIGHT['xai'])
+            self.assertIsNone(rate_limit.get_limiter('gemini'))
+    
+    def test_token_estimate(self):
+        """Test that tokens are estimated from the prompt and completion size."""
+        payload = {'messages': [{'role': 'user', 'content': 'x' * 400}], 'max_tokens': 50}
+        self.assertEqual(rate_limit.estimate_tokens(payload), 150)
+        self.assertEqual(rate_limit.estimate_tokens({'text': 'Hello'}), 0)
+    
+    def test_http_client_is_limited_and_paused_by_429(self):
+        """Test that provider calls go through the limiter and a 429 pauses it."""
+        server = start_stub_server(FlakyHandler)
+        url = f"http://127.0.0.1:{server.server_port}/"
+        FlakyHandler.statuses = [429]
+        try:
+            with self.app.app_context():
+                self.assertEqual(http_client.post('throttled', url, json={}).status_code, 200)
+                self.assertEqual(http_client.get('throttled', url).status_code, 200)
+        finally:
+            FlakyHandler.statuses = []
+            http_client.close_sessions()
+            server.shutdown()
+            server.server_close()
+        
+        stats = rate_limit.get_rate_limit_stats()['throttled']
+        self.assertEqual(stats['admitted'], 3)
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+    
+    def test_rejected_call_answers_429(self):
+        """Test that a call rejected by the limiter becomes a 429 response."""
+        @self.app.route('/limited')
+        def limited():
+            raise rate_limit.RateLimitExceeded('xai', 2.5)
+        
+        response = self.app.test_client().get('/limited')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '3')
+        self.assertEqual(response.get_json()['limiter'], 'xai')
+
+class TestDeadline(unittest.TestCase):
+    """Test request deadline budgets."""
+    
+    def setUp(self):
+        """Set up the test app."""
+        self.app = create_app({
+            'TESTING': True,
+            'ELEVENLABS_API_KEY': 'test-elevenlabs-key',
+            'RUNWAYML_API_KEY': 'test-runwayml-key'
+        })
+        self.client = self.app.test_client()
+    
+    def test_provider_call_is_cut_at_deadline(self):
+        """Test that a slow provider call fails once the budget runs out."""
+        server = start_stub_server(SlowHandler)
+        try:
+            with self.app.test_request_context('/'):
+                deadline.set_deadline(0.2)
+                started = time.monotonic()
+                with self.assertRaises(deadline.DeadlineExceeded):
+                    http_client.get('slow', f"http://127.0.0.1:{server.server_port}/")
+                self.assertLess(time.monotonic() - started, 0.9)
+        finally:
+            http_client.close_sessions()
+            server.shutdown()
+            server.server_close()
+    
+    @patch('app.tools.talking_head.routes.generate_talking_head')
+    @patch('app.tools.talking_head.routes.generate_audio')
+    def test_stage_that_cannot_fit_fails_fast(self, mock_generate_audio, mock_generate_talking_head):
+        """Test that a stage is not started when the budget can't cover it."""
+        response = self.client.post(
+            '/tools/talking-head/generate',
+            json={'text': 'Test text'},
+            headers={'X-Request-Deadline': '10'}
+        )
+        
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.get_json()['stage'], 'video generation')
+        mock_generate_audio.assert_called_once()
+        mock_generate_talking_head.assert_not_called()
+
+class TestAsyncHttp(unittest.TestCase):
+    """Test the async provider client layer."""
+    
+    def setUp(self):
+        """Start a threaded stub chat API and an app pointing at it."""
+        self.server = start_stub_server(ChatHandler, threaded=True)
+        self.app = create_app({
+            'TESTING': True,
+            'XAI_API_KEY': 'test-xai-key',
+            'XAI_API_URL': f"http://127.0.0.1:{self.server.server_port}"
+        })
+    
+    def tearDown(self):
+        """Stop the stub server and the provider loop."""
+        async_http.close_async_clients()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_async_view_multiplexes_calls(self):
+        """Test that one async view runs many provider calls concurrently."""
+        messages = [{'role': 'user', 'content': 'Hello'}]
+        
+        @self.app.route('/test/fan-out')
+        async def fan_out():
+            replies = await asyncio.gather(*[xai_api.chat_completion_async(messages) for _ in range(10)])
+            return {'replies': replies}
+        
+        ChatHandler.max_in_flight = 0
+        response = self.app.test_client().get('/test/fan-out')
+        
+        self.assertEqual(response.get_json()['replies'], ['stub reply'] * 10)
+        # Calls made one after the other would never overlap at the stub
+        self.assertGreater(ChatHandler.max_in_flight, 1)
+        self.assertEqual(async_http.get_async_stats()['xai']['in_flight'], 0)
+    
+    def test_cancelled_call_is_cancelled_on_provider_loop(self):
+        """Test that cancelling the caller cancels the provider call."""
+        async def call_with_timeout():
+            with self.app.app_context():
+                await asyncio.wait_for(xai_api.chat_completion_async([{'role': 'user', 'content': 'Hi'}]), 0.05)
+        
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(call_with_timeout())
+        
+        time.sleep(0.05)
+        self.assertEqual(async_http.get_async_stats()['xai']['in_flight'], 0)
+        # The breaker doesn't count the cancellation as a provider failure
+        self.assertEqual(resilience.get_breaker_states()['xai']['consecutive_failures'], 0)
+
+class TestResultCache(unittest.TestCase):
+    """Test the two-tier result cache."""
+    
+    def setUp(self):
+        """Create a cache directory."""
+        self.cache_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """Remove the cache directory."""
+        self.cache_dir.cleanup()
+    
+    def test_memory_tier_is_bounded(self):
+        """Test that the least recently used entry is evicted."""
+        cache = result_cache.ResultCache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+    
+    def test_expired_entries_are_misses(self):
+        """Test that entries expire after their TTL."""
+        cache = result_cache.ResultCache('test', directory=self.cache_dir.name)
+        cache.set('a', {'value': 1}, ttl=-1)
+        
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 1)
+    
+    def test_disk_tier_is_size_capped(self):
+        """Test that the disk tier evicts old entries beyond its size cap."""
+        cache = result_cache.ResultCache('test', max_entries=1, directory=self.cache_dir.name, max_bytes=300)
+        for key in 'abcde':
+            cache.set(key, {'text': key * 50})
+        
+        self.assertLessEqual(cache.disk.size, 300)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('e'), {'text': 'e' * 50})
+    
+    def test_cached_values_are_copies(self):
+        """Test that mutating a returned value doesn't change the cache."""
+        cache = result_cache.ResultCache('test')
+        cache.set('a', {'changes': []})
+        cache.get('a')['changes'].append('mutated')
+        
+        self.assertEqual(cache.get('a'), {'changes': []})
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Test the MinHash/LSH near-duplicate index."""
+    
+    ARTICLE = (
+        'Published 2024-05-01. The new battery lasts twice as long as the previous model according to '
+        'the manufacturer, which tested it in laboratory conditions over several months. Independent '
+        'reviews have not been published yet, and the price has not been announced.'
+    )
+    
+    def test_similar_text_matches(self):
+        """Test that a changed date and tracking URL still match, and other texts don't."""
+        index = near_duplicate.NearDuplicateIndex(threshold=0.8)
+        index.add('scope', self.ARTICLE, 'article')
+        index.add('scope', 'A completely different text about gardening and the weather in spring.', 'other')
+        
+        edited = self.ARTICLE.replace('2024-05-01', '2024-06-12') + ' https://example.com/?utm_source=feed'
+        key, similarity = index.find('scope', edited)
+        self.assertEqual(key, 'article')
+        self.assertGreaterEqual(similarity, 0.8)
+        
+        self.assertIsNone(index.find('scope', 'Gardening tips for growing tomatoes on a balcony.'))
+        self.assertIsNone(index.find('other scope', edited))
+    
+    def test_oldest_entries_are_evicted(self):
+        """Test that the index keeps at most max_entries inputs."""
+        index = near_duplicate.NearDuplicateIndex(max_entries=2)
+        for number in range(3):
+            index.add('scope', f'{number} {self.ARTICLE}', number)
+        
+        self.assertEqual(len(index), 2)
+        self.assertNotIn(0, index)
+        self.assertEqual(index.find('scope', f'1 {self.ARTICLE}')[0], 1)
+    
+    def test_merged_postings_are_found(self):
+        """Test lookups after the band postings are merged into sorted arrays."""
+        index = near_duplicate.NearDuplicateIndex()
+        with patch.object(near_duplicate, 'MERGE_THRESHOLD', 8):
+            for number in range(20):
+                index.add('scope', f'Entry {number}: {self.ARTICLE}', number)
+            index.remove(3)
+        
+        self.assertEqual(index._pending_count, 4)
+        self.assertEqual(index.find('scope', f'Entry 12: {self.ARTICLE}')[0], 12)
+        match = index.find('scope', f'Entry 3: {self.ARTICLE}')
+        self.assertTrue(match is None or match[0] != 3)
+
+class TestSingleFlight(unittest.TestCase):
+    """Test coalescing of concurrent identical calls."""
+    
+    def run_concurrently(self, flight, payloads, fn):
+        """Call flight.do from one thread per payload while the first call is held open."""
+        release = threading.Event()
+        results = [None] * len(payloads)
+        
+        def held():
+            release.wait(5)
+            return fn()
+        
+        def caller(index, payload):
+            try:
+                results[index] = flight.do('xai', 'chat', payload, held)
+            except Exception as e:
+                results[index] = e
+        
+        threads = [threading.Thread(target=caller, args=item) for item in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        
+        # Wait until every caller has started or joined a call
+        for _ in range(500):
+            stats = flight.stats().get('xai', {})
+            if stats.get('calls', 0) + stats.get('coalesced', 0) == len(payloads):
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_identical_calls_share_one_result(self):
+        """Test that concurrent callers with equal payloads get copies of one result."""
+        flight = singleflight.SingleFlight()
+        calls = []
+        
+        def fn():
+            calls.append(1)
+            return {'content': 'Hello'}
+        
+        payload = {'messages': ['hi'], 'model': 'grok'}
+        results = self.run_concurrently(flight, [payload] * 4 + [{'messages': ['bye']}], fn)
+        
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([shared for value, shared in results].count(True), 3)
+        self.assertTrue(all(value == {'content': 'Hello'} for value, shared in results))
+        self.assertEqual(len({id(value) for value, shared in results}), 5)
+        self.assertEqual(flight.stats()['xai'], {'calls': 2, 'coalesced': 3, 'in_flight': 0})
+    
+    def test_error_is_shared(self):
+        """Test that waiting callers get the exception of the shared call."""
+        flight = singleflight.SingleFlight()
+        
+        def fn():
+            raise Exception('Provider failed')
+        
+        results = self.run_concurrently(flight, ['same'] * 3, fn)
+        
+        self.assertTrue(all(str(result) == 'Provider failed' for result in results))
+        self.assertEqual(flight.stats()['xai']['calls'], 1)
+
+class TestSharedCache(unittest.TestCase):
+    """Test the shared cache backends."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Start a Redis stand-in."""
+        cls.server = start_redis_stand_in()
+        cls.redis_url = f'redis://127.0.0.1:{cls.server.server_address[1]}/0'
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the Redis stand-in."""
+        cls.server.shutdown()
+        cls.server.server_close()
+    
+    def setUp(self):
+        """Empty the stand-in and create a database directory."""
+        RedisStandInHandler.data.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.sqlite_url = f'sqlite:///{self.directory.name}/shared.db'
+    
+    def tearDown(self):
+        """Close the backends and remove the database."""
+        shared_cache.reset_shared_caches()
+        self.directory.cleanup()
+    
+    def backends(self):
+        """Create one backend of each kind."""
+        return [
+            shared_cache.MemoryCache(),
+            shared_cache.create_shared_cache(self.sqlite_url),
+            shared_cache.create_shared_cache(self.redis_url)
+        ]
+    
+    def test_get_set_and_expiry(self):
+        """Test values, TTLs, deletion and clearing by prefix."""
+        for cache in self.backends():
+            with self.subTest(backend=cache.backend):
+                cache.set('a:1', {'text': 'caf\u00e9', 'score': 0.5})
+                cache.set('a:2', [1, 2], ttl=0.05)
+                cache.set('b:1', 'kept')
+                self.assertEqual(cache.get('a:1'), {'text': 'caf\u00e9', 'score': 0.5})
+                self.assertEqual(cache.get('a:2'), [1, 2])
+                
+                time.sleep(0.1)
+                self.assertIsNone(cache.get('a:2'))
+                
+                cache.clear('a:')
+                self.assertIsNone(cache.get('a:1'))
+                cache.delete('b:1')
+                self.assertIsNone(cache.get('b:1'))
+                self.assertEqual(cache.stats()['hits'], 2)
+                cache.close()
+    
+    def test_compare_and_set(self):
+        """Test that a write only succeeds against the expected value."""
+        for cache in self.backends():
+            with self.subTest(backend=cache.backend):
+                self.assertTrue(cache.compare_and_set('key', None, {'n': 1}))
+                self.assertFalse(cache.compare_and_set('key', None, {'n': 2}))
+                self.assertFalse(cache.compare_and_set('key', {'n': 0}, {'n': 2}))
+                self.assertTrue(cache.compare_and_set('key', {'n': 1}, {'n': 2}))
+                self.assertEqual(cache.get('key'), {'n': 2})
+                self.assertEqual(cache.stats()['conflicts'], 2)
+                cache.close()
+    
+    def test_concurrent_updates_across_workers(self):
+        """Test that read-modify-write updates from several clients are not lost."""
+        for url in (self.sqlite_url, self.redis_url):
+            with self.subTest(url=url):
+                # Separate backend objects stand in for separate workers
+                workers = [shared_cache.create_shared_cache(url) for _ in range(2)]
+                
+                def increment(cache):
+                    for _ in range(20):
+                        cache.update('counter', lambda count: (count or 0) + 1)
+                
+                threads = [threading.Thread(target=increment, args=(workers[index % 2],)) for index in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                
+                self.assertEqual(workers[0].get('counter'), 80)
+                for cache in workers:
+                    cache.close()
+    
+    def test_result_cache_hits_are_shared(self):
+        """Test that a result cached by one worker is a hit for another."""
+        app = create_app({'TESTING': True, 'SHARED_CACHE_URL': self.redis_url})
+        with app.app_context():
+            first = result_cache.ResultCache('test', shared=shared_cache.create_shared_cache(self.redis_url))
+            second = result_cache.ResultCache('test', shared=shared_cache.create_shared_cache(self.redis_url))
+            
+            first.set('key', {'summary': 'Cached'})
+            self.assertEqual(second.get('key'), {'summary': 'Cached'})
+            self.assertEqual(second.stats()['shared_hits'], 1)
+            
+            first.invalidate()
+            second.memory.delete()
+            self.assertIsNone(second.get('key'))
+
+class TestHedging(unittest.TestCase):
+    """Test hedged provider calls."""
+    
+    def setUp(self):
+        """Set up an app that hedges after 50ms."""
+        self.app = create_app({
+            'TESTING': True,
+            'HEDGE_DEFAULT_DELAY': 0.05,
+            'HEDGE_MIN_DELAY': 0.01,
+            'HEDGE_MIN_SAMPLES': 1000
+        })
+        hedging._stats = hedging.HedgeStats()
+        provider_router.reset_router()
+    
+    MODELS = {'xai': 'grok-2-1212', 'gemini': 'gemini-2.0-flash'}
+    
+    def slow(self, seconds, value):
+        """Build a call answering after a delay."""
+        def call():
+            time.sleep(seconds)
+            return value
+        return call
+    
+    def test_fast_primary_is_not_hedged(self):
+        """Test that no hedge is sent when the primary answers in time."""
+        calls = []
+        with self.app.app_context():
+            value, report = hedging.hedged_call([
+                ('xai', self.slow(0, 'xai')),
+                ('gemini', lambda: calls.append('gemini'))
+            ], self.MODELS)
+        
+        self.assertEqual(value, 'xai')
+        self.assertFalse(report['hedged'])
+        self.assertEqual(calls, [])
+    
+    def test_slow_primary_loses_to_hedge(self):
+        """Test that the hedge answers first and the saved time is recorded."""
+        with self.app.app_context():
+            value, report = hedging.hedged_call([('xai', self.slow(0.5, 'xai')), ('gemini', self.slow(0, 'gemini'))], self.MODELS)
+        
+        self.assertEqual(value, 'gemini')
+        self.assertEqual(report['provider'], 'gemini')
+        self.assertTrue(report['hedged'])
+        self.assertLess(report['seconds'], 0.4)
+        
+        # The primary still finishes in the background
+        time.sleep(0.6)
+        stats = hedging.get_hedge_stats()
+        self.assertEqual(stats['xai']['hedges'], 1)
+        self.assertEqual(stats['gemini']['wins'], 1)
+        self.assertGreater(stats['xai']['saved_seconds'], 0.3)
+    
+    def test_failed_primary_fails_over(self):
+        """Test that a failing primary is replaced at once, and errors surface when all fail."""
+        def fail():
+            raise Exception('Provider failed')
+        
+        with self.app.app_context():
+            value, report = hedging.hedged_call([('xai', fail), ('gemini', self.slow(0, 'gemini'))], self.MODELS)
+            self.assertEqual(value, 'gemini')
+            self.assertLess(report['seconds'], 0.05)
+            
+            with self.assertRaises(Exception):
+                hedging.hedged_call([('xai', fail), ('gemini', fail)], self.MODELS)
+    
+    def test_delay_follows_observed_latency(self):
+        """Test that the hedge delay is the configured percentile of the latencies the router observed."""
+        self.app.config['HEDGE_MIN_SAMPLES'] = 10
+        router = provider_router.get_router()
+        for latency in range(1, 11):
+            router.backend('xai', 'grok-2-1212').record(True, latency / 10)
+        
+        with self.app.app_context():
+            self.assertEqual(hedging.hedge_delay('xai', 'grok-2-1212'), 1.0)
+            self.app.config['HEDGE_PERCENTILE'] = 50
+            self.assertEqual(hedging.hedge_delay('xai', 'grok-2-1212'), 0.6)
+            self.assertEqual(hedging.hedge_delay('gemini', 'gemini-2.0-flash'), 0.05)
+
+class TestProviderRouter(unittest.TestCase):
+    """Test latency- and health-aware provider routing."""
+    
+    MODELS = {'gemini': 'gemini-model', 'xai': 'xai-model', 'openai': 'openai-model'}
+    KEYS = {'gemini': 'gemini-key', 'xai': 'xai-key', 'openai': 'openai-key'}
+    
+    def setUp(self):
+        """Set up an app and an empty router."""
+        self.app = create_app({'TESTING': True})
+        self.router = provider_router.ProviderRouter()
+        resilience.reset_breakers()
+    
+    def tearDown(self):
+        """Forget the breakers opened by the tests."""
+        resilience.reset_breakers()
+    
+    def record(self, provider, ok, seconds, count=provider_router.MIN_SAMPLES):
+        """Record identical outcomes for a provider's backend."""
+        for _ in range(count):
+            self.router.backend(provider, self.MODELS[provider]).record(ok, seconds)
+    
+    def test_preferred_provider_comes_first(self):
+        """Test that the preferred provider leads without history, and providers without keys are skipped."""
+        with self.app.app_context():
+            self.assertEqual(self.router.rank(self.MODELS, self.KEYS, preferred='openai')[0], 'openai')
+            self.assertEqual(self.router.rank(self.MODELS, dict(self.KEYS, openai=None), preferred='openai'), ['gemini', 'xai'])
+            self.assertEqual(self.router.rank(self.MODELS, self.KEYS, preferred='xai', allowed=['gemini']), ['gemini'])
+            self.assertEqual(self.router.rank(self.MODELS, {}, preferred='xai'), [])
+    
+    def test_much_faster_provider_wins(self):
+        """Test that a provider over twice as fast as the preferred one is ranked first."""
+        self.record('xai', True, 3.0)
+        self.record('gemini', True, 1.0)
+        self.record('openai', True, 1.5)
+        
+        with self.app.app_context():
+            self.assertEqual(self.router.rank(self.MODELS, self.KEYS, preferred='xai'), ['gemini', 'xai', 'openai'])
+            self.assertEqual(self.router.rank(self.MODELS, self.KEYS, preferred='openai')[0], 'openai')
+    
+    def test_unhealthy_providers_come_last(self):
+        """Test that failing providers and providers with an open breaker are ranked last."""
+        self.record('xai', False, None)
+        self.record('gemini', True, 10.0)
+        breaker = resilience.get_breaker('openai', failure_threshold=1)
+        breaker.record_failure()
+        
+        with self.app.app_context():
+            ranked = self.router.rank(self.MODELS, self.KEYS, preferred='xai')
+            self.assertEqual(ranked[0], 'gemini')
+            self.assertEqual(set(ranked[1:]), {'xai', 'openai'})
+    
+    def test_call_fails_over_and_records_outcomes(self):
+        """Test that calls fail over in order and the outcomes feed the statistics."""
+        def fail():
+            raise Exception('Provider failed')
+        
+        def out_of_time():
+            raise deadline.DeadlineExceeded('call', 0.0)
+        
+        with self.app.app_context():
+            value, report = self.router.call([
+                ('xai', self.router.timed('xai', 'xai-model', fail)),
+                ('gemini', self.router.timed('gemini', 'gemini-model', lambda: 'gemini'))
+            ])
+            self.assertEqual(value, 'gemini')
+            self.assertEqual(report, {'provider': 'gemini', 'attempts': 2})
+            
+            with self.assertRaises(deadline.DeadlineExceeded):
+                self.router.call([('xai', self.router.timed('xai', 'xai-model', out_of_time)), ('gemini', fail)])
+        
+        stats = self.router.stats()
+        self.assertEqual(stats['failovers'], {'xai': 1})
+        self.assertEqual(stats['selected'], {'gemini': 1})
+        self.assertEqual(stats['backends']['xai/xai-model']['calls'], 1)
+        self.assertEqual(stats['backends']['gemini/gemini-model']['calls'], 1)
+
+class TestJSONOutput(unittest.TestCase):
+    """Test tolerant JSON extraction from LLM responses."""
+    
+    SCHEMA = {
+        'type': 'object',
+        'required': ['summary'],
+        'properties': {'summary': {'type': 'string'}, 'key_points': {'type': 'array', 'items': {'type': 'string'}}}
+    }
+    
+    def test_fenced_and_wrapped_json(self):
+        """Test that code fences and surrounding prose are skipped."""
+        self.assertEqual(json_output.extract_json('{"a": 1}'), ({'a': 1}, 'direct'))
+        self.assertEqual(json_output.extract_json('Here you go:\n```json\n{"a": [1, 2]}\n```'), ({'a': [1, 2]}, 'extracted'))
+        self.assertEqual(
+            json_output.extract_json('Sure! {"a": {"b": "} {"}} Hope this helps.'),
+            ({'a': {'b': '} {'}}, 'extracted')
+        )
+        self.assertEqual(
+            json_output.extract_json('```json\n{"processed_text": "Run ```pip install x``` first."}\n```'),
+            ({'processed_text': 'Run ```pip install x``` first.'}, 'extracted')
+        )
+    
+    def test_truncated_json_is_repaired(self):
+        """Test that an object cut off mid-way is closed, dropping an incomplete member."""
+        self.assertEqual(json_output.extract_json('{"a": 1, "b": "cut of'), ({'a': 1, 'b': 'cut of'}, 'repaired'))
+        self.assertEqual(json_output.extract_json('{"a": 1, "b": tr'), ({'a': 1}, 'repaired'))
+        self.assertEqual(
+            json_output.extract_json('```json\n{"changes": [{"original": "x", "replacement": "y"}, {"orig'),
+            ({'changes': [{'original': 'x', 'replacement': 'y'}]}, 'repaired')
+        )
+        with self.assertRaises(json_output.JSONOutputError):
+            json_output.extract_json('I cannot help with that.')
+        
+        # Whether a repair closed a cut-off string
+        self.assertTrue(json_output.string_closed('{"a": "x \\" y", "b": "cut of', 'a'))
+        self.assertFalse(json_output.string_closed('{"a": "x \\" y", "b": "cut of', 'b'))
+    
+    def test_schema_validation(self):
+        """Test the JSON schema subset."""
+        self.assertEqual(json_output.validate({'summary': 'S', 'key_points': ['a']}, self.SCHEMA), [])
+        self.assertEqual(json_output.validate({'key_points': ['a', 2]}, self.SCHEMA), ['$.summary is required', '$.key_points[1] should be of type string'])
+        self.assertEqual(json_output.validate([], self.SCHEMA), ['$ should be of type object'])
+    
+    def test_outcomes_are_counted(self):
+        """Test that parse outcomes are counted per tool."""
+        json_output.parse_json_response('```\n{"summary": "S"}\n```', self.SCHEMA, 'test_tool')
+        for content in ('No JSON here', '{"key_points": []}'):
+            with self.assertRaises(json_output.JSONOutputError):
+                json_output.parse_json_response(content, self.SCHEMA, 'test_tool')
+        
+        self.assertEqual(json_output.get_json_output_stats()['test_tool'], {'extracted': 1, 'failed': 1, 'invalid': 1})
+
+class TestHypeLexicon(unittest.TestCase):
+    """Test local hype scoring."""
+    
+    def test_matcher_finds_whole_words(self):
+        """Test that terms match case-insensitively, across whitespace and only as whole words."""
+        matcher = hype_lexicon.get_matcher(['next big thing', 'AI-powered'])
+        text = 'Our AMAZING, game-changing app is the next\nbig thing. Amazingly, it is ai-powered.'
+        
+        self.assertEqual(
+            [(text[start:end], term) for start, end, term in matcher.find(text)],
+            [('AMAZING', 'amazing'), ('game-changing', 'game-changing'), ('next\nbig thing', 'next big thing'), ('ai-powered', 'ai-powered')]
+        )
+        self.assertIs(hype_lexicon.get_matcher(['AI-powered', 'next  big thing']), matcher)
+    
+    def test_overlapping_terms(self):
+        """Test that terms inside other terms are all found."""
+        matcher = hype_lexicon.HypeMatcher({'game changer': 1.0, 'changer': 0.5, 'a game': 0.5})
+        self.assertEqual([term for _, _, term in matcher.find('It is a game changer.')], ['a game', 'game changer', 'changer'])
+    
+    def test_sentence_scores(self):
+        """Test that sentences are scored by the weights of their terms."""
+        scores = hype_lexicon.score_sentences('It works. It is revolutionary!\n\nThe best and most powerful tool')
+        self.assertEqual([(sentence['score'], sentence['terms']) for sentence in scores], [(0.0, []), (1.0, ['revolutionary']), (1.0, ['best', 'powerful'])])
+
+class TestTextChunks(unittest.TestCase):
+    """Test splitting of long texts into chunks."""
+    
+    def test_paragraphs_are_packed(self):
+        """Test that whole paragraphs are packed into chunks while they fit."""
+        text = 'First paragraph.\n\nSecond one.\n\n  Third paragraph here.\n'
+        spans = text_chunks.split_text(text, 30)
+        
+        self.assertEqual([text[start:end] for start, end in spans], ['First paragraph.\n\nSecond one.', 'Third paragraph here.'])
+        self.assertEqual(text_chunks.split_text(text, 100), [(0, len(text) - 1)])
+    
+    def test_long_paragraphs_are_split_into_sentences(self):
+        """Test that a paragraph too long for a chunk is split on sentences, then words."""
+        text = 'One sentence. Another "quoted sentence!" And a last one?\n\nA verylongwordwithoutspaces'
+        spans = text_chunks.split_text(text, 20)
+        chunks = [text[start:end] for start, end in spans]
+        
+        self.assertEqual(chunks[:4], ['One sentence.', 'Another "quoted', 'sentence!"', 'And a last one?'])
+        self.assertTrue(all(0 < len(chunk) <= 20 for chunk in chunks))
+        self.assertEqual(''.join(chunks).replace(' ', ''), ''.join(text.split()))
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            self.assertFalse(text[end:start].strip())
+    
+    def test_paragraphs_are_not_packed(self):
+        """Test that paragraphs stay apart, and only long ones are split."""
+        text = 'Short.\n\nAlso short.\n\nA much longer paragraph. It has two sentences.'
+        spans = text_chunks.split_paragraphs(text, 30)
+        
+        self.assertEqual(
+            [text[start:end] for start, end in spans],
+            ['Short.', 'Also short.', 'A much longer paragraph.', 'It has two sentences.']
+        )
+        self.assertEqual(len(text_chunks.split_paragraphs(text)), 3)
+
+class TestWordDiff(unittest.TestCase):
+    """Test word-level changes between a text and its rewrite."""
+    
+    def test_changes_and_offsets(self):
+        """Test that replaced, deleted and inserted words are found with their offsets."""
+        original = 'Our revolutionary battery is the ultimate breakthrough in storage, and it is AMAZING!'
+        processed = 'Our battery is an improvement in  storage, and it is good. Tested in 2024.'
+        changes = word_diff.diff_changes(original, processed)
+        
+        self.assertEqual(
+            [(change['original'], change['replacement']) for change in changes],
+            [('revolutionary', ''), ('the ultimate breakthrough', 'an improvement'), ('AMAZING!', 'good. Tested in 2024.')]
+        )
+        for change in changes:
+            self.assertEqual(original[change['offset']:change['offset'] + len(change['original'])], change['original'])
+            self.assertEqual(processed[change['processed_offset']:change['processed_offset'] + len(change['replacement'])], change['replacement'])
+    
+    def test_nearby_changes_are_merged(self):
+        """Test that changes one word apart are one change, and identical texts have none."""
+        self.assertEqual(
+            word_diff.diff_changes('the best, most powerful tool', 'a capable tool'),
+            [{'original': 'the best, most powerful', 'replacement': 'a capable', 'offset': 0, 'processed_offset': 0}]
+        )
+        self.assertEqual(word_diff.diff_changes('Same text.', 'Same  text.'), [])
+
+class TestRequestBody(unittest.TestCase):
+    """Test reading of gzip-encoded JSON bodies."""
+    
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+    
+    def read(self, body, max_bytes=1000, **headers):
+        with self.app.test_request_context('/', method='POST', data=body, headers=headers):
+            return request_body.read_json_body(max_bytes)
+    
+    def test_plain_and_gzip_bodies(self):
+        """Test that plain and gzip-encoded bodies are parsed."""
+        self.assertEqual(self.read(b'{"a": 1}'), {'a': 1})
+        self.assertEqual(self.read(gzip.compress(b'{"a": [1, 2]}'), **{'Content-Encoding': 'gzip'}), {'a': [1, 2]})
+    
+    def test_invalid_and_oversized_bodies(self):
+        """Test that bad bodies, and bodies inflating past the limit, are rejected."""
+        cases = [
+            (b'not json', {}, 400),
+            (b'not gzip', {'Content-Encoding': 'gzip'}, 400),
+            (gzip.compress(b'{"a": 1}')[:-12], {'Content-Encoding': 'gzip'}, 400),
+            (b'{}', {'Content-Encoding': 'br'}, 415),
+            (b' ' * 1001, {}, 413),
+            (gzip.compress(b'[' + b' ' * 100000 + b']'), {'Content-Encoding': 'gzip'}, 413),
+        ]
+        for body, headers, status in cases:
+            with self.assertRaises(request_body.RequestBodyError) as context:
+                self.read(body, **headers)
+            self.assertEqual(context.exception.status, status)
+    
+    def test_body_without_length_is_read_up_to_the_limit(self):
+        """Test that a body sent without a Content-Length is not read past the limit."""
+        stream = io.BytesIO(b' ' * 100000)
+        environ = {'wsgi.input': stream, 'wsgi.input_terminated': True, 'CONTENT_TYPE': 'application/json'}
+        with self.app.test_request_context('/', method='POST', environ_overrides=environ):
+            with self.assertRaises(request_body.RequestBodyError) as context:
+                request_body.read_json_body(1000)
+        
+        self.assertEqual(context.exception.status, 413)
+        self.assertLessEqual(stream.tell(), 1001)
+
+class TestWarmup(unittest.TestCase):
+    """Test the App Engine warmup handler."""
+    
+    @patch('app.tools.talking_head.service.get_default_face')
+    @patch('app.utils.http_client.warm_pools')
+    def test_warmup_runs_every_step(self, mock_warm_pools, mock_get_default_face):
+        """Test that warmup loads tools and reports each step."""
+        mock_warm_pools.return_value = {'xai': True}
+        mock_get_default_face.return_value = b'image-bytes'
+        app = create_app({'TESTING': True, 'XAI_API_KEY': 'test-xai-key'})
+        
+        response = app.test_client().get('/_ah/warmup')
+        
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(set(report['steps']), {name for name, step in warmup.WARMUP_STEPS})
+        self.assertTrue(report['ok'], report)
+        self.assertEqual(report['steps']['default_face']['result'], {'bytes': 11})
+        self.assertIn('xai', mock_warm_pools.call_args[0][0])
+        self.assertTrue(all(tool.loaded for tool in app.extensions['lazy_tools'].values()))
+        # SECRETS_PREFETCH is off, so warming the secrets doesn't start the refresh thread
+        self.assertFalse(secrets.get_secret_cache_stats()['vault']['refreshing'])
+    
+    @patch('app.utils.secrets._fetch_secret')
+    def test_warmed_secrets_expire(self, mock_fetch):
+        """Test that without SECRETS_PREFETCH secrets are warmed into the TTL cache, not the vault."""
+        mock_fetch.side_effect = lambda name, project_id: f'{name.lower()}-value'
+        secrets.clear_secret_cache()
+        
+        with patch.dict(os.environ, {name: '' for name in secrets.KNOWN_SECRETS}):
+            app = create_app({'TESTING': True, 'GCP_PROJECT_ID': 'test-project'})
+            try:
+                self.assertEqual(warmup._warm_secrets(app), {'resolved': len(secrets.KNOWN_SECRETS)})
+                self.assertEqual(secrets._secret_vault.get('XAI_API_KEY'), (False, None))
+                
+                # Once the cached value expires, a rotated key is picked up
+                secrets.clear_secret_cache('XAI_API_KEY')
+                mock_fetch.side_effect = lambda name, project_id: 'rotated-value'
+                with app.app_context():
+                    self.assertEqual(secrets.get_secret('XAI_API_KEY'), 'rotated-value')
+            finally:
+                secrets.clear_secret_cache()
+    
+    @patch('app.tools.talking_head.service.get_default_face')
+    @patch('app.utils.http_client.warm_pools')
+    def test_failing_step_is_reported(self, mock_warm_pools, mock_get_default_face):
+        """Test that one failing step doesn't stop the others."""
+        mock_warm_pools.return_value = {}
+        mock_get_default_face.return_value = None
+        app = create_app({'TESTING': True})
+        
+        report = app.test_client().get('/_ah/warmup').get_json()
+        
+        self.assertFalse(report['ok'])
+        self.assertFalse(report['steps']['default_face']['ok'])
+        self.assertTrue(report['steps']['templates']['ok'])
+
+class TestServing(unittest.TestCase):
+    """Test the gunicorn serving helpers."""
+    
+    @patch.dict(os.environ, {'WEB_CONCURRENCY': '', 'GUNICORN_THREADS': ''})
+    def test_worker_settings(self):
+        """Test that workers follow CPUs and memory, and threads absorb I/O waits."""
+        self.assertEqual(serving.worker_settings(cpus=4, memory_mb=4096, worker_memory_mb=160), (4, 32))
+        # Memory-bound: only two workers fit, so each gets more threads
+        self.assertEqual(serving.worker_settings(cpus=4, memory_mb=384, worker_memory_mb=160), (2, 64))
+        self.assertEqual(serving.worker_settings(cpus=1, memory_mb=128, worker_memory_mb=160), (1, 32))
+    
+    @patch.dict(os.environ, {'WEB_CONCURRENCY': '3', 'GUNICORN_THREADS': '12'})
+    def test_worker_settings_override(self):
+        """Test that WEB_CONCURRENCY and GUNICORN_THREADS take precedence."""
+        self.assertEqual(serving.worker_settings(cpus=8, memory_mb=8192), (3, 12))
+    
+    def test_startup_checks(self):
+        """Test that misconfiguration is reported before serving."""
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'dev'})
+        
+        warnings = serving.check_startup(app, timeout=120)
+        
+        self.assertTrue(any('SECRET_KEY' in warning for warning in warnings))
+        self.assertTrue(any('timeout' in warning for warning in warnings))
+    
+    def test_master_only_keeps_preloaded_app(self):
+        """Test that without preloading the master checks a throwaway app instead of loading the served one."""
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+        conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(conf)
+        server = MagicMock()
+        server.app.wsgi.return_value = create_app({'TESTING': True})
+        
+        conf.preload_app = False
+        conf.when_ready(server)
+        server.app.wsgi.assert_not_called()
+        
+        conf.preload_app = True
+        with patch.object(serving, 'preload') as mock_preload, patch.object(serving, 'after_fork') as mock_after_fork:
+            conf.when_ready(server)
+            conf.post_fork(server, None)
+        mock_preload.assert_called_once_with(server.app.wsgi.return_value)
+        mock_after_fork.assert_called_once_with(server.app.wsgi.return_value)
+
+if __name__ == '__main__':
+    unittest.main()